@@ -1,15 +1,452 @@
-from flask import Flask, jsonify, request
-from tools.anonimization import anonymize_text
+import csv
+import io
+import json
+import os
+import time
+
+from flask import Flask, Response, g, jsonify, request, send_file, stream_with_context
+from tools.anonimization import (anonymize_batch, cache_stats, explain_results, get_anonymizer,
+                                 result_to_dict, results_from_dicts)
+from tools.bulk import DOCUMENT_ID_FIELD, TIER_FIELD
+from tools.streaming import detect_format, read_records, stream_records, stream_text
+from tools.metrics import METRICS, REQUEST_SECONDS, Profiler
+from tools.jobs import MIMETYPES, ZSTD_MIMETYPE, JobQueue, job_format
+from tools.tables import PARQUET_MIMETYPE, anonymize_parquet
+from tools.startup import report as startup_report
+from config import (BATCH_SIZE, N_PROCESS, MAX_BATCH_SIZE, MAX_CONTENT_LENGTH, JOB_MAX_PENDING,
+                    JOB_MAX_CONTENT_LENGTH)
 app = Flask(__name__)
+# Requisições maiores que isso recebem 413
+app.config['MAX_CONTENT_LENGTH'] = MAX_CONTENT_LENGTH
+profiler = Profiler()
+jobs = JobQueue()
+
+@app.before_request
+def start_request():
+    g.started = time.perf_counter()
+    g.profile = profiler.start()
+
+@app.after_request
+def finish_request(response):
+    # Só a duração e o status são registrados, nunca o conteúdo da requisição
+    duration = time.perf_counter() - g.started
+    endpoint = request.endpoint or "desconhecido"
+    profiler.stop(g.profile, duration, endpoint)
+    REQUEST_SECONDS.observe(duration, endpoint, str(response.status_code))
+    return response
+
+def json_object():
+    """Corpo JSON da requisição: ``{}`` sem corpo JSON, ``None`` se não for um objeto"""
+    data = request.get_json(silent=True)
+    if data is None:
+        return {}
+    return data if isinstance(data, dict) else None
+
+NOT_AN_OBJECT = {"erro": "O corpo JSON deve ser um objeto"}
+
+def analysis_options(data):
+    """``entities`` e ``score_threshold`` do corpo JSON ou da query string
+
+    ``entities`` é uma lista JSON ou, na query string, separada por vírgulas.
+    """
+    entities = data.get('entities', request.args.get('entities'))
+    if isinstance(entities, str):
+        entities = [e.strip() for e in entities.split(',') if e.strip()]
+    if entities is not None and not (isinstance(entities, list) and all(isinstance(e, str) for e in entities)):
+        raise ValueError("Campo 'entities' deve ser uma lista de tipos de entidade")
+    score_threshold = data.get('score_threshold', request.args.get('score_threshold'))
+    try:
+        score_threshold = None if score_threshold is None else float(score_threshold)
+    except (TypeError, ValueError):
+        raise ValueError("Campo 'score_threshold' deve ser um número")
+    return {"entities": entities, "score_threshold": score_threshold}
+
+def int_arg(name, default, maximum):
+    """Inteiro ``name`` da query string entre 1 e ``maximum``; ``ValueError`` fora disso"""
+    value = request.args.get(name)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"Parâmetro '{name}' deve ser um inteiro")
+    if not 1 <= value <= maximum:
+        raise ValueError(f"Parâmetro '{name}' deve estar entre 1 e {maximum}")
+    return value
 
 @app.route('/', methods=['POST'])
-def index(): # TODO: Fazer rota/função para receber CSV
-    data = request.json
+def index():
+    """Anonimiza ``text``; aceita ``entities``, ``score_threshold``, ``explain``, ``spans`` e ``document_id``
+
+    Com ``spans``, a resposta traz também as entidades substituídas em
+    colunas (listas paralelas ``start``, ``end``, ``entity_type`` e ``score``).
+    Com o cofre ligado (``VAULT_DB``), a resposta traz o ``document_id`` sob
+    o qual as substituições foram guardadas. No modo em camadas
+    (``ANALYSIS_MODE = "tiered"``), ``Camada`` diz se o texto precisou do NER
+    (``ner``) ou só dos padrões (``regex``).
+    """
+    data = json_object()
+    if data is None:
+        return jsonify(NOT_AN_OBJECT), 400
     # text = data['text'].lower() # Ativar somente para textos em CAPSLock
-    text = data['text']
-    print(text)
-    anonymized_text = anonymize_text(text)
-    return jsonify({"Texto anonimizado": anonymized_text})
+    text = data.get('text')
+    if not isinstance(text, str):
+        return jsonify({"erro": "Campo 'text' deve ser um texto"}), 400
+    explain = data.get('explain') is True or request.args.get('explain') in ('1', 'true')
+    with_spans = data.get('spans') is True or request.args.get('spans') in ('1', 'true')
+    document_id = data.get('document_id')
+    if document_id is not None and not isinstance(document_id, str):
+        return jsonify({"erro": "Campo 'document_id' deve ser um texto"}), 400
+    anonymizer = get_anonymizer()
+    try:
+        options = analysis_options(data)
+        results = anonymizer.analyze(text, explain=explain, **options)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    document_id = anonymizer.document_id(text, document_id)
+    anonymized_text, spans = anonymizer.anonymize_spans(text, results, document_id=document_id)
+    response = {"Texto anonimizado": anonymized_text}
+    if document_id is not None:
+        response["document_id"] = document_id
+    if results.tier is not None:
+        response["Camada"] = results.tier
+    if explain:
+        response["Explicação"] = explain_results(results)
+    if with_spans:
+        response["Spans"] = spans.to_dict()
+    return jsonify(response)
+
+@app.route('/batch', methods=['POST'])
+def batch():
+    """Anonimiza vários textos de uma vez.
+
+    Aceita JSON ``{"texts": [...]}`` ou um CSV (upload ``file`` ou corpo
+    ``text/csv``) cuja coluna ``column`` (padrão ``text``) será anonimizada.
+    ``entities`` e ``score_threshold`` vêm do JSON ou da query string. No
+    JSON, ``document_ids`` (opcional) identifica cada texto no cofre; no CSV,
+    a coluna ``id_column``. Com o cofre ligado (``VAULT_DB``), o JSON volta
+    com ``document_ids`` e o CSV, sem ``id_column``, com uma coluna
+    ``document_id``: os IDs usados para reidentificar cada texto. No modo em
+    camadas, o JSON traz ``Camadas`` e o CSV uma coluna ``camada`` com a
+    camada (``regex`` ou ``ner``) que analisou cada texto.
+
+    Um upload ``.parquet`` volta em Parquet, com as colunas anonimizadas
+    segundo ``policies`` (JSON ``{"coluna": "skip" | "regex" | "ner" |
+    [entidades]}``, ver ``tools.tables``); sem ele, só ``column``.
+
+    ``batch_size`` (1 a ``MAX_BATCH_SIZE``) e ``n_process`` (1 ao número de
+    núcleos) na query string ajustam o ``nlp.pipe``; fora disso, 400.
+    """
+    data = json_object() if request.is_json else {}
+    if data is None:
+        return jsonify(NOT_AN_OBJECT), 400
+    try:
+        batch_size = int_arg('batch_size', BATCH_SIZE, MAX_BATCH_SIZE)
+        n_process = int_arg('n_process', N_PROCESS, os.cpu_count() or 1)
+        options = analysis_options(data)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+
+    if request.is_json:
+        texts = data.get('texts')
+        if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+            return jsonify({"erro": "Campo 'texts' deve ser uma lista de textos"}), 400
+        document_ids = data.get('document_ids')
+        if document_ids is not None and (not isinstance(document_ids, list) or len(document_ids) != len(texts)):
+            return jsonify({"erro": "Campo 'document_ids' deve ser uma lista do tamanho de 'texts'"}), 400
+        if document_ids is not None and not all(isinstance(document_id, str) for document_id in document_ids):
+            return jsonify({"erro": "Campo 'document_ids' deve ser uma lista de textos"}), 400
+        anonymizer = get_anonymizer()
+        document_ids = [anonymizer.document_id(text, document_id)
+                        for text, document_id in zip(texts, document_ids or [None] * len(texts))]
+        try:
+            anonymized, tiers = anonymize_batch(texts, batch_size=batch_size, n_process=n_process,
+                                                document_ids=document_ids, tiers=True, **options)
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+        response = {"Textos anonimizados": anonymized}
+        if anonymizer.vault is not None:
+            response["document_ids"] = document_ids
+        if anonymizer.mode == "tiered":
+            response["Camadas"] = tiers
+        return jsonify(response)
+
+    column = request.args.get('column') or request.form.get('column') or 'text'
+    upload = request.files.get('file')
+    if upload is not None and (upload.filename or '').lower().endswith('.parquet'):
+        return batch_parquet(upload, column, options)
+    if upload is not None:
+        content = upload.read().decode('utf-8-sig')
+    else:
+        content = request.get_data(as_text=True)
+
+    reader = csv.DictReader(io.StringIO(content))
+    rows = list(reader)
+    if reader.fieldnames is None or column not in reader.fieldnames:
+        return jsonify({"erro": f"Coluna '{column}' não encontrada no CSV"}), 400
+    id_column = request.args.get('id_column') or request.form.get('id_column')
+    if id_column is not None and id_column not in reader.fieldnames:
+        return jsonify({"erro": f"Coluna '{id_column}' não encontrada no CSV"}), 400
+
+    anonymizer = get_anonymizer()
+    document_ids = [anonymizer.document_id(row[column] or "", row[id_column] if id_column else None)
+                    for row in rows]
+    try:
+        anonymized, tiers = anonymize_batch([row[column] for row in rows], batch_size=batch_size,
+                                            n_process=n_process, document_ids=document_ids, tiers=True, **options)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    # Sem id_column, o ID gerado pelo cofre vai numa coluna nova, para a reidentificação
+    add_ids = anonymizer.vault is not None and id_column is None and DOCUMENT_ID_FIELD not in reader.fieldnames
+    add_tiers = anonymizer.mode == "tiered" and TIER_FIELD not in reader.fieldnames
+    fieldnames = list(reader.fieldnames)
+    if add_ids:
+        fieldnames.append(DOCUMENT_ID_FIELD)
+    if add_tiers:
+        fieldnames.append(TIER_FIELD)
+    output = io.StringIO()
+    writer = csv.DictWriter(output, fieldnames=fieldnames)
+    writer.writeheader()
+    for row, value, document_id, tier in zip(rows, anonymized, document_ids, tiers):
+        row[column] = value
+        if add_ids:
+            row[DOCUMENT_ID_FIELD] = document_id
+        if add_tiers:
+            row[TIER_FIELD] = tier
+        writer.writerow(row)
+    return Response(output.getvalue(), mimetype='text/csv')
+
+def batch_parquet(upload, column, options):
+    """Parquet de ``/batch``: anonimizado lote a lote, cada valor distinto uma vez"""
+    policies = request.args.get('policies') or request.form.get('policies')
+    try:
+        policies = json.loads(policies) if policies else {column: options["entities"] or "ner"}
+    except json.JSONDecodeError:
+        return jsonify({"erro": "Campo 'policies' deve ser um objeto JSON"}), 400
+    if not isinstance(policies, dict):
+        return jsonify({"erro": "Campo 'policies' deve ser um objeto JSON"}), 400
+    output = io.BytesIO()
+    try:
+        anonymize_parquet(io.BytesIO(upload.read()), output, policies,
+                          score_threshold=options["score_threshold"])
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    return Response(output.getvalue(), mimetype=PARQUET_MIMETYPE)
+
+@app.route('/analyze', methods=['POST'])
+def analyze():
+    """Só a análise: as entidades de cada texto de ``{"texts": [...]}``
+
+    Usado pela interface no modo incremental, que analisa apenas os
+    parágrafos alterados e guarda o resultado dos demais.
+    """
+    data = json_object()
+    if data is None:
+        return jsonify(NOT_AN_OBJECT), 400
+    texts = data.get('texts')
+    if not isinstance(texts, list) or not all(isinstance(text, str) for text in texts):
+        return jsonify({"erro": "Campo 'texts' deve ser uma lista de textos"}), 400
+    batch_results = get_anonymizer().analyze_batch(texts)
+    return jsonify({"Resultados": [[result_to_dict(r) for r in results] for results in batch_results]})
+
+@app.route('/anonymize', methods=['POST'])
+def anonymize_analyzed():
+    """Anonimiza ``text`` com as entidades de ``results`` (de ``/analyze``), sem reanalisar
+
+    Aceita ``document_id`` e, com o cofre ligado, devolve o ID usado, como ``/``.
+    """
+    data = json_object()
+    if data is None:
+        return jsonify(NOT_AN_OBJECT), 400
+    text = data.get('text')
+    if not isinstance(text, str):
+        return jsonify({"erro": "Campo 'text' deve ser um texto"}), 400
+    document_id = data.get('document_id')
+    if document_id is not None and not isinstance(document_id, str):
+        return jsonify({"erro": "Campo 'document_id' deve ser um texto"}), 400
+    try:
+        results = results_from_dicts(text, data.get('results'))
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    anonymizer = get_anonymizer()
+    document_id = anonymizer.document_id(text, document_id)
+    response = {"Texto anonimizado": anonymizer.anonymize_results(text, results, document_id=document_id)}
+    if document_id is not None:
+        response["document_id"] = document_id
+    return jsonify(response)
+
+@app.route('/stream', methods=['POST'])
+def stream():
+    """Anonimiza progressivamente, devolvendo uma linha NDJSON por item.
+
+    Aceita JSON ``{"text": ...}`` (uma linha por parágrafo, com ``text``) ou
+    upload ``file`` .txt/.csv/.jsonl; para CSV/JSONL cada linha traz o
+    ``record`` com o campo ``column`` (padrão ``text``) anonimizado. Todas as
+    linhas têm ``index`` e ``total``, para exibir o progresso. Com o cofre
+    ligado, as linhas de texto trazem o ``document_id`` do texto inteiro e
+    os registros, o ID gerado em ``document_id`` (ver ``tools.streaming``).
+    """
+    if 'file' in request.files:
+        upload = request.files['file']
+        column = request.args.get('column') or request.form.get('column') or 'text'
+        try:
+            fmt = detect_format(upload.filename)
+            content = upload.read().decode('utf-8-sig')
+            if fmt == 'txt':
+                items = stream_text(content)
+            else:
+                items = stream_records(read_records(content, fmt, column), column)
+        except ValueError as e:
+            return jsonify({"erro": str(e)}), 400
+    else:
+        data = json_object()
+        if data is None:
+            return jsonify(NOT_AN_OBJECT), 400
+        text = data.get('text')
+        if not isinstance(text, str):
+            return jsonify({"erro": "Envie o campo 'text' ou um arquivo 'file'"}), 400
+        items = stream_text(text)
+
+    def generate():
+        try:
+            for item in items:
+                yield json.dumps(item, ensure_ascii=False) + "\n"
+        except Exception:
+            app.logger.exception("Falha ao anonimizar em streaming")
+            yield json.dumps({"erro": "Falha ao anonimizar"}, ensure_ascii=False) + "\n"
+
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Enfileira um envio grande e devolve o ID do job (202) sem esperar a anonimização
+
+    Aceita upload ``file`` (.txt, .csv ou .jsonl, estes dois também .zst),
+    JSON ``{"text": ...}`` ou JSON ``{"texts": [...]}`` (resultado em JSONL,
+    um ``{"text": ...}`` por linha). ``column`` escolhe o campo dos
+    registros e ``id_field`` o identificador de cada um no cofre (os sem
+    identificador recebem, na saída, o ID gerado; ver ``tools.bulk``; os
+    parágrafos de um texto ficam sob o ID do job);
+    ``entities`` e ``score_threshold`` como em ``/batch``. Os jobs são
+    executados pelos workers do ``server.py`` ou de ``python -m tools.jobs``.
+    """
+    # Limite próprio: envios para jobs podem ser bem maiores que os síncronos
+    request.max_content_length = JOB_MAX_CONTENT_LENGTH
+    if jobs.pending() >= JOB_MAX_PENDING:
+        return jsonify({"erro": "Fila de jobs cheia; tente mais tarde"}), 503
+
+    data = request.get_json(silent=True) if request.is_json else None
+    try:
+        options = analysis_options(data if isinstance(data, dict) else {})
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    options["field"] = request.args.get('column') or request.form.get('column') or 'text'
+    options["id_field"] = request.args.get('id_field') or request.form.get('id_field')
+
+    if 'file' in request.files:
+        upload = request.files['file']
+        filename = upload.filename or ''
+        save = upload.save
+    elif isinstance(data, dict) and isinstance(data.get('text'), str):
+        filename = 'documento.txt'
+
+        def save(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                f.write(data['text'])
+    elif isinstance(data, dict) and isinstance(data.get('texts'), list):
+        filename = 'textos.jsonl'
+        options["field"] = 'text'
+
+        def save(path):
+            with open(path, 'w', encoding='utf-8') as f:
+                for text in data['texts']:
+                    f.write(json.dumps({"text": text}, ensure_ascii=False) + "\n")
+    else:
+        return jsonify({"erro": "Envie um arquivo 'file' ou o campo 'text' ou 'texts'"}), 400
+
+    try:
+        job_format(filename)
+    except ValueError as e:
+        return jsonify({"erro": str(e)}), 400
+    job_id = jobs.submit(filename, save, options)
+    response = jsonify({"job_id": job_id, "status": "queued"})
+    response.status_code = 202
+    response.headers['Location'] = f"/jobs/{job_id}"
+    return response
+
+def job_status(job):
+    """Estado público de um job (sem as opções nem os caminhos no disco)"""
+    return {
+        "job_id": job["id"],
+        "status": job["status"],
+        "processed": job["processed"],
+        "total": job["total"],
+        "progress": round(job["processed"] / job["total"], 4) if job["total"] else None,
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created": job["created"],
+        "started": job["started"],
+        "finished": job["finished"],
+    }
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Progresso do job: ``status`` (queued, running, done, failed), ``processed`` de ``total``"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    return jsonify(job_status(job))
+
+@app.route('/jobs/<job_id>', methods=['DELETE'])
+def delete_job(job_id):
+    """Apaga o job e seus arquivos (não vale para jobs em execução)"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    if not jobs.delete(job_id):
+        return jsonify({"erro": "Job em execução"}), 409
+    return jsonify({"job_id": job_id, "status": "deleted"})
+
+@app.route('/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """Saída do job concluído, no formato da entrada, enviada do disco em partes"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"erro": "Job não encontrado"}), 404
+    if job["status"] != "done":
+        erro = "Job falhou" if job["status"] == "failed" else "Job ainda não concluído"
+        return jsonify(dict(job_status(job), erro=erro)), 409
+    filename = job["filename"]
+    mimetype = ZSTD_MIMETYPE if filename.endswith(".zst") else MIMETYPES[job_format(filename)]
+    return send_file(os.path.abspath(jobs.output_path(job)), mimetype=mimetype, as_attachment=True,
+                     download_name=f"anonimizado-{filename}")
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Processo no ar (liveness)"""
+    return jsonify({"status": "ok"})
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Pronto para atender só depois do aquecimento dos modelos (readiness)
+
+    Traz também o tempo de cada etapa da inicialização (ver ``tools.startup``).
+    """
+    if not get_anonymizer().is_warm:
+        return jsonify({"status": "aquecendo", "inicializacao": startup_report()}), 503
+    return jsonify({"status": "pronto", "inicializacao": startup_report()})
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    """Métricas no formato de texto do Prometheus"""
+    return Response(METRICS.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/cache', methods=['GET'])
+def cache():
+    """Acertos e falhas do cache de resultados"""
+    return jsonify(cache_stats())
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # Servidor de desenvolvimento; em produção use server.py
+    get_anonymizer().warm_up()
+    app.run(debug=True, use_reloader=False)
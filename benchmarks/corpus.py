@@ -0,0 +1,165 @@
+"""Gerador de corpus sintético com PII brasileira e spans de referência (gold).
+
+Each document is a sequence of Portuguese sentences. A ``density``
+fraction of them come from templates with PII slots (names, CPFs, CEPs,
+addresses, cities, schools, emails and phones); the others are filler
+without PII. Slot values are generated, so every entity's exact offsets
+are known. The same seed always gives the same corpus.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.corpus --docs 100 --size 2000 --density 0.5 --output corpus.jsonl
+"""
+import argparse
+import json
+import random
+import re
+import sys
+from typing import Dict, List
+
+FIRST_NAMES = ["João", "Maria", "Ana", "Pedro", "Lucas", "Juliana", "Carlos", "Fernanda", "Rafael",
+               "Amanda", "Marcos", "Beatriz", "Jorge", "Camila", "Paulo", "Larissa"]
+LAST_NAMES = ["Silva", "Santos", "Oliveira", "Souza", "Pereira", "Lima", "Ferreira", "Almeida",
+              "Ribeiro", "Carvalho", "Gomes", "Martins", "Rocha", "Barbosa", "dos Anjos", "Fernandes"]
+STREET_TYPES = ["Rua", "Avenida", "Travessa", "Alameda", "Estrada"]
+STREET_NAMES = ["das Flores", "Brasil", "Getúlio Vargas", "Sete de Setembro", "Pompílio de Albuquerque",
+                "São João", "Barão de Mesquita", "Nossa Senhora de Copacabana", "Tiradentes"]
+CITIES = [("Niterói", "RJ"), ("São Paulo", "SP"), ("Belo Horizonte", "MG"), ("Curitiba", "PR"),
+          ("Salvador", "BA"), ("Recife", "PE"), ("Porto Alegre", "RS"), ("Campinas", "SP")]
+SCHOOLS = ["Colégio Santo Antônio", "Escola Municipal Monteiro Lobato", "Escola Estadual Machado de Assis",
+           "Colégio Pedro Segundo", "Instituto Federal Fluminense", "Universidade Federal Fluminense",
+           "EMEF Cecília Meireles", "Faculdade Nacional de Direito"]
+DOMAINS = ["gmail.com", "hotmail.com", "yahoo.com.br", "uol.com.br", "empresa.com.br"]
+AREA_CODES = ["11", "21", "31", "41", "51", "61", "71", "81"]
+
+# Sentenças com PII: {SLOT} vira um valor gerado e um span gold
+TEMPLATES = [
+    "{PERSON}, portador do CPF {CPF}, compareceu à delegacia.",
+    "A vítima, {PERSON}, reside na {ENDEREÇO}, CEP {CEP}.",
+    "O suspeito informou o endereço {ENDEREÇO}, em {CIDADE}.",
+    "Para contato, o e-mail informado foi {EMAIL_ADDRESS} e o telefone {PHONE_NUMBER}.",
+    "A filha do declarante estuda no {ESCOLA} desde o ano passado.",
+    "{PERSON} (CPF {CPF}) enviou mensagem pelo telefone {PHONE_NUMBER}.",
+    "A correspondência deve ser enviada para {ENDEREÇO}, CEP {CEP}, {CIDADE}.",
+    "Segundo {PERSON}, a transferência foi feita a pedido de {PERSON}.",
+    "O documento foi assinado por {PERSON}, e-mail {EMAIL_ADDRESS}.",
+    "A reunião ocorreu no {ESCOLA}, em {CIDADE}.",
+]
+
+FILLER = [
+    "O relatório foi encaminhado ao setor responsável para as providências cabíveis.",
+    "Não houve testemunhas presenciais do fato narrado.",
+    "As partes foram orientadas sobre os procedimentos a seguir.",
+    "O valor envolvido na operação ainda está sendo apurado.",
+    "Foram juntados aos autos os documentos apresentados na ocasião.",
+    "A diligência foi realizada no período da tarde, sem intercorrências.",
+    "O caso segue em análise pela equipe de investigação.",
+    "Nada mais havendo a declarar, encerrou-se o presente termo.",
+]
+
+# Tipo de entidade esperado para cada slot (CEP e cidade são ENDEREÇO no projeto)
+SLOT_ENTITY = {"CEP": "ENDEREÇO", "CIDADE": "ENDEREÇO"}
+
+SLOT = re.compile(r"\{([A-ZÇÃ_]+)\}")
+
+
+def cpf(rng: random.Random) -> str:
+    """CPF with valid check digits, formatted or not"""
+    digits = [rng.randrange(10) for _ in range(9)]
+    for length in (9, 10):
+        total = sum(d * (length + 1 - i) for i, d in enumerate(digits[:length]))
+        digits.append((total * 10 % 11) % 10)
+    text = "".join(map(str, digits))
+    if rng.random() < 0.8:
+        return f"{text[:3]}.{text[3:6]}.{text[6:9]}-{text[9:]}"
+    return text
+
+
+def value(slot: str, rng: random.Random) -> str:
+    if slot == "PERSON":
+        return f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+    if slot == "CPF":
+        return cpf(rng)
+    if slot == "CEP":
+        return f"{rng.randrange(10000, 99999)}-{rng.randrange(1000):03d}"
+    if slot == "ENDEREÇO":
+        return f"{rng.choice(STREET_TYPES)} {rng.choice(STREET_NAMES)}, {rng.randrange(1, 3000)}"
+    if slot == "CIDADE":
+        city, state = rng.choice(CITIES)
+        return f"{city} - {state}" if rng.random() < 0.5 else f"{city}/{state}"
+    if slot == "ESCOLA":
+        return rng.choice(SCHOOLS)
+    if slot == "EMAIL_ADDRESS":
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        user = f"{first}.{last}".lower().replace(" ", "")
+        return f"{user}{rng.randrange(100)}@{rng.choice(DOMAINS)}"
+    if slot == "PHONE_NUMBER":
+        return f"({rng.choice(AREA_CODES)}) 9{rng.randrange(1000, 9999)}-{rng.randrange(10000):04d}"
+    raise ValueError(f"Slot desconhecido: {slot}")
+
+
+def document(rng: random.Random, size: int, density: float) -> Dict:
+    """One document of about ``size`` characters with its gold spans"""
+    parts: List[str] = []
+    spans = []
+    length = 0
+    sentences = 0
+    while length < size:
+        if sentences and sentences % 4 == 0:
+            parts.append("\n\n")
+            length += 2
+        elif sentences:
+            parts.append(" ")
+            length += 1
+        sentences += 1
+
+        if rng.random() >= density:
+            sentence = rng.choice(FILLER)
+            parts.append(sentence)
+            length += len(sentence)
+            continue
+
+        template = rng.choice(TEMPLATES)
+        last = 0
+        for match in SLOT.finditer(template):
+            literal = template[last:match.start()]
+            parts.append(literal)
+            length += len(literal)
+            slot = match.group(1)
+            text = value(slot, rng)
+            spans.append({"start": length, "end": length + len(text), "entity_type": SLOT_ENTITY.get(slot, slot)})
+            parts.append(text)
+            length += len(text)
+            last = match.end()
+        parts.append(template[last:])
+        length += len(template) - last
+
+    return {"text": "".join(parts), "spans": spans}
+
+
+def generate(docs: int = 100, size: int = 2000, density: float = 0.5, seed: int = 0) -> List[Dict]:
+    """Corpus of ``docs`` documents; ``density`` is the fraction of sentences with PII"""
+    rng = random.Random(seed)
+    return [document(rng, size, density) for _ in range(docs)]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2000, help="caracteres por documento (aproximado)")
+    parser.add_argument("--density", type=float, default=0.5, help="fração de sentenças com PII")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="arquivo JSONL (padrão: stdout)")
+    args = parser.parse_args(argv)
+
+    out = open(args.output, "w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        for doc in generate(args.docs, args.size, args.density, args.seed):
+            out.write(json.dumps(doc, ensure_ascii=False) + "\n")
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+
+if __name__ == "__main__":
+    main()
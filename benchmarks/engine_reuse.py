@@ -0,0 +1,71 @@
+"""Per-request latency of rebuilding the engines vs reusing ``Anonymizer``.
+
+Both sides analyze the whole text with every recognizer; the reused
+``Anonymizer`` runs in ``"full"`` mode with the result cache off, so only
+the engine lifecycle differs.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.engine_reuse --requests 50
+"""
+import argparse
+import statistics
+import time
+
+from presidio_analyzer import AnalyzerEngine
+from presidio_anonymizer import AnonymizerEngine
+
+from tools.anonimization import Anonymizer, registry, nlp_engine_with_portuguese
+
+
+def rebuild_per_call(text):
+    """Old behaviour: both engines are created for every request"""
+    analyzer = AnalyzerEngine(
+        registry=registry,
+        supported_languages=["en", "pt"],
+        nlp_engine=nlp_engine_with_portuguese
+    )
+    results = analyzer.analyze(text=text, language="pt")
+    return AnonymizerEngine().anonymize(text=text, analyzer_results=results).text
+
+
+def measure(func, text, n):
+    latencies = []
+    for _ in range(n):
+        start = time.perf_counter()
+        func(text)
+        latencies.append((time.perf_counter() - start) * 1000)
+    latencies.sort()
+    return {
+        "mean_ms": statistics.mean(latencies),
+        "p50_ms": latencies[len(latencies) // 2],
+        "p95_ms": latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--file", default="texto_exemplo.txt")
+    args = parser.parse_args()
+
+    with open(args.file, encoding="utf-8") as f:
+        text = f.read()
+
+    service = Anonymizer(cache=False, mode="full").warm_up()
+    anonymizer_engine = AnonymizerEngine()
+
+    def reuse(t):
+        results = service.analyze(t)
+        return anonymizer_engine.anonymize(text=t, analyzer_results=results).text
+
+    # Same input, same output: only the engine lifecycle differs
+    assert rebuild_per_call(text) == reuse(text)
+
+    for label, func in (("rebuild", rebuild_per_call), ("reuse", reuse)):
+        stats = measure(func, text, args.requests)
+        print(f"{label:8s} mean={stats['mean_ms']:.2f}ms p50={stats['p50_ms']:.2f}ms p95={stats['p95_ms']:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""Compara perfis de pipeline e tamanhos de modelo do spaCy: carga, velocidade, memória e recall.
+
+Every combination of ``pipeline_profiles`` (from ``LANGUAGES_CONFIG_FILE``)
+and model size runs in its own process, so load time and peak RSS are not
+mixed up. Each process times the engine load and runs ``benchmarks.suite``
+on the same corpus. Sizes whose models are not installed are skipped.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.pipeline_profiles --docs 100 --size 2000
+    python -m benchmarks.pipeline_profiles --profiles full slim --sizes sm lg --output profiles.json
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+import spacy
+import yaml
+
+import config
+from tools.nlp import MODEL_SIZES
+
+
+def installed(model_name: str) -> bool:
+    return spacy.util.is_package(model_name) or os.path.isdir(model_name)
+
+
+def run_single(profile: str, size: str, output: str, suite_args):
+    """Child process: load the engine with one combination and run the suite"""
+    config.PIPELINE_PROFILE = profile
+    config.MODEL_SIZE = size
+    started = time.perf_counter()
+    # Os modelos só carregam no primeiro uso, por isso o aquecimento entra na conta
+    from tools.anonimization import get_anonymizer
+    get_anonymizer().warm_up()
+    load_s = time.perf_counter() - started
+
+    from benchmarks import suite
+    result = suite.main(suite_args + ["--output", output])
+    result["meta"]["load_s"] = round(load_s, 2)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(result, f, ensure_ascii=False, indent=2)
+
+
+def row(profile, size, result):
+    stages = result["stages"]
+    quality = result["quality"]
+    return {
+        "profile": profile,
+        "size": size,
+        "load_s": result["meta"]["load_s"],
+        "peak_rss_mb": stages["anonymize_text"]["peak_rss_mb"],
+        "spacy_docs_per_s": stages["spacy"]["docs_per_s"],
+        "anonymize_docs_per_s": stages["anonymize_text"]["docs_per_s"],
+        "person_recall": quality.get("PERSON", {}).get("recall"),
+        "total_recall": quality["TOTAL"]["recall"],
+        "total_precision": quality["TOTAL"]["precision"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--profiles", nargs="+", help="perfis a comparar (padrão: todos)")
+    parser.add_argument("--sizes", nargs="+", choices=MODEL_SIZES, default=list(MODEL_SIZES))
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="salva a tabela em JSON")
+    parser.add_argument("--single", nargs=3, metavar=("PROFILE", "SIZE", "OUTPUT"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    suite_args = ["--docs", str(args.docs), "--size", str(args.size), "--seed", str(args.seed)]
+    if args.single:
+        run_single(*args.single, suite_args)
+        return
+
+    with open(config.LANGUAGES_CONFIG_FILE, encoding="utf-8") as f:
+        conf = yaml.safe_load(f)
+    profiles = args.profiles or list(conf.get("pipeline_profiles", {"full": []}))
+
+    rows = []
+    for size in args.sizes:
+        missing = [m["model_name"].replace("{size}", size) for m in conf["models"]
+                   if not installed(m["model_name"].replace("{size}", size))]
+        if missing:
+            print(f"Pulando tamanho {size}: modelos não instalados ({', '.join(missing)})")
+            continue
+        for profile in profiles:
+            with tempfile.TemporaryDirectory() as tmp:
+                output = os.path.join(tmp, "result.json")
+                command = [sys.executable, "-m", "benchmarks.pipeline_profiles", *suite_args,
+                           "--single", profile, size, output]
+                completed = subprocess.run(command, stdout=subprocess.DEVNULL)
+                if completed.returncode != 0:
+                    print(f"Falha em {profile}/{size} (código {completed.returncode})")
+                    continue
+                with open(output, encoding="utf-8") as f:
+                    rows.append(row(profile, size, json.load(f)))
+
+    print(f"\n{'perfil':8s} {'tam':4s} {'carga':>7s} {'rss':>8s} {'spacy/s':>8s} {'anon/s':>8s} "
+          f"{'rec PER':>8s} {'rec TOT':>8s} {'prec TOT':>8s}")
+    for r in rows:
+        print(f"{r['profile']:8s} {r['size']:4s} {r['load_s']:6.1f}s {r['peak_rss_mb']!s:>6s}MB "
+              f"{r['spacy_docs_per_s']:8.1f} {r['anonymize_docs_per_s']:8.1f} "
+              f"{r['person_recall']!s:>8s} {r['total_recall']!s:>8s} {r['total_precision']!s:>8s}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(rows, f, ensure_ascii=False, indent=2)
+    return rows
+
+
+if __name__ == "__main__":
+    main()
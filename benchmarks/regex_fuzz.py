@@ -0,0 +1,134 @@
+"""Adversarial inputs for the regex recognizers: worst-case time per KB.
+
+Generates (with a fixed seed) texts built to trigger backtracking, such as
+long runs of letters and spaces with no final separator, repeated
+logradouro keywords, school names that never end and long digit runs,
+plus random mutations of them. Each recognizer analyzes every input at
+several sizes. The script fails (exit code 1) when the worst time per KB
+of any recognizer exceeds its limit: ``--max-ms-per-kb`` for the
+recognizers of this repository, ``LIMITS`` for Presidio's, which are
+linear but slower (``PhoneRecognizer`` runs ``phonenumbers``, not a regex).
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.regex_fuzz --sizes 1 4 16 --max-ms-per-kb 50
+"""
+import argparse
+import random
+import sys
+import time
+
+from presidio_analyzer.predefined_recognizers import EmailRecognizer, PhoneRecognizer
+
+from tools.recognizers.cpf import CPFRecognizer
+from tools.recognizers.endereços import EnderecoRecognizer
+from tools.recognizers.escola import EscolaRecognizer
+
+WORDS = ["flores", "das", "são", "joão", "ação", "de", "maria", "centro", "x"]
+
+
+def letters_and_spaces(rng, size):
+    """Cidade Estado e afins: letras e espaços sem o '-'/'/' final"""
+    return _fill(rng, size, lambda: rng.choice(WORDS) + " ")
+
+
+def repeated_keywords(rng, size):
+    """Um logradouro atrás do outro, sem número no final"""
+    return _fill(rng, size, lambda: rng.choice(["rua ", "avenida ", "na rua ", "travessa ", "situada na rua "]))
+
+
+def endless_school(rng, size):
+    """Nome de escola que nunca termina"""
+    return "Colégio " + _fill(rng, size, lambda: rng.choice(["Abc ", "Santo ", "Escola Municipal ", "x "]))
+
+
+def separators(rng, size):
+    """Endereço com vírgulas e dígitos, mas sem a última parte"""
+    return _fill(rng, size, lambda: rng.choice(["rua flores, ", "12, ", "centro ", ", ", "- "]))
+
+
+def digits(rng, size):
+    """CPF, telefone e CEP: dígitos, pontos e hífens sem formato válido"""
+    return _fill(rng, size, lambda: rng.choice(["123", ".", "-", "4567", " ", "(21)", "@"]))
+
+
+def emails(rng, size):
+    """Muitos pedaços de e-mail sem domínio válido"""
+    return _fill(rng, size, lambda: rng.choice(["joao.silva", "@", ".", "_", "maria-", "x"]))
+
+
+# Limites próprios (ms/KB) dos reconhecedores do Presidio, com folga sobre o medido
+LIMITS = {
+    "EmailRecognizer": 100.0,
+    "PhoneRecognizer": 250.0,
+}
+
+GENERATORS = [letters_and_spaces, repeated_keywords, endless_school, separators, digits, emails]
+
+
+def _fill(rng, size, piece):
+    parts = []
+    length = 0
+    while length < size:
+        part = piece()
+        parts.append(part)
+        length += len(part)
+    return "".join(parts)[:size]
+
+
+def mutate(rng, text, n=5):
+    """Troca alguns caracteres por separadores que completam parte dos padrões"""
+    chars = list(text)
+    for _ in range(n):
+        chars[rng.randrange(len(chars))] = rng.choice(["-", "/", ",", "1", "\n", "º"])
+    return "".join(chars)
+
+
+def recognizers():
+    return [
+        EnderecoRecognizer(),
+        EscolaRecognizer(),
+        CPFRecognizer(),
+        EmailRecognizer(supported_language="pt"),
+        PhoneRecognizer(supported_language="pt"),
+    ]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1, 4, 16], help="tamanhos em KB")
+    parser.add_argument("--mutations", type=int, default=3, help="variações aleatórias por entrada")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ms-per-kb", type=float, default=50.0)
+    args = parser.parse_args(argv)
+
+    rng = random.Random(args.seed)
+    inputs = []
+    for generator in GENERATORS:
+        for size in args.sizes:
+            text = generator(rng, size * 1024)
+            inputs.append((generator.__name__, size, text))
+            for i in range(args.mutations):
+                inputs.append((f"{generator.__name__}~{i}", size, mutate(rng, text)))
+
+    failed = False
+    for recognizer in recognizers():
+        # Primeira chamada compila os regex (e carrega metadados do phonenumbers)
+        recognizer.analyze("Rua das Flores, 123 - RJ", entities=recognizer.supported_entities)
+        worst = (0.0, None, None)
+        for label, size, text in inputs:
+            start = time.perf_counter()
+            recognizer.analyze(text, entities=recognizer.supported_entities)
+            ms_per_kb = (time.perf_counter() - start) * 1000 / size
+            if ms_per_kb > worst[0]:
+                worst = (ms_per_kb, label, size)
+        ok = worst[0] <= LIMITS.get(recognizer.name, args.max_ms_per_kb)
+        failed = failed or not ok
+        print(f"{recognizer.name:20s} pior={worst[0]:8.2f}ms/KB em {worst[1]} ({worst[2]}KB) "
+              f"{'ok' if ok else 'FALHOU'}")
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
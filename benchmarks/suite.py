@@ -0,0 +1,254 @@
+"""Benchmark reprodutível: velocidade, memória e qualidade sobre o corpus sintético.
+
+Measures, on a corpus from ``benchmarks.corpus`` (generated from a seed or
+read from a JSONL file):
+
+- ``stages``: throughput and p50/p95/p99 latency of the spaCy stage alone,
+  of every recognizer in ``tools/recognizers/`` and of the full
+  ``anonymize_text`` pipeline, with the process peak RSS after each one;
+- ``quality``: precision and recall of the replaced spans against the gold
+  spans, per entity type. A prediction counts when it overlaps a gold span
+  of the same type; exact matches are reported separately.
+
+The result cache is off unless ``--cache`` is given, so every run measures
+real work. Results are printed and, with ``--output``, saved as JSON;
+``--compare`` prints the difference to a previous JSON.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.suite --docs 200 --size 2000 --output bench.json
+    python -m benchmarks.suite --docs 200 --size 2000 --compare bench.json
+"""
+import argparse
+import importlib
+import inspect
+import json
+import logging
+import pkgutil
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from collections import defaultdict
+from datetime import datetime, timezone
+
+from presidio_analyzer import EntityRecognizer
+
+import tools.recognizers
+from benchmarks.corpus import generate
+from tools.anonimization import Anonymizer
+from tools.recognizers.gazetteer import load_gazetteers
+from tools.cache import fingerprint
+from tools.spans import resolve_spans
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+
+def peak_rss_mb():
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss é em KB no Linux e em bytes no macOS
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def percentile(sorted_values, q):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * q))]
+
+
+def measure(func, docs):
+    """Run ``func(doc)`` over every document and summarize the latencies"""
+    latencies = []
+    started = time.perf_counter()
+    for doc in docs:
+        start = time.perf_counter()
+        func(doc)
+        latencies.append((time.perf_counter() - start) * 1000)
+    elapsed = time.perf_counter() - started
+    latencies.sort()
+    chars = sum(len(doc["text"]) for doc in docs)
+    return {
+        "docs_per_s": round(len(docs) / elapsed, 2),
+        "chars_per_s": round(chars / elapsed),
+        "mean_ms": round(statistics.mean(latencies), 3),
+        "p50_ms": round(percentile(latencies, 0.50), 3),
+        "p95_ms": round(percentile(latencies, 0.95), 3),
+        "p99_ms": round(percentile(latencies, 0.99), 3),
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+
+def project_recognizers():
+    """One instance of every recognizer class defined in ``tools/recognizers/``"""
+    recognizers = []
+    for module_info in pkgutil.iter_modules(tools.recognizers.__path__):
+        module = importlib.import_module(f"tools.recognizers.{module_info.name}")
+        for _, cls in inspect.getmembers(module, inspect.isclass):
+            if (cls.__module__ != module.__name__ or not issubclass(cls, EntityRecognizer)
+                    or cls.__name__.startswith(("Prefiltered", "Gazetteer"))):
+                continue
+            try:
+                recognizers.append(cls())
+            except Exception as e:
+                logger.warning("Pulando %s: %s", cls.__name__, e)
+    # Dicionários: um reconhecedor por arquivo em GAZETTEER_DIR
+    recognizers.extend(load_gazetteers())
+    return recognizers
+
+
+def overlaps(a, b):
+    return a["start"] < b["end"] and b["start"] < a["end"]
+
+
+def quality(docs, predictions):
+    """Precision/recall per entity type, by span overlap and by exact match"""
+    counts = defaultdict(lambda: {"predicted": 0, "gold": 0, "tp_predicted": 0, "tp_gold": 0, "exact": 0})
+    for doc, predicted in zip(docs, predictions):
+        for entity_type in {s["entity_type"] for s in doc["spans"]} | {p["entity_type"] for p in predicted}:
+            gold = [s for s in doc["spans"] if s["entity_type"] == entity_type]
+            found = [p for p in predicted if p["entity_type"] == entity_type]
+            c = counts[entity_type]
+            c["predicted"] += len(found)
+            c["gold"] += len(gold)
+            c["tp_predicted"] += sum(any(overlaps(p, g) for g in gold) for p in found)
+            c["tp_gold"] += sum(any(overlaps(p, g) for p in found) for g in gold)
+            exact = {(g["start"], g["end"]) for g in gold}
+            c["exact"] += sum((p["start"], p["end"]) in exact for p in found)
+
+    report = {}
+    totals = defaultdict(int)
+    for entity_type, c in sorted(counts.items()):
+        for name, count in c.items():
+            totals[name] += count
+        report[entity_type] = _scores(c)
+    report["TOTAL"] = _scores(totals)
+    return report
+
+
+def _scores(c):
+    return {
+        "precision": round(c["tp_predicted"] / c["predicted"], 4) if c["predicted"] else None,
+        "recall": round(c["tp_gold"] / c["gold"], 4) if c["gold"] else None,
+        "exact_precision": round(c["exact"] / c["predicted"], 4) if c["predicted"] else None,
+        "predicted": c["predicted"],
+        "gold": c["gold"],
+    }
+
+
+def git_revision():
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True,
+                                text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"],
+                                    capture_output=True, text=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def load_corpus(path):
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def compare(current, previous):
+    """Print the relative change of every stage metric and quality score"""
+    print(f"\nComparação com {previous['meta'].get('commit')} ({previous['meta'].get('timestamp')}):")
+    for name, stats in current["stages"].items():
+        old = previous["stages"].get(name)
+        if not old:
+            continue
+        changes = []
+        for metric in ("docs_per_s", "p50_ms", "p95_ms", "p99_ms"):
+            if old.get(metric):
+                changes.append(f"{metric}={(stats[metric] / old[metric] - 1) * 100:+.1f}%")
+        print(f"  {name:32s} {' '.join(changes)}")
+    for entity_type, scores in current["quality"].items():
+        old = previous["quality"].get(entity_type, {})
+        deltas = [f"{metric}={scores[metric] - old[metric]:+.4f}"
+                  for metric in ("precision", "recall")
+                  if scores.get(metric) is not None and old.get(metric) is not None]
+        print(f"  {entity_type:32s} {' '.join(deltas)}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="corpus JSONL de benchmarks.corpus (padrão: gerar)")
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--cache", action="store_true", help="mantém o cache de resultados ligado")
+    parser.add_argument("--entities", nargs="+", help="só estes tipos no pipeline completo (padrão: todos)")
+    parser.add_argument("--output", help="salva o resultado em JSON")
+    parser.add_argument("--compare", help="JSON de uma execução anterior")
+    args = parser.parse_args(argv)
+
+    docs = load_corpus(args.corpus) if args.corpus else generate(args.docs, args.size, args.density, args.seed)
+
+    anonymizer = Anonymizer(cache=args.cache).warm_up()
+
+    stages = {}
+    artifacts = []
+
+    def spacy_stage(doc):
+        artifacts.append(anonymizer.nlp_engine.process_text(doc["text"], "pt"))
+
+    stages["spacy"] = measure(spacy_stage, docs)
+    artifacts_by_doc = {id(doc): a for doc, a in zip(docs, artifacts)}
+
+    for recognizer in project_recognizers():
+        recognizer.load()
+        stages[f"recognizer:{recognizer.name}"] = measure(
+            lambda doc: recognizer.analyze(doc["text"], recognizer.supported_entities, artifacts_by_doc[id(doc)]),
+            docs
+        )
+
+    stages["anonymize_text"] = measure(lambda doc: anonymizer.anonymize(doc["text"], entities=args.entities), docs)
+
+    predictions = []
+    for doc in docs:
+        spans = resolve_spans(doc["text"], anonymizer.analyze(doc["text"], entities=args.entities))
+        predictions.append([{"entity_type": entity_type, "start": start, "end": end}
+                            for start, end, entity_type, _ in spans])
+
+    result = {
+        "meta": {
+            **git_revision(),
+            "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "config_fingerprint": fingerprint(anonymizer.registry, anonymizer.nlp_engine),
+            "corpus": args.corpus or {"docs": args.docs, "size": args.size, "density": args.density, "seed": args.seed},
+            "chars": sum(len(doc["text"]) for doc in docs),
+            "cache": args.cache,
+            "entities": args.entities,
+        },
+        "stages": stages,
+        "quality": quality(docs, predictions),
+    }
+
+    for name, stats in stages.items():
+        print(f"{name:32s} {stats['docs_per_s']:8.1f} docs/s p50={stats['p50_ms']:8.2f}ms "
+              f"p95={stats['p95_ms']:8.2f}ms p99={stats['p99_ms']:8.2f}ms rss={stats['peak_rss_mb']}MB")
+    for entity_type, scores in result["quality"].items():
+        print(f"{entity_type:32s} precision={scores['precision']} recall={scores['recall']} "
+              f"exact={scores['exact_precision']} ({scores['predicted']}/{scores['gold']})")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            compare(result, json.load(f))
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Tabela anonimizada linha a linha x coluna a coluna com valores distintos.
+
+Builds a table with the columns of a typical school record (name, CPF,
+email, city, school) from ``benchmarks.corpus`` values, cities and
+schools repeating heavily and names, CPFs and emails drawn from larger
+pools, and times, with the result cache off:
+
+- ``rows``: every cell of every column through ``anonymize_batch``;
+- ``tables``: ``tools.tables.anonymize_table`` with the same policies.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.tables --rows 5000 --pool 500
+"""
+import argparse
+import random
+import time
+
+import pyarrow as pa
+
+from benchmarks.corpus import value
+from tools.anonimization import Anonymizer
+from tools.tables import anonymize_table
+
+POLICIES = {"nome": "ner", "cpf": "regex", "email": "regex", "cidade": "ner", "escola": "ner"}
+SLOTS = {"nome": "PERSON", "cpf": "CPF", "email": "EMAIL_ADDRESS", "cidade": "CIDADE", "escola": "ESCOLA"}
+
+
+def table(rows: int, pool: int, seed: int) -> pa.Table:
+    """``rows`` records whose values come from ``pool`` distinct values per column"""
+    rng = random.Random(seed)
+    pools = {column: [value(slot, rng) for _ in range(pool)] for column, slot in SLOTS.items()}
+    return pa.table({column: [rng.choice(values) for _ in range(rows)] for column, values in pools.items()})
+
+
+def per_row(anonymizer: Anonymizer, data: pa.Table) -> float:
+    started = time.perf_counter()
+    for column, policy in POLICIES.items():
+        entities = None if policy == "ner" else anonymizer.tier_entities(None)[0]
+        anonymizer.anonymize_batch(data.column(column).to_pylist(), entities=entities)
+    return time.perf_counter() - started
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=2000)
+    parser.add_argument("--pool", type=int, default=200, help="valores distintos por coluna")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    data = table(args.rows, args.pool, args.seed)
+    anonymizer = Anonymizer(cache=False).warm_up()
+
+    rows_seconds = per_row(anonymizer, data)
+    started = time.perf_counter()
+    anonymize_table(data, POLICIES, anonymizer=anonymizer)
+    tables_seconds = time.perf_counter() - started
+
+    report = {"rows": round(args.rows / rows_seconds, 1), "tables": round(args.rows / tables_seconds, 1)}
+    print(f"{args.rows} linhas, {args.pool} valores distintos por coluna: linha a linha={report['rows']} linhas/s  "
+          f"por valor distinto={report['tables']} linhas/s  ({rows_seconds / tables_seconds:.1f}x)")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""Modo completo x modo em camadas: velocidade, revocação e textos que chegam ao NER.
+
+Runs both ``ANALYSIS_MODE`` values over the same corpus, with the result
+cache off:
+
+- ``docs``: documents from ``benchmarks.corpus`` (prose with PII);
+- ``records``: short CSV-like records with CPFs, emails and phones only,
+  the case the regex tier is meant for (``--records``).
+
+For each mode it reports the throughput of ``analyze`` one document at a
+time and of ``analyze_batch``, precision/recall per entity type (as in
+``benchmarks.suite``) and, for the tiered mode, the share of texts and of
+characters that reached the NER tier and the share of gold NER entities
+(``PERSON``) inside the paragraphs sent to it: the recall the heuristic
+lets through, whatever the spaCy model.
+
+Uso (a partir da raiz do repositório):
+
+    python -m benchmarks.tiers --docs 200 --density 0.5 --records 1000
+"""
+import argparse
+import random
+import time
+
+from benchmarks.corpus import generate, value
+from benchmarks.suite import load_corpus, measure, quality
+from tools.anonimization import Anonymizer
+from tools.metrics import TIER_TEXTS
+from tools.spans import resolve_spans
+from tools.tiering import ner_paragraphs
+
+MODES = ("full", "tiered")
+RECORD_SLOTS = [("CPF", "CPF"), ("e-mail", "EMAIL_ADDRESS"), ("telefone", "PHONE_NUMBER")]
+
+
+def records(count: int, seed: int):
+    """``count`` records like "CPF ...; e-mail ...; telefone ..." with gold spans"""
+    rng = random.Random(seed)
+    docs = []
+    for _ in range(count):
+        parts, spans, length = [], [], 0
+        for label, slot in rng.sample(RECORD_SLOTS, rng.randint(1, len(RECORD_SLOTS))):
+            prefix = f"{'; ' if parts else ''}{label} "
+            text = value(slot, rng)
+            spans.append({"entity_type": slot, "start": length + len(prefix), "end": length + len(prefix) + len(text)})
+            parts.append(prefix + text)
+            length += len(prefix) + len(text)
+        docs.append({"text": "".join(parts), "spans": spans})
+    return docs
+
+
+def tier_counts():
+    return {tuple(labels)[0]: count for labels, count in TIER_TEXTS.snapshot()}
+
+
+def escalation(anonymizer: Anonymizer, docs, batch_results):
+    """Share of characters sent to NER and share of gold NER entities inside them"""
+    ner_entities = set(anonymizer.tier_entities(None)[1])
+    chars = covered = gold = 0
+    for doc, results in zip(docs, batch_results):
+        paragraphs = ner_paragraphs(doc["text"], [r for r in results if r.entity_type not in ner_entities])
+        chars += sum(len(paragraph) for _, paragraph in paragraphs)
+        for span in doc["spans"]:
+            if span["entity_type"] in ner_entities:
+                gold += 1
+                covered += any(offset <= span["start"] and span["end"] <= offset + len(paragraph)
+                               for offset, paragraph in paragraphs)
+    total_chars = sum(len(doc["text"]) for doc in docs)
+    return (round(chars / total_chars, 4) if total_chars else None,
+            round(covered / gold, 4) if gold else None)
+
+
+def run(anonymizer: Anonymizer, docs):
+    before = tier_counts()
+    single = measure(lambda doc: anonymizer.analyze(doc["text"]), docs)
+    after = tier_counts()
+    ner = after.get("ner", 0) - before.get("ner", 0)
+    total = sum(after.values()) - sum(before.values())
+
+    started = time.perf_counter()
+    batch_results = anonymizer.analyze_batch([doc["text"] for doc in docs])
+    batch_docs_per_s = len(docs) / (time.perf_counter() - started)
+
+    predictions = [[{"entity_type": entity_type, "start": start, "end": end}
+                    for start, end, entity_type, _ in resolve_spans(doc["text"], results)]
+                   for doc, results in zip(docs, batch_results)]
+    ner_chars, ner_coverage = escalation(anonymizer, docs, batch_results) if anonymizer.mode == "tiered" else (1.0, 1.0)
+    return {
+        "docs_per_s": single["docs_per_s"],
+        "p95_ms": single["p95_ms"],
+        "batch_docs_per_s": round(batch_docs_per_s, 2),
+        "ner_texts": round(ner / total, 4) if total else 1.0,
+        "ner_chars": ner_chars,
+        "ner_coverage": ner_coverage,
+        "quality": quality(docs, predictions),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="corpus JSONL de benchmarks.corpus (padrão: gerar)")
+    parser.add_argument("--docs", type=int, default=100)
+    parser.add_argument("--size", type=int, default=2000)
+    parser.add_argument("--density", type=float, default=0.5)
+    parser.add_argument("--records", type=int, default=500, help="registros curtos só com CPF/e-mail/telefone")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args(argv)
+
+    corpora = {
+        "docs": load_corpus(args.corpus) if args.corpus else generate(args.docs, args.size, args.density, args.seed),
+        "records": records(args.records, args.seed),
+    }
+    anonymizers = {mode: Anonymizer(cache=False, mode=mode).warm_up() for mode in MODES}
+
+    report = {}
+    for corpus, docs in corpora.items():
+        if not docs:
+            continue
+        for mode, anonymizer in anonymizers.items():
+            result = report[(corpus, mode)] = run(anonymizer, docs)
+            total = result["quality"]["TOTAL"]
+            person = result["quality"].get("PERSON", {})
+            print(f"{corpus:8s} {mode:7s} {result['docs_per_s']:9.1f} docs/s  lote={result['batch_docs_per_s']:9.1f} docs/s  "
+                  f"p95={result['p95_ms']:7.2f}ms  NER: textos={result['ner_texts']} "
+                  f"caracteres={result['ner_chars']} cobertura={result['ner_coverage']}  "
+                  f"recall={total['recall']} precision={total['precision']} PERSON recall={person.get('recall')}")
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,100 @@
 MODEL="Groq"
-AGENT=True
+AGENT=False  # Refinamento opcional via LLM, após a pseudonimização local
 LLM="llama3.3:70b-instruct-q2_K"
-LANGUAGES_CONFIG_FILE="./docs/analyzer/languages-config.yml"
\ No newline at end of file
+AGENT_CONCURRENCY=4  # chamadas simultâneas ao LLM
+AGENT_TIMEOUT=10.0  # prazo por chamada (s); ao expirar, mantém a pseudonimização local
+AGENT_WINDOW=40  # caracteres de contexto enviados ao redor de cada entidade
+AGENT_CACHE_SIZE=1024
+LANGUAGES_CONFIG_FILE="./docs/analyzer/languages-config.yml"
+# Perfil do pipeline spaCy (full, slim, ner) e tamanho dos modelos (sm, md, lg);
+# None usa os valores de LANGUAGES_CONFIG_FILE
+PIPELINE_PROFILE=None
+MODEL_SIZE=None
+# Snapshot dos modelos já perfilados, gerado com: python -m tools.nlp snapshot.
+# Carrega mais rápido (vetores mapeados em memória); None carrega os modelos
+ENGINE_SNAPSHOT_DIR=None  # ex.: "data/engine_snapshot"
+# Modo de análise: "full" passa todo texto pelo spaCy; "tiered" roda primeiro
+# só os reconhecedores por padrão e leva ao NER apenas os parágrafos com
+# indício de nome de pessoa (tools/tiering.py)
+ANALYSIS_MODE="full"
+
+# Processamento em lote (nlp.pipe)
+BATCH_SIZE=50
+N_PROCESS=1
+# Maior batch_size aceito na query string de POST /batch (n_process vai até os núcleos)
+MAX_BATCH_SIZE=1000
+
+# Documentos longos: acima deste tamanho o texto é analisado em blocos
+# sobrepostos (deve ficar abaixo do max_length do spaCy, 1.000.000)
+LONG_DOCUMENT_CHARS=100000
+CHUNK_OVERLAP=1000
+CHUNK_WORKERS=4
+
+# Pseudonimização local: <PERSON1>, <PERSON2>, <CPF1>...
+# "document" numera cada documento do zero; "global" mantém os mesmos
+# identificadores entre documentos do mesmo processo. O escopo global fica em
+# memória e é de cada processo: os workers do server.py e dos jobs numeram
+# cada um por conta própria
+PSEUDONYMIZE=True
+PSEUDONYM_SCOPE="document"
+PSEUDONYM_SCOPE_SIZE=100000  # valores lembrados pelo escopo global (os menos recentes são esquecidos)
+
+# Tempo máximo (s) de regex por reconhecedor em cada documento; ao esgotar,
+# o reconhecedor devolve o que encontrou até ali (None desativa o limite)
+REGEX_TIME_BUDGET=1.0
+
+# Cache de resultados do analisador por parágrafo (chave: HMAC do texto e da
+# configuração; muda sozinha quando reconhecedores ou config.py mudam).
+# Desligado por padrão porque muda os resultados: cada parágrafo é analisado
+# sozinho, então palavras de contexto em outro parágrafo não aumentam o score
+# e padrões (endereços, escolas) não casam através de quebras de linha.
+# A chave do HMAC vem da variável de ambiente CACHE_KEY (sem ela, uma
+# aleatória por execução do servidor)
+RESULT_CACHE=False
+CACHE_SIZE=10000  # parágrafos mantidos em memória
+CACHE_TTL=86400  # validade (s)
+CACHE_DB=None  # arquivo SQLite compartilhado entre processos (ex.: "cache.sqlite3"); None = só memória
+
+# Servidor de produção (server.py): o processo mestre carrega os modelos uma
+# vez e os workers compartilham essa memória (copy-on-write)
+SERVER_HOST="0.0.0.0"
+SERVER_PORT=5000
+SERVER_WORKERS=2
+MAX_CONTENT_LENGTH=20 * 1024 * 1024  # bytes por requisição
+
+# Itens (parágrafos ou registros) anonimizados por vez no endpoint /stream
+STREAM_BATCH_SIZE=8
+
+# Métricas (GET /metrics) e perfis amostrados das requisições mais lentas
+METRICS_DIR=None  # diretório compartilhado pelos workers do server.py (None = temporário)
+PROFILE_SAMPLE_RATE=0.0  # fração das requisições perfiladas (0 desliga)
+PROFILE_MODE="cprofile"  # "cprofile" ou "tracemalloc"
+PROFILE_DIR="profiles"
+PROFILE_KEEP=10  # quantos perfis (os mais lentos) manter
+
+# Cofre de reidentificação (tools/vault.py): guarda, cifrado, o valor original
+# de cada substituição. None desativa; a chave Fernet vem da variável de
+# ambiente VAULT_KEY (gere com: python -m tools.vault key)
+VAULT_DB=None  # ex.: "vault.sqlite3"
+
+# Dicionários de municípios, bairros e escolas (tools/recognizers/gazetteer.py),
+# gerados com: python -m tools.recognizers.gazetteer build <nome> <arquivo>.
+# Os que não tiverem arquivo neste diretório não são carregados
+GAZETTEER_DIR="data/gazetteers"
+
+# Jobs assíncronos (POST /jobs, tools/jobs.py): fila durável em SQLite dentro
+# de JOBS_DIR, com entrada e saída de cada job em disco
+JOBS_DIR="jobs"
+JOB_WORKERS=2  # processos que executam jobs (máximo de jobs simultâneos)
+JOB_MAX_PENDING=100  # jobs na fila além disso recebem 503
+JOB_MAX_ATTEMPTS=3  # tentativas antes de marcar o job como falho
+JOB_RETRY_DELAY=10.0  # espera (s) antes da 1ª nova tentativa; dobra a cada falha
+JOB_LEASE=300.0  # sem sinal do worker por esse tempo (s), o job volta para a fila
+JOB_BLOCK_SIZE=100  # registros (ou parágrafos) entre atualizações de progresso
+JOB_RETENTION=7 * 86400  # jobs concluídos ou falhos (e seus arquivos) são apagados depois disso (s)
+JOB_MAX_CONTENT_LENGTH=1024 * 1024 * 1024  # bytes por envio em POST /jobs
+
+# Tabelas (tools/tables.py): DataFrames e Parquet anonimizados coluna a coluna,
+# cada valor distinto uma única vez
+TABLE_BATCH_ROWS=65536  # linhas por lote Arrow
+TABLE_MEMO_SIZE=100000  # valores distintos lembrados por coluna entre lotes
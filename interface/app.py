@@ -1,6 +1,113 @@
 import streamlit as st
 import requests
+import csv
+import hashlib
+import io
 import json
+import re
+
+API_URL = "http://127.0.0.1:5000"
+
+# Mesma separação de parágrafos do servidor (tools/chunking.py)
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+
+
+@st.cache_resource
+def get_session() -> requests.Session:
+    """HTTP session shared by every rerun, so connections to the API are reused"""
+    session = requests.Session()
+    adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=8)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def stream_anonymization(**kwargs):
+    """Yield the NDJSON items of ``POST /stream`` as the API produces them
+
+    The read timeout applies between lines, not to the whole document.
+    """
+    with get_session().post(f"{API_URL}/stream", stream=True, timeout=(5, 120), **kwargs) as response:
+        if response.status_code != 200:
+            raise RuntimeError(f"Erro na API: {response.status_code} - {response.text}")
+        for line in response.iter_lines():
+            if not line:
+                continue
+            item = json.loads(line)
+            if "erro" in item:
+                raise RuntimeError(f"Erro na API: {item['erro']}")
+            yield item
+
+
+def split_paragraphs(text: str):
+    """``(offset, paragraph)`` pairs for the non-blank paragraphs of ``text``"""
+    paragraphs = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        if text[start:match.start()].strip():
+            paragraphs.append((start, text[start:match.start()]))
+        start = match.end()
+    if text[start:].strip():
+        paragraphs.append((start, text[start:]))
+    return paragraphs
+
+
+def post_json(path: str, payload: dict) -> dict:
+    response = get_session().post(f"{API_URL}{path}", json=payload, timeout=(5, 120))
+    if response.status_code != 200:
+        raise RuntimeError(f"Erro na API: {response.status_code} - {response.text}")
+    return response.json()
+
+
+def incremental_anonymization(text: str, cache: dict):
+    """Anonymize ``text`` analyzing only the paragraphs missing from ``cache``
+
+    ``cache`` maps the hash of a paragraph to its entities (offsets relative
+    to the paragraph); it is updated in place and trimmed to the paragraphs
+    of ``text``. The entities are shifted to document offsets and sent to
+    ``/anonymize``, which only replaces them, so the pseudonyms stay
+    consistent across the whole document. Returns ``(anonymized text,
+    reanalyzed paragraphs, total paragraphs)``.
+    """
+    paragraphs = [(offset, hashlib.sha256(paragraph.encode("utf-8")).hexdigest(), paragraph)
+                  for offset, paragraph in split_paragraphs(text)]
+    missing = {key: paragraph for _, key, paragraph in paragraphs if key not in cache}
+    if missing:
+        analyzed = post_json("/analyze", {"texts": list(missing.values())})["Resultados"]
+        cache.update(zip(missing, analyzed))
+
+    current = {key for _, key, _ in paragraphs}
+    for key in [key for key in cache if key not in current]:
+        del cache[key]
+
+    results = [dict(result, start=result["start"] + offset, end=result["end"] + offset)
+               for offset, key, _ in paragraphs for result in cache[key]]
+    anonymized = post_json("/anonymize", {"text": text, "results": results})["Texto anonimizado"]
+    return anonymized, len(missing), len(paragraphs)
+
+
+def error_message(error: Exception) -> str:
+    if isinstance(error, requests.exceptions.ConnectionError):
+        return f"❌ Erro: Não foi possível conectar à API. Certifique-se de que o servidor está rodando em {API_URL}/"
+    if isinstance(error, requests.exceptions.Timeout):
+        return "❌ Erro: Timeout na requisição. O processamento está demorando muito."
+    return f"❌ Erro ao processar: {error}"
+
+
+def build_file(filename: str, items) -> str:
+    """Rebuild the uploaded file from the streamed items"""
+    if filename.lower().endswith(".txt"):
+        return "".join(item["text"] for item in items)
+    records = [item["record"] for item in items]
+    if filename.lower().endswith(".csv"):
+        output = io.StringIO()
+        if records:
+            writer = csv.DictWriter(output, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+        return output.getvalue()
+    return "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in records)
+
 
 class AnonimizationUI:
 
@@ -13,8 +120,17 @@ class AnonimizationUI:
             **Instruções:**
             1. Digite ou cole o texto que deseja anonimizar na área de entrada
             2. Clique em "Anonimizar Texto" para processar
-            3. O resultado aparecerá na área de saída
+            3. O resultado aparecerá na área de saída, parágrafo a parágrafo
+            4. Para documentos grandes, envie um arquivo TXT, CSV ou JSONL
             """)
+
+            st.toggle(
+                "Reanalisar só parágrafos alterados",
+                value=True,
+                key="incremental",
+                help="Guarda as entidades de cada parágrafo e, após uma edição, "
+                     "envia para análise apenas os parágrafos que mudaram."
+            )
             
             st.markdown("---")
             
@@ -83,6 +199,8 @@ class AnonimizationUI:
             if clear_button:
                 st.session_state.input_text = ""
                 st.session_state.output_text = ""
+                st.session_state.analysis_cache = {}
+                st.session_state.last_reanalyzed = None
                 st.session_state.processing = False
                 st.rerun()
             
@@ -91,42 +209,47 @@ class AnonimizationUI:
                 st.session_state.processing = True
                 st.rerun()
             
-            # Show loading state
-            if st.session_state.get("processing", False):
-                with st.spinner("🔄 Processando texto... Isso pode levar alguns segundos."):
-                    try:
-                        # Call the anonymization API
-                        response = requests.post(
-                            "http://127.0.0.1:5000/",
-                            json={"text": st_input_text},
-                            timeout=30
+            # Incremental mode: only edited paragraphs go through the analyzer
+            if st.session_state.get("processing", False) and st.session_state.get("incremental", True):
+                try:
+                    with st.spinner("🔄 Processando texto..."):
+                        output, reanalyzed, total = incremental_anonymization(
+                            st_input_text, st.session_state.analysis_cache
                         )
-                        
-                        if response.status_code == 200:
-                            result = response.json()
-                            anonymized_result = result.get("Texto anonimizado", "")
-                            st.session_state.output_text = anonymized_result
-                            st.session_state.processing = False
-                            st.success("✅ Texto anonimizado com sucesso!")
-                            st.rerun()
-                        else:
-                            st.error(f"❌ Erro na API: {response.status_code} - {response.text}")
-                            st.session_state.processing = False
-                            st.session_state.output_text = ""
-                            
-                    except requests.exceptions.ConnectionError:
-                        st.error("❌ Erro: Não foi possível conectar à API. Certifique-se de que o servidor está rodando em http://127.0.0.1:5000/")
-                        st.session_state.processing = False
-                        st.session_state.output_text = ""
-                    except requests.exceptions.Timeout:
-                        st.error("❌ Erro: Timeout na requisição. O processamento está demorando muito.")
-                        st.session_state.processing = False
-                        st.session_state.output_text = ""
-                    except Exception as e:
-                        st.error(f"❌ Erro ao processar o texto: {str(e)}")
-                        st.session_state.processing = False
-                        st.session_state.output_text = ""
-            
+                    st.session_state.output_text = output
+                    st.session_state.last_reanalyzed = (reanalyzed, total)
+                except Exception as e:
+                    st.error(error_message(e))
+                    st.session_state.output_text = ""
+                    st.session_state.processing = False
+                else:
+                    st.session_state.processing = False
+                    st.rerun()
+
+            # Stream the result paragraph by paragraph
+            if st.session_state.get("processing", False):
+                progress = st.progress(0.0, text="🔄 Processando texto...")
+                partial = st.empty()
+                pieces = []
+                try:
+                    for item in stream_anonymization(json={"text": st_input_text}):
+                        pieces.append(item["text"])
+                        progress.progress((item["index"] + 1) / item["total"],
+                                          text=f"🔄 Parágrafo {item['index'] + 1} de {item['total']}")
+                        partial.text("".join(pieces))
+                    st.session_state.output_text = "".join(pieces)
+                except Exception as e:
+                    st.error(error_message(e))
+                    st.session_state.output_text = ""
+                    st.session_state.processing = False
+                else:
+                    st.session_state.processing = False
+                    st.rerun()
+
+            if st.session_state.get("incremental", True) and st.session_state.get("last_reanalyzed"):
+                reanalyzed, total = st.session_state.last_reanalyzed
+                st.caption(f"{reanalyzed} de {total} parágrafos reanalisados")
+
             # Display output
             output_text = st.session_state.get("output_text", "")
             st.text_area(
@@ -147,6 +270,46 @@ class AnonimizationUI:
                     use_container_width=True
                 )
 
+    def file_container(self):
+        """Upload of TXT, CSV or JSONL files, anonymized progressively"""
+        st.markdown("---")
+        st.subheader("📁 Anonimizar Arquivo")
+
+        uploaded = st.file_uploader(
+            "Envie um arquivo .txt, .csv ou .jsonl:",
+            type=["txt", "csv", "jsonl"]
+        )
+        column = st.text_input("Campo a anonimizar (CSV/JSONL):", value="text")
+
+        if st.button("🔒 Anonimizar Arquivo", disabled=uploaded is None):
+            progress = st.progress(0.0, text="🔄 Enviando arquivo...")
+            preview = st.empty()
+            items = []
+            try:
+                for item in stream_anonymization(files={"file": (uploaded.name, uploaded.getvalue())},
+                                                 data={"column": column}):
+                    items.append(item)
+                    progress.progress((item["index"] + 1) / item["total"],
+                                      text=f"🔄 Item {item['index'] + 1} de {item['total']}")
+                    if "text" in item:
+                        preview.text(item["text"])
+                    else:
+                        preview.json(item["record"])
+                st.session_state.file_output = build_file(uploaded.name, items)
+                st.session_state.file_output_name = f"anonimizado_{uploaded.name}"
+                st.success(f"✅ {len(items)} itens anonimizados!")
+            except Exception as e:
+                st.error(error_message(e))
+                st.session_state.file_output = ""
+
+        if st.session_state.get("file_output"):
+            st.download_button(
+                label="📥 Baixar Arquivo Anonimizado",
+                data=st.session_state.file_output,
+                file_name=st.session_state.file_output_name,
+                use_container_width=True
+            )
+
     def statistics_container(self):
         """Container to show anonymization statistics"""
         if st.session_state.get("output_text"):
@@ -188,10 +351,15 @@ class AnonimizationUI:
         if "processing" not in st.session_state:
             st.session_state.processing = False
 
+        # Entidades por parágrafo (hash do conteúdo), para o modo incremental
+        if "analysis_cache" not in st.session_state:
+            st.session_state.analysis_cache = {}
+
         # Render components
         self.sidebar()
         self.main_container()
         self.statistics_container()
+        self.file_container()
         
         # Footer
         st.markdown("---")
@@ -0,0 +1,143 @@
+"""Servidor de produção: um processo mestre carrega os modelos e faz fork dos workers.
+
+Uso (a partir da raiz do repositório):
+
+    python server.py --workers 4 --port 5000
+
+The master imports the app, warms up the engine once (which loads the
+Portuguese spaCy model; other languages would load on first use),
+then freezes the garbage collector (so the collector does not write to
+every shared object and break copy-on-write) and forks the workers. All
+workers accept connections on the same listening socket and serve
+requests in threads; the model memory stays shared between them. The
+master also forks ``--job-workers`` processes that run the asynchronous
+jobs of ``POST /jobs`` (see ``tools.jobs``). Dead workers are replaced,
+and SIGTERM/SIGINT stop every worker. Workers share a metrics directory
+so ``GET /metrics`` reports the whole server.
+
+On platforms without ``fork`` a single threaded server is started.
+"""
+import argparse
+import gc
+import logging
+import os
+import signal
+import socket
+import sys
+import tempfile
+import time
+
+from werkzeug.serving import make_server
+
+from config import SERVER_HOST, SERVER_PORT, SERVER_WORKERS, METRICS_DIR, JOB_WORKERS
+
+logger = logging.getLogger("server")
+
+
+def load_app():
+    """Import the Flask app and warm up the shared engine before any fork"""
+    from tools.startup import format_report, startup_stage
+    with startup_stage("import"):
+        from app import app
+        from tools.anonimization import get_anonymizer
+
+    get_anonymizer().warm_up()
+    logger.info("Inicialização: %s", format_report())
+    return app
+
+
+def serve_worker(app, listener: socket.socket):
+    """Serve requests forever on an already bound socket (runs in the child)"""
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    from tools.metrics import METRICS
+    METRICS.start_autosave()
+    host, port = listener.getsockname()[:2]
+    server = make_server(host, port, app, threaded=True, fd=listener.fileno())
+    server.serve_forever()
+
+
+def spawn(app, listener: socket.socket) -> int:
+    pid = os.fork()
+    if pid == 0:
+        try:
+            serve_worker(app, listener)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default=SERVER_HOST)
+    parser.add_argument("--port", type=int, default=SERVER_PORT)
+    parser.add_argument("--workers", type=int, default=SERVER_WORKERS)
+    parser.add_argument("--job-workers", type=int, default=JOB_WORKERS, help="processos para POST /jobs")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+
+    app = load_app()
+
+    if not hasattr(os, "fork"):
+        logger.info("fork indisponível: servidor único com threads em %s:%d", args.host, args.port)
+        make_server(args.host, args.port, app, threaded=True).serve_forever()
+        return
+
+    # Cada worker grava suas métricas aqui; /metrics soma todos
+    from tools.metrics import METRICS
+    METRICS.directory = METRICS_DIR or tempfile.mkdtemp(prefix="anonimizador-metrics-")
+    os.makedirs(METRICS.directory, exist_ok=True)
+    # O aquecimento não conta (senão apareceria uma vez por worker), nem
+    # arquivos deixados por uma execução anterior
+    METRICS.reset()
+
+    listener = socket.create_server((args.host, args.port), backlog=128)
+    listener.set_inheritable(True)
+
+    # Objetos criados até aqui (modelos, reconhecedores) ficam fora do GC,
+    # assim os workers não copiam as páginas compartilhadas ao coletar
+    gc.collect()
+    gc.freeze()
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    from tools.jobs import JobQueue, spawn_worker, stop_workers
+    queue = JobQueue()
+    workers = {spawn(app, listener) for _ in range(args.workers)}
+    job_workers = {spawn_worker(queue) for _ in range(args.job_workers)}
+    logger.info("%d workers atendendo em %s:%d, %d workers de jobs",
+                len(workers), args.host, args.port, len(job_workers))
+
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid:
+            # As métricas do worker encerrado passam para o total dos já encerrados
+            METRICS.retire(pid)
+        if pid and pid in workers:
+            workers.discard(pid)
+            logger.warning("Worker %d terminou (status %d); iniciando outro", pid, status)
+            workers.add(spawn(app, listener))
+        elif pid and pid in job_workers:
+            job_workers.discard(pid)
+            logger.warning("Worker de jobs %d terminou (status %d); iniciando outro", pid, status)
+            job_workers.add(spawn_worker(queue))
+        else:
+            time.sleep(0.5)
+
+    logger.info("Encerrando %d workers", len(workers) + len(job_workers))
+    stop_workers(list(workers) + list(job_workers))
+    listener.close()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Agente LLM (tools.agent.IdentificadorAgent) contra um modelo local de mentira."""
+import asyncio
+import json
+from types import SimpleNamespace
+
+import pytest
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+import tools.anonimization
+from tools.agent import IdentificadorAgent
+from tools.anonimization import Anonymizer
+
+TEXT = "Amanda falou com Amanda Ribeiro."
+RESULTS = [RecognizerResult("PERSON", 0, 6, 0.85), RecognizerResult("PERSON", 17, 31, 0.85)]
+SAME_PERSON = '{"0": "<PERSON1>", "1": "<PERSON1>"}'
+
+
+class StubModel:
+    """``ainvoke`` answering ``answer`` after ``delay`` seconds (or raising ``error``)"""
+
+    def __init__(self, answer=SAME_PERSON, delay=0.0, error=None):
+        self.answer = answer
+        self.delay = delay
+        self.error = error
+        self.calls = []
+        self.active = 0
+        self.peak = 0
+
+    async def ainvoke(self, messages):
+        self.calls.append(messages)
+        self.active += 1
+        self.peak = max(self.peak, self.active)
+        try:
+            await asyncio.sleep(self.delay)
+            if self.error is not None:
+                raise self.error
+            return SimpleNamespace(content=self.answer)
+        finally:
+            self.active -= 1
+
+
+class SyncStubModel:
+    """Only ``invoke``, like LangChain's plain LLM wrappers"""
+
+    def __init__(self, answer=SAME_PERSON):
+        self.answer = answer
+        self.calls = 0
+
+    def invoke(self, messages):
+        self.calls += 1
+        return self.answer
+
+
+def anonymize_with(monkeypatch, agent, text=TEXT, results=RESULTS):
+    monkeypatch.setattr(tools.anonimization, "AGENT", True)
+    monkeypatch.setattr(tools.anonimization, "get_agent", lambda: agent)
+    return Anonymizer(cache=False).anonymize_results(text, results)
+
+
+def spans(*values):
+    return [{"id": str(i), "tipo": "PERSON", "valor": value, "identificador": f"<PERSON{i + 1}>",
+             "contexto": f"[{value}]"} for i, value in enumerate(values)]
+
+
+def test_agent_refines_local_numbering(monkeypatch):
+    model = StubModel()
+    assert anonymize_with(monkeypatch, IdentificadorAgent(model)) == "<PERSON1> falou com <PERSON1>."
+    prompt = json.loads(model.calls[0][-1].content)
+    assert [span["valor"] for span in prompt] == ["Amanda", "Amanda Ribeiro"]
+    # O contexto vem do texto anonimizado: a outra entidade chega como placeholder
+    assert prompt[0]["contexto"] == "[Amanda] falou com <PERSON2>."
+
+
+def test_timeout_falls_back_to_local_pseudonymization(monkeypatch):
+    agent = IdentificadorAgent(StubModel(delay=1.0), timeout=0.05)
+    assert anonymize_with(monkeypatch, agent) == "<PERSON1> falou com <PERSON2>."
+
+
+def test_model_error_falls_back_to_local_pseudonymization(monkeypatch):
+    agent = IdentificadorAgent(StubModel(error=RuntimeError("provedor fora do ar")))
+    assert anonymize_with(monkeypatch, agent) == "<PERSON1> falou com <PERSON2>."
+
+
+def test_concurrency_is_bounded():
+    model = StubModel(answer="{}", delay=0.05)
+    agent = IdentificadorAgent(model, concurrency=2)
+    agent.refine_many([spans(f"Pessoa {i}") for i in range(6)])
+    assert len(model.calls) == 6
+    assert model.peak == 2
+
+
+def test_answers_are_cached_by_span_set():
+    model = StubModel()
+    agent = IdentificadorAgent(model, cache_size=1)
+    first = agent.refine_sync(spans("Amanda", "Amanda Ribeiro"))
+    assert agent.refine_sync(spans("AMANDA", "amanda ribeiro")) == first
+    assert len(model.calls) == 1
+    agent.refine_sync(spans("Bia"))
+    # Cache de tamanho 1: a primeira resposta saiu
+    agent.refine_sync(spans("Amanda", "Amanda Ribeiro"))
+    assert len(model.calls) == 3
+
+
+def test_failures_are_not_cached():
+    model = StubModel(error=RuntimeError("falhou"))
+    agent = IdentificadorAgent(model)
+    assert agent.refine_sync(spans("Amanda")) is None
+    assert agent.refine_sync(spans("Amanda")) is None
+    assert len(model.calls) == 2
+
+
+def test_sync_model_runs_in_a_thread():
+    model = SyncStubModel()
+    assert IdentificadorAgent(model).refine_sync(spans("Amanda", "Amanda Ribeiro")) == {
+        "0": "<PERSON1>", "1": "<PERSON1>"}
+    assert model.calls == 1
+
+
+@pytest.mark.parametrize("answer", [None, "", "sem JSON", "{não é json}", "[1, 2]"])
+def test_parse_rejects_malformed_answers(answer):
+    assert not IdentificadorAgent._parse(answer, spans("Amanda"))
+
+
+def test_parse_keeps_only_valid_placeholders_of_the_same_type():
+    answer = ('Claro! {"0": "<PERSON3>", "1": "<CPF1>", "2": "<PERSON>", "3": 7, "4": "PERSON1", '
+              '"9": "<PERSON9>"}')
+    assert IdentificadorAgent._parse(answer, spans("A", "B", "C", "D", "E", "F")) == {"0": "<PERSON3>"}
+
+
+def test_empty_span_list_skips_the_model():
+    model = StubModel()
+    assert IdentificadorAgent(model).refine_sync([]) is None
+    assert model.calls == []
@@ -0,0 +1,56 @@
+"""Cache de resultados (tools.cache): chaves HMAC e camada em SQLite."""
+import hashlib
+import sqlite3
+
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+from tools.cache import ResultCache
+from tools.tiering import TieredResults
+
+RESULTS = [RecognizerResult("CPF", 4, 18, 0.9)]
+
+
+def test_key_is_not_a_plain_hash():
+    cache = ResultCache("fp", path=None, key="segredo")
+    text = "CPF 123.456.789-09"
+    assert cache.key(text) != hashlib.sha256(f"fp\0{text}".encode("utf-8")).hexdigest()
+
+
+def test_key_depends_on_secret_and_entities():
+    text = "CPF 123.456.789-09"
+    same = ResultCache("fp", path=None, key="segredo")
+    assert ResultCache("fp", path=None, key="segredo").key(text) == same.key(text)
+    assert ResultCache("fp", path=None, key="outro").key(text) != same.key(text)
+    assert ResultCache("fp", path=None).key(text) != ResultCache("fp", path=None).key(text)
+    assert same.key(text, ["CPF"]) != same.key(text)
+
+
+def test_disk_tier_shared_by_caches_with_the_same_key(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = ResultCache("fp", path=path, key="segredo")
+    writer.put(writer.key("CPF 123.456.789-09"), RESULTS)
+
+    reader = ResultCache("fp", path=path, key="segredo")
+    cached = reader.get(reader.key("CPF 123.456.789-09"))
+    assert [(r.entity_type, r.start, r.end, r.score) for r in cached] == [("CPF", 4, 18, 0.9)]
+    assert reader.stats()["hits"] == 1 and reader.disk_hits == 1
+
+    stranger = ResultCache("fp", path=path, key="outro")
+    assert stranger.get(stranger.key("CPF 123.456.789-09")) is None
+
+
+def test_disk_tier_never_stores_the_text(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    cache = ResultCache("fp", path=path, key="segredo")
+    cache.put(cache.key("CPF 123.456.789-09"), RESULTS)
+    rows = sqlite3.connect(path).execute("SELECT key, value FROM results").fetchall()
+    assert rows and all("123.456" not in key + value for key, value in rows)
+
+
+def test_tier_is_cached_with_the_results():
+    cache = ResultCache("fp", path=None, key="segredo")
+    cache.put("k", TieredResults(RESULTS, "ner"))
+    cached = cache.get("k")
+    assert cached.tier == "ner" and len(cached) == 1
+    cache.put("plain", RESULTS)
+    assert cache.get("plain").tier is None
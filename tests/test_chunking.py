@@ -0,0 +1,105 @@
+"""Análise em blocos (tools.chunking) deve dar o mesmo resultado de uma passada única.
+
+Only pattern recognizers are used, so no spaCy model is needed.
+"""
+import re
+
+import pytest
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+from tools.chunking import analyze_in_chunks, split_text
+from tools.recognizers.cpf import CPFRecognizer
+from tools.recognizers.endereços import EnderecoRecognizer
+
+CPF = CPFRecognizer()
+ENDERECO = EnderecoRecognizer()
+FILLER = "texto sem dados pessoais aqui. "
+OVERLAP = 40
+
+
+def analyze(text):
+    return CPF.analyze(text, ["CPF"]) + ENDERECO.analyze(text, ["ENDEREÇO"])
+
+
+def spans(results):
+    return sorted((r.start, r.end, r.entity_type, r.score) for r in results)
+
+
+def document(*parts):
+    return FILLER * 3 + f" {FILLER * 3}".join(parts) + " " + FILLER * 3
+
+
+@pytest.mark.parametrize("max_chars", range(60, 200, 7))
+def test_chunks_match_single_pass(max_chars):
+    text = document("Ele mora na Rua das Flores, 123 desde sempre.", "O CPF 123.456.789-09 consta.")
+    assert len(text) > max_chars
+    assert spans(analyze_in_chunks(analyze, text, max_chars, OVERLAP)) == spans(analyze(text))
+
+
+def test_address_across_chunk_edge():
+    text = document("Ele mora na Rua das Flores, 123 desde sempre.")
+    address = next(r for r in analyze(text) if text[r.start:r.end] == "Rua das Flores, 123")
+    # Algum bloco termina no meio do endereço
+    for max_chars in range(60, 200):
+        if any(address.start < offset + len(chunk) < address.end for offset, chunk in split_text(text, max_chars, OVERLAP)):
+            break
+    else:
+        pytest.fail("nenhum tamanho de bloco corta o endereço")
+
+    results = analyze_in_chunks(analyze, text, max_chars, OVERLAP)
+    assert spans(results) == spans(analyze(text))
+
+
+def test_cpf_in_overlap_is_kept_once():
+    text = document("O CPF 123.456.789-09 consta.")
+    cpf = text.index("123.456.789-09")
+    for max_chars in range(60, 200):
+        chunks = split_text(text, max_chars, OVERLAP)
+        seen = [offset for offset, chunk in chunks if offset <= cpf and cpf + 14 <= offset + len(chunk)]
+        if len(seen) > 1:
+            break
+    else:
+        pytest.fail("nenhum tamanho de bloco põe o CPF na sobreposição")
+
+    results = analyze_in_chunks(analyze, text, max_chars, OVERLAP)
+    assert [(r.start, r.end) for r in results if r.entity_type == "CPF"] == [(cpf, cpf + 14)]
+    assert spans(results) == spans(analyze(text))
+
+
+def test_entity_longer_than_overlap_is_stitched():
+    run = re.compile(r"#+")
+
+    def analyze_runs(text):
+        return [RecognizerResult("RUN", m.start(), m.end(), 1.0) for m in run.finditer(text)]
+
+    text = "a " * 30 + "#" * 90 + " b" * 30
+    assert spans(analyze_in_chunks(analyze_runs, text, 50, 10)) == spans(analyze_runs(text))
+
+
+def test_short_text_is_analyzed_once():
+    text = "CPF 123.456.789-09"
+    assert spans(analyze_in_chunks(analyze, text, 100, OVERLAP)) == spans(analyze(text))
+
+
+def test_batch_analyzes_long_texts_in_chunks(monkeypatch):
+    import tools.anonimization
+    from tools.anonimization import Anonymizer
+
+    monkeypatch.setattr(tools.anonimization, "LONG_DOCUMENT_CHARS", 10)
+    anonymizer = Anonymizer(cache=False)
+    piped, chunked = [], []
+
+    class Pipe:
+        def analyze_iterator(self, texts, **kwargs):
+            piped.extend(texts)
+            return [[] for _ in texts]
+
+    def analyze_document(text, entities=None, explain=False):
+        chunked.append(text)
+        return [RecognizerResult("CPF", 0, 1, 0.9)]
+
+    anonymizer.batch_analyzer = Pipe()
+    monkeypatch.setattr(anonymizer, "_analyze_document", analyze_document)
+    results = anonymizer.analyze_batch(["curto", "um texto bem mais longo", "outro"])
+    assert piped == ["curto", "outro"] and chunked == ["um texto bem mais longo"]
+    assert [len(r) for r in results] == [0, 1, 0]
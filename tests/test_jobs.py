@@ -0,0 +1,162 @@
+"""Fila de jobs (tools.jobs.JobQueue): ordem, novas tentativas e lease."""
+import threading
+
+import pytest
+
+import tools.jobs
+from tools.jobs import JobQueue, LeaseLost, heartbeat
+
+LEASE = 60.0
+RETRY_DELAY = 10.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(tools.jobs.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    return JobQueue(str(tmp_path), lease=LEASE, max_attempts=3, retry_delay=RETRY_DELAY)
+
+
+def submit(queue, clock, name="entrada.txt"):
+    clock.now += 1
+    return queue.submit(name, lambda path: open(path, "w", encoding="utf-8").write("texto"))
+
+
+def test_claims_oldest_job_once(queue, clock):
+    first, second = submit(queue, clock), submit(queue, clock)
+    job = queue.claim(worker=1)
+    assert (job["id"], job["status"], job["attempts"], job["worker"]) == (first, "running", 1, 1)
+    assert queue.claim(worker=2)["id"] == second
+    assert queue.claim(worker=3) is None
+
+
+def test_failed_attempt_is_retried_with_backoff(queue, clock):
+    job_id = submit(queue, clock)
+    queue.fail(queue.claim(worker=1), "erro 1")
+    assert queue.get(job_id)["status"] == "queued"
+    clock.now += RETRY_DELAY - 1
+    assert queue.claim(worker=1) is None
+    clock.now += 1
+    job = queue.claim(worker=1)
+    assert job["attempts"] == 2
+    # A espera dobra a cada falha
+    queue.fail(job, "erro 2")
+    clock.now += 2 * RETRY_DELAY - 1
+    assert queue.claim(worker=1) is None
+    clock.now += 1
+    assert queue.claim(worker=1)["attempts"] == 3
+
+
+def test_last_attempt_fails_for_good(queue, clock):
+    job_id = submit(queue, clock)
+    for attempt in range(3):
+        job = queue.claim(worker=1)
+        queue.fail(job, f"erro {attempt}")
+        clock.now += 100 * RETRY_DELAY
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["error"]) == ("failed", 3, "erro 2")
+    assert queue.claim(worker=1) is None
+
+
+def test_expired_lease_is_claimed_again(queue, clock):
+    job_id = submit(queue, clock)
+    queue.claim(worker=1)
+    clock.now += LEASE - 1
+    assert queue.claim(worker=2) is None
+    clock.now += 2
+    job = queue.claim(worker=2)
+    assert (job["id"], job["worker"], job["attempts"]) == (job_id, 2, 2)
+
+
+def test_progress_renews_lease(queue, clock):
+    submit(queue, clock)
+    job = queue.claim(worker=1)
+    clock.now += LEASE - 1
+    queue.progress(job, 10, 100)
+    clock.now += LEASE - 1
+    assert queue.claim(worker=2) is None
+    assert queue.get(job["id"])["processed"] == 10
+
+
+def test_expired_lease_on_last_attempt_fails(queue, clock):
+    job_id = submit(queue, clock)
+    for _ in range(3):
+        queue.claim(worker=1)
+        clock.now += LEASE + 1
+    assert queue.claim(worker=2) is None
+    assert queue.get(job_id)["status"] == "failed"
+
+
+def test_release_does_not_count_the_attempt(queue, clock):
+    job_id = submit(queue, clock)
+    assert queue.release(queue.claim(worker=1))
+    job = queue.get(job_id)
+    assert (job["status"], job["attempts"], job["worker"]) == ("queued", 0, None)
+    assert queue.claim(worker=2)["attempts"] == 1
+
+
+def test_running_job_is_not_deleted(queue, clock):
+    job_id = submit(queue, clock)
+    job = queue.claim(worker=1)
+    assert not queue.delete(job_id)
+    assert queue.complete(job)
+    assert queue.delete(job_id)
+    assert queue.get(job_id) is None
+
+
+def test_stale_worker_cannot_update_the_job(queue, clock):
+    job_id = submit(queue, clock)
+    stale = queue.claim(worker=1)
+    clock.now += LEASE + 1
+    current = queue.claim(worker=2)
+    with pytest.raises(LeaseLost):
+        queue.progress(stale, 50)
+    assert not queue.heartbeat(stale)
+    assert not queue.complete(stale)
+    assert not queue.fail(stale, "erro")
+    assert not queue.release(stale)
+    job = queue.get(job_id)
+    assert (job["status"], job["worker"], job["processed"]) == ("running", 2, 0)
+    assert queue.complete(current)
+    assert queue.get(job_id)["status"] == "done"
+
+
+def test_heartbeat_keeps_the_lease(tmp_path):
+    queue = JobQueue(str(tmp_path), lease=0.3)
+    queue.submit("entrada.txt", lambda path: open(path, "w", encoding="utf-8").write("texto"))
+    job = queue.claim(worker=1)
+    with heartbeat(queue, job):
+        threading.Event().wait(0.8)
+        assert queue.claim(worker=2) is None
+    assert queue.get(job["id"])["worker"] == 1
+
+
+class NoAnalysis:
+    """Anonimizador que não deve chegar a ser chamado"""
+    vault = None
+    mode = "full"
+
+    def anonymize_batch(self, *args, **kwargs):
+        raise AssertionError("não deveria anonimizar")
+
+
+def test_csv_without_the_column_fails(queue, clock):
+    clock.now += 1
+    queue.submit("entrada.csv", lambda path: open(path, "w", encoding="utf-8").write("nome,cpf\nAna,1\n"),
+                  {"field": "texto"})
+    job = queue.claim(worker=1)
+    with pytest.raises(ValueError, match="Coluna 'texto'"):
+        tools.jobs.process(queue, job, NoAnalysis())
@@ -0,0 +1,55 @@
+"""Métricas somadas entre processos (tools.metrics): arquivos por PID e workers encerrados."""
+import os
+import subprocess
+import sys
+
+import pytest
+
+from tools.metrics import MetricsRegistry, _write_snapshot
+
+
+@pytest.fixture
+def registry(tmp_path):
+    registry = MetricsRegistry(str(tmp_path))
+    registry.counter("jobs_total", "Jobs", ["status"])
+    registry.histogram("seconds", "Duração", buckets=(1.0,))
+    return registry
+
+
+def dead_pid():
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+def worker_snapshot(done, seconds):
+    return {"jobs_total": [[["done"], done]], "seconds": [[[], [1, 0], seconds, 1]]}
+
+
+def collected(registry):
+    values = registry._collect()
+    return values["jobs_total"].get(("done",), 0), values["seconds"].get(())
+
+
+def test_files_of_dead_processes_are_ignored(registry, tmp_path):
+    _write_snapshot(str(tmp_path / f"{os.getppid()}.json"), worker_snapshot(2, 0.5))
+    _write_snapshot(str(tmp_path / f"{dead_pid()}.json"), worker_snapshot(5, 0.5))
+    assert collected(registry) == (2, [[1, 0], 0.5, 1])
+
+
+def test_retired_workers_keep_counting(registry, tmp_path):
+    first, second = dead_pid(), dead_pid()
+    _write_snapshot(str(tmp_path / f"{first}.json"), worker_snapshot(3, 0.5))
+    _write_snapshot(str(tmp_path / f"{second}.json"), worker_snapshot(4, 0.25))
+    registry.retire(first)
+    registry.retire(second)
+    registry.retire(dead_pid())  # sem arquivo
+    assert not (tmp_path / f"{first}.json").exists()
+    assert collected(registry) == (7, [[2, 0], 0.75, 2])
+
+
+def test_reset_removes_files_of_a_previous_run(registry, tmp_path):
+    _write_snapshot(str(tmp_path / f"{os.getppid()}.json"), worker_snapshot(2, 0.5))
+    _write_snapshot(str(tmp_path / "retired.json"), worker_snapshot(9, 0.5))
+    registry.reset()
+    assert collected(registry) == (0, None)
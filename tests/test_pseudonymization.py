@@ -0,0 +1,71 @@
+"""Pseudonimização determinística (tools.pseudonymization)."""
+import pytest
+from presidio_analyzer.recognizer_result import RecognizerResult
+from presidio_anonymizer import AnonymizerEngine
+from presidio_anonymizer.entities import InvalidParamError, OperatorConfig
+
+from tools.pseudonymization import PseudonymizeOperator, PseudonymScope, normalize
+
+
+def test_digit_entities_compare_by_digits():
+    assert normalize("CPF", "123.456.789-09") == normalize("CPF", "123 456 789 09") == "12345678909"
+    assert normalize("PHONE_NUMBER", "(11) 98765-4321") == "11987654321"
+
+
+def test_digit_entity_without_digits_falls_back_to_text():
+    assert normalize("CPF", " ABC ") == "abc"
+
+
+def test_names_ignore_case_accents_and_spacing():
+    assert normalize("PERSON", "João  Silva") == normalize("PERSON", "JOAO SILVA\n") == "joao silva"
+
+
+def test_other_entities_keep_their_digits_and_punctuation():
+    assert normalize("ENDEREÇO", "Rua A, 12") != normalize("ENDEREÇO", "Rua A, 13")
+
+
+def test_scope_numbers_each_type_in_order():
+    scope = PseudonymScope()
+    assert [scope.placeholder(entity_type, value) for entity_type, value in [
+        ("PERSON", "Ana"), ("CPF", "123.456.789-09"), ("PERSON", "Bia"), ("PERSON", "ANA"),
+        ("CPF", "12345678909"),
+    ]] == ["<PERSON1>", "<CPF1>", "<PERSON2>", "<PERSON1>", "<CPF1>"]
+
+
+def test_scopes_are_independent():
+    first, second = PseudonymScope(), PseudonymScope()
+    first.placeholder("PERSON", "Ana")
+    assert second.placeholder("PERSON", "Bia") == "<PERSON1>"
+
+
+def test_operator_plugs_into_anonymizer_engine():
+    text = "Ana e JOÃO SILVA; depois João Silva."
+    results = [RecognizerResult("PERSON", 0, 3, 0.85), RecognizerResult("PERSON", 6, 16, 0.85),
+               RecognizerResult("PERSON", 25, 35, 0.85)]
+    scope = PseudonymScope()
+    scope.reserve(text, results)
+    engine = AnonymizerEngine()
+    engine.add_anonymizer(PseudonymizeOperator)
+    anonymized = engine.anonymize(text, results, operators={
+        "DEFAULT": OperatorConfig("pseudonymize", {"scope": scope})
+    })
+    assert anonymized.text == "<PERSON1> e <PERSON2>; depois <PERSON2>."
+
+
+def test_operator_requires_a_scope():
+    engine = AnonymizerEngine()
+    engine.add_anonymizer(PseudonymizeOperator)
+    with pytest.raises(InvalidParamError):
+        engine.anonymize("Ana", [RecognizerResult("PERSON", 0, 3, 0.85)],
+                         operators={"DEFAULT": OperatorConfig("pseudonymize", {"scope": None})})
+
+
+def test_bounded_scope_forgets_least_recently_seen():
+    scope = PseudonymScope(max_entries=2)
+    assert scope.placeholder("PERSON", "Ana") == "<PERSON1>"
+    assert scope.placeholder("PERSON", "Bia") == "<PERSON2>"
+    assert scope.placeholder("PERSON", "ana") == "<PERSON1>"
+    assert scope.placeholder("PERSON", "Caio") == "<PERSON3>"
+    # Bia foi a menos recente: volta com um número novo, nunca um já usado
+    assert scope.placeholder("PERSON", "Bia") == "<PERSON4>"
+    assert scope.placeholder("PERSON", "Ana") == "<PERSON5>"
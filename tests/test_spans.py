@@ -0,0 +1,73 @@
+"""Resolução de sobreposições e substituição (tools.spans)."""
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+from tools.spans import Spans, render, resolve_spans
+
+
+def resolved(text, *results):
+    return list(resolve_spans(text, [RecognizerResult(*result) for result in results]))
+
+
+def test_disjoint_spans_sorted_by_start():
+    text = "CPF 123.456.789-09 de Ana"
+    assert resolved(text, ("PERSON", 22, 25, 0.85), ("CPF", 4, 18, 0.9)) == [
+        (4, 18, "CPF", 0.9), (22, 25, "PERSON", 0.85)]
+
+
+def test_same_type_overlap_is_merged():
+    text = "na Rua das Flores, 123"
+    assert resolved(text, ("ENDEREÇO", 0, 17, 0.9), ("ENDEREÇO", 3, 22, 0.95)) == [(0, 22, "ENDEREÇO", 0.95)]
+
+
+def test_same_type_separated_by_spaces_is_merged():
+    text = "Ana  Souza"
+    assert resolved(text, ("PERSON", 0, 3, 0.85), ("PERSON", 5, 10, 0.6)) == [(0, 10, "PERSON", 0.85)]
+
+
+def test_same_type_separated_by_other_text_is_kept_apart():
+    text = "Ana e Bia"
+    assert resolved(text, ("PERSON", 0, 3, 0.85), ("PERSON", 6, 9, 0.85)) == [
+        (0, 3, "PERSON", 0.85), (6, 9, "PERSON", 0.85)]
+
+
+def test_contained_entity_is_dropped():
+    text = "Escola Estadual Rio Branco"
+    assert resolved(text, ("ESCOLA", 0, 26, 0.9), ("CIDADE", 16, 26, 0.95)) == [(0, 26, "ESCOLA", 0.9)]
+
+
+def test_partial_overlap_higher_score_wins_and_other_is_trimmed():
+    text = "Rua Ana Souza 12"
+    # PERSON (4-13) vence ENDEREÇO (0-8): o endereço fica só com "Rua"
+    assert resolved(text, ("ENDEREÇO", 0, 8, 0.5), ("PERSON", 4, 13, 0.85)) == [
+        (0, 3, "ENDEREÇO", 0.5), (4, 13, "PERSON", 0.85)]
+
+
+def test_partial_overlap_leftover_goes_back_in_line():
+    text = "Ana Souza Lima"
+    # PERSON (0-9) vence; a sobra de CIDADE (4-14) começa depois dele, sem o espaço
+    assert resolved(text, ("PERSON", 0, 9, 0.85), ("CIDADE", 4, 14, 0.5)) == [
+        (0, 9, "PERSON", 0.85), (10, 14, "CIDADE", 0.5)]
+
+
+def test_no_overlaps_left():
+    text = "x" * 40
+    results = [(entity_type, start, start + 7, score) for start, entity_type, score in
+               [(0, "A", 0.5), (3, "B", 0.9), (5, "A", 0.7), (8, "C", 0.4), (12, "B", 0.6), (14, "A", 0.8)]]
+    spans = resolved(text, *results)
+    assert all(end <= next_start for (_, end, _, _), (next_start, _, _, _) in zip(spans, spans[1:]))
+    covered = {i for _, start, end, _ in results for i in range(start, end)}
+    assert covered == {i for start, end, _, _ in spans for i in range(start, end)}
+
+
+def test_render_replaces_in_one_pass():
+    text = "CPF 123.456.789-09 de Ana."
+    spans = Spans([4, 22], [18, 25], ["CPF", "PERSON"], [0.9, 0.85])
+    anonymized, replaced = render(text, spans, lambda entity_type, value: f"<{entity_type}>")
+    assert anonymized == "CPF <CPF> de <PERSON>."
+    assert [anonymized[start:end] for start, end, _, _ in replaced] == ["<CPF>", "<PERSON>"]
+    assert replaced.entity_type == ["CPF", "PERSON"] and replaced.score == [0.9, 0.85]
+
+
+def test_render_without_spans():
+    anonymized, replaced = render("nada aqui", Spans(), lambda entity_type, value: "?")
+    assert anonymized == "nada aqui" and len(replaced) == 0
@@ -0,0 +1,27 @@
+"""Modo em camadas (tools.tiering): parágrafos enviados ao NER e camada de cada texto."""
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+from tools.tiering import TieredResults, highest_tier, ner_paragraphs, result_tier
+
+
+def test_only_paragraphs_with_name_hints_reach_ner():
+    text = "CPF 123.456.789-09\n\nFalou com João Silva."
+    assert ner_paragraphs(text, [RecognizerResult("CPF", 4, 18, 0.9)]) == [(20, "Falou com João Silva.")]
+
+
+def test_first_tier_entities_are_masked():
+    text = "Mora na Rua Getúlio Vargas"
+    assert ner_paragraphs(text, [RecognizerResult("ENDEREÇO", 8, 26, 0.9)]) == []
+
+
+def test_document_tier_is_the_highest_of_its_pieces():
+    assert highest_tier(["regex", "ner", "regex"]) == "ner"
+    assert highest_tier(["regex", None]) == "regex"
+    assert highest_tier([None]) is None
+    assert highest_tier([]) is None
+
+
+def test_results_carry_their_tier():
+    results = TieredResults([RecognizerResult("CPF", 0, 14, 0.9)], "regex")
+    assert result_tier(results) == "regex" and len(results) == 1
+    assert result_tier([RecognizerResult("CPF", 0, 14, 0.9)]) is None
@@ -0,0 +1,116 @@
+"""Cofre de reidentificação (tools.vault): cifragem, restauração e busca por valor."""
+import csv
+import json
+
+import pytest
+from cryptography.fernet import Fernet, InvalidToken
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+from tools.pseudonymization import PseudonymScope
+from tools.spans import render, resolve_spans
+from tools.vault import Vault, deanonymize_file, restore
+
+TEXT = "Ana Souza tem o CPF 123.456.789-09 e mora com Bia."
+RESULTS = [RecognizerResult("PERSON", 0, 9, 0.85), RecognizerResult("CPF", 20, 34, 0.9),
+           RecognizerResult("PERSON", 46, 49, 0.85)]
+
+
+def anonymized(text, results, document_id="doc"):
+    """``(document_id, text, spans, anonymized text, replaced)`` as ``Anonymizer`` records them"""
+    spans = resolve_spans(text, results)
+    anonymized_text, replaced = render(text, spans, PseudonymScope().placeholder)
+    return document_id, text, spans, anonymized_text, replaced
+
+
+@pytest.fixture
+def vault(tmp_path):
+    return Vault(str(tmp_path / "vault.sqlite3"), key=Fernet.generate_key())
+
+
+def test_round_trip(vault):
+    document = anonymized(TEXT, RESULTS)
+    assert document[3] == "<PERSON1> tem o CPF <CPF1> e mora com <PERSON2>."
+    assert vault.record([document]) == 3
+    assert vault.deanonymize("doc", document[3]) == TEXT
+
+
+def test_values_are_encrypted(vault):
+    vault.record([anonymized(TEXT, RESULTS)])
+    with open(vault.path, "rb") as f:
+        content = f.read()
+    for value in (b"Ana Souza", b"123.456.789-09", b"Bia"):
+        assert value not in content
+
+
+def test_wrong_key_cannot_decrypt(vault):
+    vault.record([anonymized(TEXT, RESULTS)])
+    other = Vault(vault.path, key=Fernet.generate_key())
+    with pytest.raises(InvalidToken):
+        other.mappings(["doc"])
+
+
+def test_restore_with_offsets():
+    mappings = [("<PERSON1>", 0, 9, "Ana"), ("<CPF1>", 14, 20, "123.456.789-09")]
+    assert restore("<PERSON1> CPF <CPF1>.", mappings) == "Ana CPF 123.456.789-09."
+
+
+def test_restore_renumbered_placeholders():
+    # O texto mudou (ex.: o agente renumerou): os placeholders são casados na ordem
+    mappings = [("<PERSON1>", 0, 9, "Ana"), ("<PERSON2>", 12, 21, "Bia")]
+    assert restore("Oi, <PERSON7> e <PERSON8>!", mappings) == "Oi, Ana e Bia!"
+
+
+def test_restore_unknown_document_keeps_text(vault):
+    assert vault.deanonymize("nenhum", "<PERSON1> aqui") == "<PERSON1> aqui"
+
+
+def test_find_by_normalized_value(vault):
+    vault.record([anonymized(TEXT, RESULTS, "a"),
+                  anonymized("CPF 12345678909", [RecognizerResult("CPF", 4, 15, 0.9)], "b")])
+    assert vault.find("CPF", "123 456 789 09") == [("a", "<CPF1>"), ("b", "<CPF1>")]
+    assert vault.find("PERSON", "ANA  SOUZA") == [("a", "<PERSON1>")]
+    assert vault.find("PERSON", "Carla") == []
+
+
+def test_recording_again_replaces_rows(vault):
+    vault.record([anonymized(TEXT, RESULTS)])
+    document = anonymized("Só a Bia.", [RecognizerResult("PERSON", 5, 8, 0.85)])
+    vault.record([document])
+    assert vault.deanonymize("doc", document[3]) == "Só a Bia."
+    assert vault.find("CPF", "123.456.789-09") == []
+
+
+def test_document_id_is_keyed(vault, tmp_path):
+    other = Vault(str(tmp_path / "other.sqlite3"), key=Fernet.generate_key())
+    assert vault.document_id(TEXT) == vault.document_id(TEXT)
+    assert vault.document_id(TEXT) != other.document_id(TEXT)
+
+
+def test_deanonymize_jsonl(vault, tmp_path):
+    document_id, _, _, anonymized_text, _ = document = anonymized(TEXT, RESULTS)
+    vault.record([document])
+    source, destination = tmp_path / "out.jsonl", tmp_path / "restored.jsonl"
+    records = [{"text": anonymized_text, "document_id": document_id}, {"text": "<PERSON1>"}, "abc"]
+    source.write_text("".join(json.dumps(record) + "\n" for record in records), encoding="utf-8")
+    assert deanonymize_file(vault, str(source), str(destination)) == 3
+    restored = [json.loads(line) for line in destination.read_text(encoding="utf-8").splitlines()]
+    assert restored == [{"text": TEXT, "document_id": document_id}, {"text": "<PERSON1>"}, "abc"]
+
+
+def test_deanonymize_csv(vault, tmp_path):
+    document_id, _, _, anonymized_text, _ = document = anonymized(TEXT, RESULTS)
+    vault.record([document])
+    source, destination = tmp_path / "out.csv", tmp_path / "restored.csv"
+    with open(source, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerows([["id", "text", "document_id"], ["1", anonymized_text, document_id]])
+    assert deanonymize_file(vault, str(source), str(destination)) == 1
+    with open(destination, encoding="utf-8", newline="") as f:
+        assert list(csv.DictReader(f)) == [{"id": "1", "text": TEXT, "document_id": document_id}]
+
+
+def test_deanonymize_csv_without_id_column(vault, tmp_path):
+    source = tmp_path / "out.csv"
+    source.write_text("text\n<PERSON1>\n", encoding="utf-8")
+    with pytest.raises(ValueError):
+        deanonymize_file(vault, str(source), str(tmp_path / "restored.csv"))
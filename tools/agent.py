@@ -1,52 +1,211 @@
-from langchain_core.messages import HumanMessage, SystemMessage
-from langchain_community.llms import Ollama
 import os
-from langchain_groq import ChatGroq
+import asyncio
+import json
+import logging
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional
 from dotenv import load_dotenv
-from config import MODEL, LLM
+from tools.metrics import STAGE_SECONDS
+from tools.startup import startup_stage
+from config import MODEL, LLM, AGENT_CONCURRENCY, AGENT_TIMEOUT, AGENT_WINDOW, AGENT_CACHE_SIZE
 
 load_dotenv()
 
-if MODEL == "Ollama":
-    model = Ollama(model=LLM)
-elif MODEL == "Groq":
-    os.environ['GROQ_API_KEY'] = os.getenv('GROQ_API_KEY')
-    model = ChatGroq(model="llama-3.3-70b-versatile")
-else:
-    raise ValueError(f"Modelo {MODEL} não suportado")
-
-
-def identificador_agent(texto, texto_anonimizado, tabela_anonimizacao):
-    system_prompt="""
-        Você é um especialista em identificar entidades anonimizadas em textos.
-        Você receberá o texto original e o texto anonimizado, além da
-        tabela de anonimização, e deverá correlacionar as entidades anonimizadas.
-        As entidades anonimizadas são:
-        - <PERSON>
-        - <CPF>
-        - <EMAIL_ADDRESS>
-        Depois do tratamento, o texto anonimizado deve passar a ter:
-        - <PERSON1>
-        - <CPF1>
-        - <EMAIL_ADDRESS1>
-        - <PERSON2>
-        - <CPF2>
-        - <EMAIL_ADDRESS2>
-        De acordo com a tabela de anonimização, você deve identificar as entidades anonimizadas e substituir
-        pelo seu respectivo valor.
-        O texto anonimizado deve ser retornado com as entidades anonimizadas substituídas pelo seu respectivo valor.
-        Apenas retorne o texto anonimizado, sem nenhum outro texto adicional.
+logger = logging.getLogger(__name__)
+
+PLACEHOLDER = re.compile(r"^<([A-ZÀ-Ü_]+)\d+>$")
+JSON_OBJECT = re.compile(r"\{.*\}", re.DOTALL)
+
+SYSTEM_PROMPT = """
+    Você é um especialista em revisar entidades anonimizadas em textos.
+    Você receberá uma lista JSON de entidades detectadas em um documento. Cada
+    entidade tem um "id", o "tipo", o "valor" original, o "identificador"
+    atribuído (por exemplo <PERSON1>, <CPF1>, <PERSON2>) e um "contexto" com
+    o trecho ao redor, já anonimizado, em que [valor] marca a entidade.
+    Menções diferentes à mesma entidade (por exemplo, "Amanda" e "Amanda
+    Ribeiro dos Santos") devem compartilhar o mesmo identificador; entidades
+    diferentes devem ter identificadores diferentes. Nunca troque o tipo.
+    Responda apenas com um objeto JSON que mapeia cada id para o identificador
+    revisado, por exemplo {"0": "<PERSON1>", "1": "<PERSON1>"}, sem nenhum
+    outro texto adicional.
+"""
+
+
+def build_model():
+    """Create the LLM client selected by ``MODEL`` in config.py
+
+    LangChain and the provider SDK are only imported here, on the first call
+    to the agent, so ``AGENT = False`` never pays for them.
+    """
+    with startup_stage("llm_client"):
+        if MODEL == "Ollama":
+            from langchain_community.llms import Ollama
+            return Ollama(model=LLM)
+        elif MODEL == "Groq":
+            api_key = os.getenv('GROQ_API_KEY')
+            if not api_key:
+                raise ValueError("GROQ_API_KEY não definida (use o arquivo .env)")
+            from langchain_groq import ChatGroq
+            return ChatGroq(model="llama-3.3-70b-versatile", api_key=api_key)
+        else:
+            raise ValueError(f"Modelo {MODEL} não suportado")
+
+
+def build_spans(anonymized_text: str, items, values: List[str], window: int = AGENT_WINDOW) -> List[Dict]:
+    """Describe each replaced entity for the prompt
+
+    The context window is cut from the *anonymized* text, so neighbouring
+    entities reach the provider as placeholders and only the span values
+    themselves are sent in clear.
+
+    :param anonymized_text: text returned by the anonymizer
+    :param items: anonymizer ``OperatorResult`` items, sorted by start
+    :param values: original value of each item, in the same order
+    """
+    spans = []
+    for i, (item, value) in enumerate(zip(items, values)):
+        left = anonymized_text[max(0, item.start - window):item.start]
+        right = anonymized_text[item.end:item.end + window]
+        spans.append({
+            "id": str(i),
+            "tipo": item.entity_type,
+            "valor": value,
+            "identificador": item.text,
+            "contexto": f"{left}[{value}]{right}",
+        })
+    return spans
+
+
+def apply_labels(anonymized_text: str, items, labels: Dict[str, str]) -> str:
+    """Rewrite the placeholders of ``items`` (sorted by start) with ``labels``"""
+    pieces = []
+    last_end = 0
+    for i, item in enumerate(items):
+        pieces.append(anonymized_text[last_end:item.start])
+        pieces.append(labels.get(str(i), item.text))
+        last_end = item.end
+    pieces.append(anonymized_text[last_end:])
+    return "".join(pieces)
+
+
+class IdentificadorAgent:
+    """Async LLM refinement of pseudonym numbering with bounded concurrency
+
+    Calls run on a private event loop thread, so the concurrency limit holds
+    across every Flask thread sharing the agent. Each call has a deadline
+    (queue wait included); when it is missed or the model fails, ``None`` is
+    returned and callers keep the local pseudonymization. Answers are cached
+    by the set of spans, so repeated documents do not hit the provider.
+
+    :param model: any LangChain-style model with ``ainvoke`` or ``invoke``;
+        defaults to the backend chosen in config.py, created on first use
     """
-    user_prompt = f"""
-        Texto: {texto}
-        Texto anonimizado: {texto_anonimizado}
-        Tabela de anonimização: {tabela_anonimizacao}
-        """
-    menssages = [SystemMessage(system_prompt), HumanMessage(user_prompt)]
-
-    answer = model.invoke(menssages)
-    if MODEL == "Ollama":
-        print(answer)
-        return answer
-    else:
-        return answer.content
+
+    def __init__(self, model=None, concurrency: int = AGENT_CONCURRENCY,
+                 timeout: float = AGENT_TIMEOUT, cache_size: int = AGENT_CACHE_SIZE):
+        self._model = model
+        self.timeout = timeout
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._cache_lock = threading.Lock()
+        self._loop = asyncio.new_event_loop()
+        self._semaphore = None
+        self._concurrency = concurrency
+        threading.Thread(target=self._loop.run_forever, name="agent-loop", daemon=True).start()
+
+    @property
+    def model(self):
+        if self._model is None:
+            self._model = build_model()
+        return self._model
+
+    @staticmethod
+    def cache_key(spans: List[Dict]):
+        return tuple((span["tipo"], span["valor"].casefold(), span["identificador"]) for span in spans)
+
+    async def refine(self, spans: List[Dict]) -> Optional[Dict[str, str]]:
+        """Return ``{span id: placeholder}`` or ``None`` to keep the local result"""
+        if not spans:
+            return None
+
+        key = self.cache_key(spans)
+        with self._cache_lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+
+        try:
+            labels = await asyncio.wait_for(self._call(spans), self.timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Agente excedeu o prazo de %.1fs; usando pseudonimização local", self.timeout)
+            return None
+        except Exception:
+            logger.exception("Falha no agente; usando pseudonimização local")
+            return None
+
+        if labels is not None:
+            with self._cache_lock:
+                self._cache[key] = labels
+                if len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        return labels
+
+    async def _call(self, spans: List[Dict]) -> Optional[Dict[str, str]]:
+        from langchain_core.messages import HumanMessage, SystemMessage
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self._concurrency)
+        messages = [SystemMessage(SYSTEM_PROMPT), HumanMessage(json.dumps(spans, ensure_ascii=False))]
+        async with self._semaphore:
+            model = self.model
+            with STAGE_SECONDS.time("agent"):
+                if hasattr(model, "ainvoke"):
+                    answer = await model.ainvoke(messages)
+                else:
+                    answer = await asyncio.to_thread(model.invoke, messages)
+        return self._parse(getattr(answer, "content", answer), spans)
+
+    @staticmethod
+    def _parse(answer: str, spans: List[Dict]) -> Optional[Dict[str, str]]:
+        """Keep only well-formed placeholders that preserve the entity type"""
+        match = JSON_OBJECT.search(answer or "")
+        if not match:
+            return None
+        try:
+            proposed = json.loads(match.group(0))
+        except ValueError:
+            return None
+
+        labels = {}
+        for span in spans:
+            label = proposed.get(span["id"])
+            found = PLACEHOLDER.match(label) if isinstance(label, str) else None
+            if found and found.group(1) == span["tipo"]:
+                labels[span["id"]] = label
+        return labels
+
+    def submit(self, spans: List[Dict]):
+        """Schedule ``refine`` on the agent loop; returns a concurrent Future"""
+        return asyncio.run_coroutine_threadsafe(self.refine(spans), self._loop)
+
+    def refine_sync(self, spans: List[Dict]) -> Optional[Dict[str, str]]:
+        return self.submit(spans).result()
+
+    def refine_many(self, spans_list: List[List[Dict]]) -> List[Optional[Dict[str, str]]]:
+        """Refine several documents concurrently, up to the concurrency limit"""
+        futures = [self.submit(spans) for spans in spans_list]
+        return [future.result() for future in futures]
+
+
+_agent = None
+_agent_lock = threading.Lock()
+
+
+def get_agent() -> IdentificadorAgent:
+    global _agent
+    if _agent is None:
+        with _agent_lock:
+            if _agent is None:
+                _agent = IdentificadorAgent()
+    return _agent
@@ -1,54 +1,33 @@
-from presidio_analyzer import AnalyzerEngine, RecognizerRegistry, PatternRecognizer
-from presidio_anonymizer import AnonymizerEngine
+from presidio_analyzer import AnalyzerEngine, BatchAnalyzerEngine, RecognizerRegistry, PatternRecognizer
+from presidio_anonymizer.entities import OperatorResult
 from presidio_analyzer.predefined_recognizers import SpacyRecognizer, EmailRecognizer, PhoneRecognizer
-from presidio_analyzer.nlp_engine import NlpEngineProvider
 from presidio_analyzer.recognizer_result import RecognizerResult
 
 from tools.recognizers.cpf import CPFRecognizer
 from tools.recognizers.escola import EscolaRecognizer
 from tools.recognizers.endereços import EnderecoRecognizer
+from tools.recognizers.gazetteer import load_gazetteers
+from tools.cache import ResultCache, fingerprint
+from tools.nlp import create_nlp_engine
+from tools.chunking import analyze_in_chunks, split_paragraphs, shift_result
+from tools.pseudonymization import PseudonymScope
+from tools.spans import Spans, render, resolve_spans
+from tools.vault import Vault
+from tools.tiering import TieredResults, highest_tier, ner_paragraphs, result_tier
+from tools.metrics import STAGE_SECONDS, TIER_TEXTS, instrument_analyzer, record_document
+from tools.startup import startup_stage
 
-from typing import List
-from tools.agent import identificador_agent
-from config import AGENT, LANGUAGES_CONFIG_FILE
+import threading
+from typing import Callable, Dict, Iterable, List, Optional, Tuple, Union
+from tools.agent import get_agent, build_spans, apply_labels
+from config import (AGENT, LANGUAGES_CONFIG_FILE, BATCH_SIZE, N_PROCESS, ANALYSIS_MODE,
+                    LONG_DOCUMENT_CHARS, CHUNK_OVERLAP, CHUNK_WORKERS,
+                    PSEUDONYMIZE, PSEUDONYM_SCOPE, PSEUDONYM_SCOPE_SIZE, RESULT_CACHE, VAULT_DB)
 
 
-
-# TODO Mover função para um arquivo separado
-def annotate(text: str, analyze_results: List[RecognizerResult]):
-    """Highlight the identified PII entities on the original text
-
-    :param text: Full text
-    :param analyze_results: list of results from presidio analyzer engine
-    """
-    tokens = []
-    
-    if not analyze_results:
-        return [text]
-
-    # sort by start index
-    results = sorted(analyze_results, key=lambda x: x.start)
-    
-    last_end = 0
-    for res in results:
-        # Add text before the entity
-        if res.start > last_end:
-            tokens.append(text[last_end:res.start])
-        
-        # Add the entity as a tuple (text, entity_type)
-        tokens.append((text[res.start:res.end], res.entity_type))
-        
-        last_end = res.end
-    
-    # Add remaining text after the last entity
-    if last_end < len(text):
-        tokens.append(text[last_end:])
-    
-    return tokens
-
-# Create NLP engine based on configuration file
-provider = NlpEngineProvider(conf_file=LANGUAGES_CONFIG_FILE)
-nlp_engine_with_portuguese = provider.create_engine()
+# Create NLP engine based on configuration file; each language's spaCy model
+# is only loaded when first used (see tools.nlp)
+nlp_engine_with_portuguese = create_nlp_engine(LANGUAGES_CONFIG_FILE)
 
 # Setting up Portuguese recognizers with more specific contexts
 email_recognizer_pt = EmailRecognizer(
@@ -70,7 +49,11 @@ spacy_recognizer_pt = SpacyRecognizer(
 
 cpf_recognizer = CPFRecognizer()
 escola_recognizer = EscolaRecognizer()
-endereco_recognizer = EnderecoRecognizer()
+# Dicionários de municípios, bairros e escolas (só os que tiverem arquivo)
+gazetteer_recognizers = load_gazetteers()
+endereco_recognizer = EnderecoRecognizer(
+    exclude=[name for recognizer in gazetteer_recognizers for name in recognizer.replaces]
+)
 # Create registry with both languages supported
 registry = RecognizerRegistry()
 registry.supported_languages = ["en", "pt"]
@@ -83,29 +66,460 @@ registry.add_recognizer(spacy_recognizer_pt)
 registry.add_recognizer(cpf_recognizer)
 registry.add_recognizer(escola_recognizer)
 registry.add_recognizer(endereco_recognizer)
-def anonymize_text(text):
-    # Set up analyzer with our updated recognizer registry
-    analyzer = AnalyzerEngine(
-        registry=registry,
-        supported_languages=["en","pt"],
-        nlp_engine=nlp_engine_with_portuguese
-    )
+for gazetteer_recognizer in gazetteer_recognizers:
+    registry.add_recognizer(gazetteer_recognizer)
+
+# Texto curto usado para aquecer o pipeline (carrega vetores, compila regex)
+WARM_UP_TEXT = "João Silva, CPF 123.456.789-00, mora na Rua das Flores, 123."
+
+
+class Anonymizer:
+    """Long-lived analyzer shared by every request, plus the replacement step.
+
+    Building an ``AnalyzerEngine`` is not free (context enhancer, recognizer
+    bookkeeping), so the engines are created once and reused. They are
+    stateless during ``analyze`` and can be called concurrently from Flask
+    worker threads; the lock only guards warm-up. Entities are replaced by
+    ``tools.spans`` in one pass over the text.
+
+    When the result cache is on, texts are analyzed paragraph by paragraph
+    and the results of each paragraph are cached (see ``tools.cache``), so
+    context and patterns no longer reach across paragraph breaks.
+
+    In ``"tiered"`` mode the pattern recognizers run first and spaCy NER
+    only runs on the paragraphs that may contain names (see ``tools.tiering``).
+
+    :param registry: recognizer registry, defaults to the module registry
+    :param nlp_engine: NLP engine, defaults to the Portuguese spaCy engine
+    :param cache: result cache; defaults to a new ``ResultCache`` when
+        ``RESULT_CACHE`` is on; ``True`` or ``False`` turns it on or off regardless
+    :param vault: re-identification vault recording every replacement;
+        defaults to a ``Vault`` on ``VAULT_DB`` when it is set
+    :param mode: ``"full"`` or ``"tiered"`` (default: ``ANALYSIS_MODE``)
+    """
+
+    def __init__(self, registry: Optional[RecognizerRegistry] = None, nlp_engine=None,
+                 cache: Union[ResultCache, bool, None] = None, vault: Optional[Vault] = None,
+                 mode: str = ANALYSIS_MODE):
+        if mode not in ("full", "tiered"):
+            raise ValueError(f"Modo de análise desconhecido: {mode} (opções: full, tiered)")
+        self.mode = mode
+        self.registry = registry if registry is not None else globals()["registry"]
+        self.nlp_engine = nlp_engine if nlp_engine is not None else nlp_engine_with_portuguese
+        self.analyzer = AnalyzerEngine(
+            registry=self.registry,
+            supported_languages=["en", "pt"],
+            nlp_engine=self.nlp_engine
+        )
+        instrument_analyzer(self.analyzer)
+        self.batch_analyzer = BatchAnalyzerEngine(analyzer_engine=self.analyzer)
+        # Escopo compartilhado entre documentos quando PSEUDONYM_SCOPE == "global";
+        # limitado, e de cada processo (workers forkados não o compartilham)
+        self.global_scope = PseudonymScope(PSEUDONYM_SCOPE_SIZE)
+        if cache is False:
+            cache = None
+        elif cache is True or (cache is None and RESULT_CACHE):
+            # O modo entra na chave: as duas camadas podem dar resultados diferentes
+            cache = ResultCache(fingerprint(self.registry, self.nlp_engine) + mode)
+        self.cache = cache
+        if vault is None and VAULT_DB:
+            vault = Vault(VAULT_DB)
+        self.vault = vault
+        self._lock = threading.Lock()
+        self._warm = False
+
+    @property
+    def is_warm(self) -> bool:
+        return self._warm
+
+    def warm_up(self) -> "Anonymizer":
+        """Run one throwaway analysis so the first real request is not slow"""
+        with self._lock:
+            if not self._warm:
+                with startup_stage("warm_up"):
+                    self.analyze(WARM_UP_TEXT)
+                self._warm = True
+        return self
+
+    def analyze(self, text: str, entities: Optional[List[str]] = None, score_threshold: Optional[float] = None,
+                explain: bool = False) -> List[RecognizerResult]:
+        """Analyze ``text``, splitting documents longer than ``LONG_DOCUMENT_CHARS`` into chunks
+
+        :param entities: entity types to look for (default: all); recognizers
+            of other types do not run, and spaCy only runs when a requested
+            type comes from a spaCy-based recognizer (``PERSON``)
+        :param score_threshold: drop results scoring below this
+        :param explain: keep each result's ``analysis_explanation``
+            (bypasses the cache, which stores no explanations)
+        :return: the results, as ``TieredResults`` whose ``tier`` is the tier
+            that analyzed the text (``None`` in ``"full"`` mode)
+        """
+        entities = self.check_entities(entities)
+        if self.cache is None or explain:
+            results = self._analyze_document(text, entities, explain)
+        else:
+            results = self._analyze_cached(
+                [text], lambda paragraphs: [self._analyze_document(p, entities) for p in paragraphs], entities
+            )[0]
+        return self._finish_analysis(results, entities, score_threshold)
+
+    def check_entities(self, entities: Optional[Iterable[str]]) -> Optional[List[str]]:
+        """Sorted, deduplicated ``entities``; ``ValueError`` if one has no recognizer"""
+        if entities is None:
+            return None
+        entities = sorted(set(entities))
+        unknown = set(entities) - set(self.registry.get_supported_entities(["pt"]))
+        if not entities or unknown:
+            raise ValueError(f"Entidades desconhecidas: {', '.join(sorted(unknown)) or '(lista vazia)'}")
+        return entities
+
+    def needs_nlp(self, entities: Optional[List[str]]) -> bool:
+        """Whether a recognizer for ``entities`` reads the spaCy entities"""
+        if entities is None or not hasattr(self.nlp_engine, "tokenize"):
+            return True
+        return any(isinstance(recognizer, SpacyRecognizer)
+                   for recognizer in self.registry.get_recognizers("pt", entities=entities))
+
+    def tiered(self, entities: Optional[List[str]]) -> bool:
+        """Whether ``entities`` are analyzed in tiers (``"tiered"`` mode and a NER type requested)"""
+        return self.mode == "tiered" and hasattr(self.nlp_engine, "tokenize") and self.needs_nlp(entities)
+
+    def tier_entities(self, entities: Optional[List[str]]) -> Tuple[List[str], List[str]]:
+        """Entity types of the regex tier and of the NER tier, among ``entities`` (default: all)"""
+        pattern, ner = set(), set()
+        for recognizer in self.registry.get_recognizers("pt", entities=entities, all_fields=entities is None):
+            (ner if isinstance(recognizer, SpacyRecognizer) else pattern).update(recognizer.supported_entities)
+        if entities is not None:
+            pattern &= set(entities)
+            ner &= set(entities)
+        return sorted(pattern - ner), sorted(ner)
+
+    def _analyze_document(self, text: str, entities: Optional[List[str]] = None,
+                          explain: bool = False) -> TieredResults:
+        tiers = []
+
+        def analyze_chunk(chunk):
+            results = self._analyze_single(chunk, entities, explain)
+            tiers.append(result_tier(results))
+            return results
+
+        results = analyze_in_chunks(
+            analyze_chunk,
+            text,
+            max_chars=LONG_DOCUMENT_CHARS,
+            overlap=CHUNK_OVERLAP,
+            workers=CHUNK_WORKERS
+        )
+        return TieredResults(results, highest_tier(tiers))
+
+    def _analyze_single(self, text: str, entities: Optional[List[str]] = None,
+                        explain: bool = False) -> List[RecognizerResult]:
+        if self.tiered(entities):
+            return self._analyze_tiered([text], entities, explain)[0]
+        # Sem reconhecedor baseado no spaCy, basta o tokenizador (contexto)
+        nlp_artifacts = None if self.needs_nlp(entities) else self.nlp_engine.tokenize(text, "pt")
+        return self.analyzer.analyze(text=text, language="pt", entities=entities,
+                                     nlp_artifacts=nlp_artifacts, return_decision_process=explain)
+
+    def analyze_batch(self, texts: Iterable[str], batch_size: int = BATCH_SIZE,
+                      n_process: int = N_PROCESS, entities: Optional[List[str]] = None,
+                      score_threshold: Optional[float] = None) -> List[List[RecognizerResult]]:
+        """Analyze many texts with a single ``nlp.pipe`` pass
+
+        Texts longer than ``LONG_DOCUMENT_CHARS`` are left out of the pass and
+        analyzed in chunks, as in ``analyze``.
+
+        :param texts: texts to analyze, in order
+        :param batch_size: number of texts per spaCy batch
+        :param n_process: number of spaCy worker processes
+        :param entities: entity types to look for (see ``analyze``)
+        :param score_threshold: drop results scoring below this
+        """
+        entities = self.check_entities(entities)
+
+        def analyze_pipe(texts):
+            if self.tiered(entities):
+                return self._analyze_tiered(texts, entities, batch_size=batch_size, n_process=n_process)
+            if not self.needs_nlp(entities):
+                return [self._analyze_single(text, entities) for text in texts]
+            return self.batch_analyzer.analyze_iterator(
+                texts,
+                language="pt",
+                batch_size=batch_size,
+                n_process=n_process,
+                entities=entities
+            )
+
+        def analyze_many(texts):
+            texts = list(texts)
+            # Acima do limite, o nlp.pipe estouraria a memória (ou o max_length do spaCy)
+            long = {index for index, text in enumerate(texts) if len(text) > LONG_DOCUMENT_CHARS}
+            if not long:
+                return analyze_pipe(texts)
+            short = iter(analyze_pipe([text for index, text in enumerate(texts) if index not in long]))
+            return [self._analyze_document(text, entities) if index in long else next(short)
+                    for index, text in enumerate(texts)]
+
+        if self.cache is None:
+            batch_results = analyze_many(texts)
+        else:
+            batch_results = self._analyze_cached(list(texts), analyze_many, entities)
+        return [self._finish_analysis(results, entities, score_threshold) for results in batch_results]
+
+    def _finish_analysis(self, results: List[RecognizerResult], entities: Optional[List[str]],
+                         score_threshold: Optional[float]) -> TieredResults:
+        """Results above ``score_threshold``, with the tier of the document, counted once per document"""
+        tier = result_tier(results)
+        if tier is None and self.mode == "tiered":
+            # Nenhum tipo do NER pedido: a camada de padrões bastou
+            tier = "regex"
+        if tier is not None:
+            TIER_TEXTS.inc(tier)
+        return TieredResults(above_threshold(results, score_threshold), tier)
+
+    def _analyze_tiered(self, texts: List[str], entities: Optional[List[str]] = None, explain: bool = False,
+                        batch_size: int = BATCH_SIZE, n_process: int = N_PROCESS) -> List[List[RecognizerResult]]:
+        """Pattern recognizers on every text, then NER on the flagged paragraphs of all of them at once"""
+        pattern_entities, ner_entities = self.tier_entities(entities)
+        batch_results = [
+            self.analyzer.analyze(text=text, language="pt", entities=pattern_entities,
+                                  nlp_artifacts=self.nlp_engine.tokenize(text, "pt"),
+                                  return_decision_process=explain) if pattern_entities else []
+            for text in texts
+        ]
+
+        escalated = [(index, offset, paragraph)
+                     for index, (text, results) in enumerate(zip(texts, batch_results))
+                     for offset, paragraph in ner_paragraphs(text, results)]
+        paragraphs = [paragraph for _, _, paragraph in escalated]
+        if len(paragraphs) == 1:
+            ner_results = [self.analyzer.analyze(text=paragraphs[0], language="pt", entities=ner_entities,
+                                                 return_decision_process=explain)]
+        elif paragraphs:
+            ner_results = self.batch_analyzer.analyze_iterator(
+                paragraphs, language="pt", batch_size=batch_size, n_process=n_process,
+                entities=ner_entities, return_decision_process=explain
+            )
+        else:
+            ner_results = []
+        for (index, offset, _), results in zip(escalated, ner_results):
+            batch_results[index].extend(shift_result(result, offset) for result in results)
+
+        reached_ner = {index for index, _, _ in escalated}
+        return [TieredResults(results, "ner" if index in reached_ner else "regex")
+                for index, results in enumerate(batch_results)]
+
+    def _analyze_cached(self, texts: List[str],
+                        analyze_many: Callable[[List[str]], List[List[RecognizerResult]]],
+                        entities: Optional[List[str]] = None) -> List[List[RecognizerResult]]:
+        """Results of each text, analyzing only the paragraphs missing from the cache
+
+        Paragraphs repeated within ``texts`` are analyzed once. Each text's
+        tier is the highest tier among its paragraphs.
+        """
+        documents = []
+        missing: Dict[str, str] = {}
+        for text in texts:
+            paragraphs = []
+            for offset, paragraph in split_paragraphs(text):
+                key = self.cache.key(paragraph, entities)
+                results = None if key in missing else self.cache.get(key)
+                if results is None:
+                    missing.setdefault(key, paragraph)
+                paragraphs.append((offset, key, results))
+            documents.append(paragraphs)
+
+        analyzed = {}
+        if missing:
+            analyzed = dict(zip(missing, analyze_many(list(missing.values()))))
+            for key, results in analyzed.items():
+                self.cache.put(key, results)
+
+        documents = [[(offset, results if results is not None else analyzed[key])
+                      for offset, key, results in paragraphs]
+                     for paragraphs in documents]
+        return [TieredResults((shift_result(result, offset) for offset, results in paragraphs for result in results),
+                              highest_tier(result_tier(results) for _, results in paragraphs))
+                for paragraphs in documents]
+
+    def anonymize(self, text: str, scope: Optional[PseudonymScope] = None, entities: Optional[List[str]] = None,
+                  score_threshold: Optional[float] = None, explain: bool = False,
+                  document_id: Optional[str] = None):
+        """Anonymize ``text``
+
+        :param scope: pseudonym numbering to use; defaults to a fresh scope
+            per document (or the shared one if ``PSEUDONYM_SCOPE == "global"``)
+        :param entities: entity types to replace (default: all)
+        :param score_threshold: keep only entities scoring at least this
+        :param explain: also return the analyzer's decision process, as
+            ``(anonymized text, explain_results(...))``
+        :param document_id: ID of the document in the vault (see ``document_id``)
+        """
+        results = self.analyze(text, entities, score_threshold, explain)
+        anonymized = self.anonymize_results(text, results, scope, document_id)
+        return (anonymized, explain_results(results)) if explain else anonymized
+
+    def anonymize_results(self, text: str, results: List[RecognizerResult],
+                          scope: Optional[PseudonymScope] = None, document_id: Optional[str] = None) -> str:
+        """Anonymize ``text`` with results analyzed beforehand (e.g. paragraph by paragraph)"""
+        return self.anonymize_spans(text, results, scope, document_id)[0]
+
+    def anonymize_spans(self, text: str, results: List[RecognizerResult], scope: Optional[PseudonymScope] = None,
+                        document_id: Optional[str] = None) -> Tuple[str, Spans]:
+        """Anonymized text and the resolved, non-overlapping spans of ``text`` that were replaced"""
+        anonymized = [self._anonymize_results(text, results, scope)]
+        self._record(anonymized, [document_id])
+        return self._finish(anonymized)[0], anonymized[0][1]
+
+    def anonymize_batch(self, texts: Iterable[str], batch_size: int = BATCH_SIZE,
+                        n_process: int = N_PROCESS, scope: Optional[PseudonymScope] = None,
+                        entities: Optional[List[str]] = None,
+                        score_threshold: Optional[float] = None,
+                        document_ids: Optional[List[Optional[str]]] = None, tiers: bool = False):
+        """Anonymize many texts with one ``analyze_batch`` pass
+
+        :param tiers: also return the tier that analyzed each text (see
+            ``analyze``), as ``(anonymized texts, tiers)``
+        """
+        texts = ["" if text is None else str(text) for text in texts]
+        batch_results = self.analyze_batch(texts, batch_size=batch_size, n_process=n_process,
+                                           entities=entities, score_threshold=score_threshold)
+        anonymized = [self._anonymize_results(text, results, scope) for text, results in zip(texts, batch_results)]
+        self._record(anonymized, document_ids or [None] * len(texts))
+        anonymized = self._finish(anonymized)
+        return (anonymized, [results.tier for results in batch_results]) if tiers else anonymized
+
+    def document_id(self, text: str, document_id: Optional[str] = None) -> Optional[str]:
+        """ID under which ``text`` is recorded in the vault (``None`` without a vault)"""
+        if self.vault is None:
+            return None
+        return document_id if document_id is not None else self.vault.document_id(text)
+
+    def _record(self, anonymized: list, document_ids: List[Optional[str]]) -> None:
+        """Store the replacements of the whole batch in the vault, in one transaction"""
+        if self.vault is None:
+            return
+        with STAGE_SECONDS.time("vault"):
+            self.vault.record((self.document_id(text, document_id), text, spans, anonymized_text, replaced)
+                              for (text, spans, anonymized_text, replaced), document_id
+                              in zip(anonymized, document_ids))
+
+    def new_scope(self) -> PseudonymScope:
+        return self.global_scope if PSEUDONYM_SCOPE == "global" else PseudonymScope()
+
+    def _anonymize_results(self, text: str, results: List[RecognizerResult],
+                           scope: Optional[PseudonymScope] = None):
+        """Replace the entities; returns ``(text, spans, anonymized text, replaced spans)``
+
+        Placeholders are issued in order of appearance, so the first person
+        of the document is ``<PERSON1>``.
+        """
+        if PSEUDONYMIZE:
+            scope = scope if scope is not None else self.new_scope()
+            replacement = scope.placeholder
+        else:
+            replacement = entity_placeholder
+
+        with STAGE_SECONDS.time("anonymizer"):
+            spans = resolve_spans(text, results)
+            anonymized_text, replaced = render(text, spans, replacement)
+        record_document(text, spans.entity_type)
+        return text, spans, anonymized_text, replaced
+
+    def _finish(self, anonymized: list) -> List[str]:
+        """Return the anonymized texts, refined by the LLM agent when ``AGENT`` is on
+
+        O agente é um refinamento opcional, fora do caminho principal: se ele
+        falhar ou exceder o prazo, o texto pseudonimizado localmente é mantido.
+        """
+        if not AGENT:
+            return [anonymized_text for _, _, anonymized_text, _ in anonymized]
+
+        agent = get_agent()
+        documents = []
+        for text, spans, anonymized_text, replaced in anonymized:
+            items = [OperatorResult(start, end, entity_type, anonymized_text[start:end], "pseudonymize")
+                     for start, end, entity_type, _ in replaced]
+            values = [text[start:end] for start, end, _, _ in spans]
+            documents.append((anonymized_text, items, build_spans(anonymized_text, items, values)))
+
+        labels_list = agent.refine_many([spans for _, _, spans in documents])
+        return [apply_labels(anonymized_text, items, labels) if labels else anonymized_text
+                for (anonymized_text, items, _), labels in zip(documents, labels_list)]
+
+
+def entity_placeholder(entity_type: str, value: str) -> str:
+    """``<ENTITY_TYPE>``, used when ``PSEUDONYMIZE`` is off"""
+    return f"<{entity_type}>"
+
+
+def above_threshold(results: List[RecognizerResult], score_threshold: Optional[float]) -> List[RecognizerResult]:
+    if not score_threshold:
+        return results
+    return [result for result in results if result.score >= score_threshold]
+
+
+def explain_results(results: List[RecognizerResult]) -> List[Dict]:
+    """JSON-ready decision process of each result (recognizer, pattern, context)"""
+    return [{
+        "entity_type": result.entity_type,
+        "start": result.start,
+        "end": result.end,
+        "score": result.score,
+        "explicacao": result.analysis_explanation.to_dict() if result.analysis_explanation else None,
+    } for result in sorted(results, key=lambda r: (r.start, r.end))]
+
+
+def result_to_dict(result: RecognizerResult) -> Dict:
+    return {"entity_type": result.entity_type, "start": result.start, "end": result.end, "score": result.score}
+
+
+def results_from_dicts(text: str, items) -> List[RecognizerResult]:
+    """Results sent by a client (``result_to_dict`` format), checked against ``text``"""
+    if not isinstance(items, list):
+        raise ValueError("Campo 'results' deve ser uma lista")
+    results = []
+    for item in items:
+        try:
+            result = RecognizerResult(str(item["entity_type"]), int(item["start"]), int(item["end"]),
+                                      float(item.get("score", 1.0)))
+        except (TypeError, KeyError, ValueError, AttributeError):
+            raise ValueError(f"Resultado inválido: {item!r}")
+        if not 0 <= result.start < result.end <= len(text):
+            raise ValueError(f"Resultado fora do texto: {item!r}")
+        results.append(result)
+    return results
+
+
+_default_anonymizer = None
+_default_lock = threading.Lock()
+
+
+def get_anonymizer() -> Anonymizer:
+    """Return the process-wide ``Anonymizer``, creating it on first use"""
+    global _default_anonymizer
+    if _default_anonymizer is None:
+        with _default_lock:
+            if _default_anonymizer is None:
+                _default_anonymizer = Anonymizer()
+    return _default_anonymizer
 
-    results = analyzer.analyze(text=text, language="pt", return_decision_process=True)
 
-    anonymizer = AnonymizerEngine()
+def cache_stats() -> Dict[str, float]:
+    """Hit/miss counters of the process-wide result cache (empty when disabled)"""
+    cache = get_anonymizer().cache
+    return cache.stats() if cache is not None else {}
 
-    anonymized_text = anonymizer.anonymize(text=text,analyzer_results=results)
-    annotated_tokens = annotate(text=text, analyze_results=results)
-    print(annotated_tokens)
 
-    if AGENT:
-        answer = identificador_agent(text, anonymized_text.text, annotated_tokens)
-    else:
-        answer = None
+def anonymize_text(text, scope=None, entities=None, score_threshold=None, explain=False, document_id=None):
+    """Anonymize ``text``; with ``explain`` returns ``(text, decision process)``"""
+    return get_anonymizer().anonymize(text, scope=scope, entities=entities, score_threshold=score_threshold,
+                                      explain=explain, document_id=document_id)
 
 
-    if answer != None:
-        return answer
-    else:
-        return anonymized_text.text
\ No newline at end of file
+def anonymize_batch(texts, batch_size=BATCH_SIZE, n_process=N_PROCESS, scope=None, entities=None,
+                    score_threshold=None, document_ids=None, tiers=False):
+    """Anonymize a list of texts, running spaCy once per batch instead of once per text"""
+    return get_anonymizer().anonymize_batch(texts, batch_size=batch_size, n_process=n_process, scope=scope,
+                                            entities=entities, score_threshold=score_threshold,
+                                            document_ids=document_ids, tiers=tiers)
@@ -0,0 +1,304 @@
+"""Anonimização em massa de arquivos JSONL/CSV (opcionalmente .zst).
+
+Uso (a partir da raiz do repositório):
+
+    python -m tools.bulk entrada.jsonl.zst saida.jsonl.zst --field text --workers 4
+
+The input is streamed in blocks of ``--block-size`` records. Each block is
+split across a ``multiprocessing`` pool whose workers load the spaCy engine
+once, results are written in input order, and a checkpoint is saved after
+every block so an interrupted run continues with ``--resume``. At most two
+blocks are held in memory at any time. Where processes are forked, the
+engine is loaded once in the parent and the workers inherit it.
+
+With the vault on (``VAULT_DB``), each record is recorded under its
+``--id-field``. Records without one are recorded under a hash of the text,
+written to that field (default ``document_id``) of the output so they can
+be restored later. In ``"tiered"`` mode (``ANALYSIS_MODE``), the tier that
+analyzed each record (``regex`` or ``ner``) goes to its ``camada`` field.
+"""
+import argparse
+import csv
+import gc
+import io
+import json
+import os
+import sys
+import time
+from functools import partial
+from multiprocessing import Pool, get_start_method
+
+import zstandard
+
+from config import ANALYSIS_MODE, VAULT_DB
+
+# Campo da saída com o ID gerado pelo cofre quando não há --id-field
+DOCUMENT_ID_FIELD = "document_id"
+# Campo da saída com a camada que analisou o registro, no modo em camadas
+TIER_FIELD = "camada"
+
+_anonymizer = None
+
+
+def _init_worker():
+    """Load the NLP engine once per worker process"""
+    global _anonymizer
+    from tools.anonimization import get_anonymizer
+    _anonymizer = get_anonymizer().warm_up()
+
+
+def _anonymize_chunk(chunk, entities=None):
+    """Anonymize a chunk of ``(text, document ID)`` pairs, passing ``None`` texts through untouched
+
+    Returns ``(anonymized text, generated ID, tier)`` triples; the ID is the
+    one the vault made up for a text without an ID of its own, ``None``
+    otherwise, and the tier is ``None`` outside ``"tiered"`` mode.
+    """
+    present = [(text, document_id, _anonymizer.document_id(text, document_id)) for text, document_id in chunk
+               if text is not None]
+    if present:
+        anonymized, tiers = _anonymizer.anonymize_batch([text for text, _, _ in present], entities=entities,
+                                                        document_ids=[used for _, _, used in present], tiers=True)
+    else:
+        anonymized, tiers = [], []
+    results = iter(zip(anonymized, (None if document_id is not None else used for _, document_id, used in present),
+                       tiers))
+    return [(None, None, None) if text is None else next(results) for text, _ in chunk]
+
+
+def detect_format(path):
+    name = path[:-4] if path.endswith(".zst") else path
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    raise ValueError(f"Formato não suportado: {path} (use .jsonl, .ndjson ou .csv, opcionalmente .zst)")
+
+
+def open_input(path):
+    fh = open(path, "rb")
+    if path.endswith(".zst"):
+        fh = zstandard.ZstdDecompressor().stream_reader(fh, read_across_frames=True)
+    return io.TextIOWrapper(fh, encoding="utf-8", newline="")
+
+
+def read_records(path, fmt):
+    """Yield ``(record, header)`` pairs; ``header`` is only set for CSV"""
+    with open_input(path) as f:
+        if fmt == "csv":
+            reader = csv.DictReader(f)
+            for row in reader:
+                yield row, reader.fieldnames
+        else:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line), None
+
+
+def check_header(header, field):
+    """``ValueError`` when a CSV ``header`` lacks the ``field`` column (``None``: not CSV)"""
+    if header is not None and field not in header:
+        raise ValueError(f"Coluna '{field}' não encontrada no CSV")
+
+
+def field_value(record, field):
+    """``record[field]``, or ``None`` when absent or when the record is not an object"""
+    return record.get(field) if isinstance(record, dict) else None
+
+
+def iter_blocks(records, block_size, skip=0):
+    block = []
+    for i, record in enumerate(records):
+        if i < skip:
+            continue
+        block.append(record)
+        if len(block) == block_size:
+            yield block
+            block = []
+    if block:
+        yield block
+
+
+def split(items, size):
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+class Checkpoint:
+    """Records how many input records and output bytes are durably written"""
+
+    def __init__(self, path, input_path):
+        self.path = path
+        self.input_path = os.path.abspath(input_path)
+        self.records = 0
+        self.output_bytes = 0
+
+    def load(self):
+        with open(self.path, encoding="utf-8") as f:
+            state = json.load(f)
+        if state["input"] != self.input_path:
+            raise ValueError(f"Checkpoint {self.path} pertence a outro arquivo: {state['input']}")
+        self.records = state["records"]
+        self.output_bytes = state["output_bytes"]
+
+    def save(self):
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"input": self.input_path, "records": self.records,
+                       "output_bytes": self.output_bytes}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self.path)
+
+
+class BlockWriter:
+    """Append-only output; with .zst every block is an independent frame
+
+    Independent frames mean the file can be truncated at any block boundary
+    and still decompress, which is what makes resuming possible. With
+    ``id_field``, the generated document IDs given to ``write_block`` go to
+    that field; with ``tier_field``, the tiers.
+    """
+
+    def __init__(self, path, fmt, field, offset, id_field=None, tier_field=None):
+        self.fmt = fmt
+        self.field = field
+        self.id_field = id_field
+        self.tier_field = tier_field
+        self.compressor = zstandard.ZstdCompressor() if path.endswith(".zst") else None
+        self.fh = open(path, "r+b" if offset else "wb")
+        self.fh.truncate(offset)
+        self.fh.seek(offset)
+        self.header_written = offset > 0
+
+    def write_block(self, records, anonymized, header, document_ids=None, tiers=None):
+        buffer = io.StringIO()
+        for name, values in ((self.id_field, document_ids), (self.tier_field, tiers)):
+            if name is None:
+                continue
+            for record, value in zip(records, values or ()):
+                if value is not None:
+                    record[name] = value
+            if self.fmt == "csv" and name not in header:
+                header = header + [name]
+        if self.fmt == "csv":
+            writer = csv.DictWriter(buffer, fieldnames=header)
+            if not self.header_written:
+                writer.writeheader()
+                self.header_written = True
+            for row, value in zip(records, anonymized):
+                if value is not None:
+                    row[self.field] = value
+                writer.writerow(row)
+        else:
+            for record, value in zip(records, anonymized):
+                if value is not None:
+                    record[self.field] = value
+                buffer.write(json.dumps(record, ensure_ascii=False))
+                buffer.write("\n")
+
+        data = buffer.getvalue().encode("utf-8")
+        if self.compressor is not None:
+            data = self.compressor.compress(data)
+        self.fh.write(data)
+        self.fh.flush()
+        os.fsync(self.fh.fileno())
+        return self.fh.tell()
+
+    def close(self):
+        self.fh.close()
+
+
+def run(input_path, output_path, field="text", workers=None, block_size=1000,
+        chunk_size=50, checkpoint_path=None, resume=False, entities=None, id_field=None):
+    fmt = detect_format(input_path)
+    if detect_format(output_path) != fmt:
+        raise ValueError("Entrada e saída devem ter o mesmo formato")
+
+    checkpoint = Checkpoint(checkpoint_path or output_path + ".checkpoint", input_path)
+    if resume and os.path.exists(checkpoint.path):
+        checkpoint.load()
+        print(f"Retomando a partir do registro {checkpoint.records}", file=sys.stderr)
+
+    if get_start_method() == "fork":
+        # Carrega o motor uma vez aqui; os workers o herdam (copy-on-write)
+        _init_worker()
+        gc.freeze()
+
+    writer = BlockWriter(output_path, fmt, field, checkpoint.output_bytes,
+                         id_field=(id_field or DOCUMENT_ID_FIELD) if VAULT_DB else None,
+                         tier_field=TIER_FIELD if ANALYSIS_MODE == "tiered" else None)
+    records = read_records(input_path, fmt)
+    started = time.perf_counter()
+    processed = 0
+
+    def flush(pending):
+        nonlocal processed
+        block, header, result = pending
+        anonymized, document_ids, tiers = zip(*[item for chunk in result.get() for item in chunk])
+        checkpoint.output_bytes = writer.write_block(block, anonymized, header, document_ids, tiers)
+        checkpoint.records += len(block)
+        checkpoint.save()
+        processed += len(block)
+        rate = processed / (time.perf_counter() - started)
+        print(f"{checkpoint.records} registros ({rate:.1f} registros/s)", file=sys.stderr)
+
+    try:
+        with Pool(workers, initializer=_init_worker) as pool:
+            pending = None
+            for block in iter_blocks(records, block_size, skip=checkpoint.records):
+                header = block[0][1]
+                # Sem a coluna, o CSV sairia idêntico à entrada, como se tivesse sido anonimizado
+                check_header(header, field)
+                block = [record for record, _ in block]
+                texts = [field_value(record, field) for record in block]
+                if fmt == "jsonl":
+                    # Registros sem o campo (ou com valor não textual, ou que não são objetos) passam intactos
+                    texts = [text if isinstance(text, str) else None for text in texts]
+                # Identificador de cada registro no cofre (None: hash do texto)
+                ids = [None if id_field is None or field_value(record, id_field) in (None, "")
+                       else str(record[id_field]) for record in block]
+                result = pool.map_async(partial(_anonymize_chunk, entities=entities),
+                                        split(list(zip(texts, ids)), chunk_size), chunksize=1)
+                # Keep one block in flight while the previous one is written
+                if pending is not None:
+                    flush(pending)
+                pending = (block, header, result)
+            if pending is not None:
+                flush(pending)
+    finally:
+        writer.close()
+
+    elapsed = time.perf_counter() - started
+    if os.path.exists(checkpoint.path):
+        os.remove(checkpoint.path)
+    print(f"Concluído: {processed} registros em {elapsed:.1f}s "
+          f"({processed / elapsed if elapsed else 0:.1f} registros/s)", file=sys.stderr)
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anonimização em massa de arquivos JSONL/CSV")
+    parser.add_argument("input", help="arquivo .jsonl/.ndjson/.csv, opcionalmente .zst")
+    parser.add_argument("output", help="arquivo de saída no mesmo formato da entrada")
+    parser.add_argument("--field", default="text", help="campo JSON ou coluna CSV a anonimizar")
+    parser.add_argument("--workers", type=int, default=None, help="processos (padrão: núcleos da máquina)")
+    parser.add_argument("--block-size", type=int, default=1000, help="registros por bloco/checkpoint")
+    parser.add_argument("--chunk-size", type=int, default=50, help="registros por tarefa de worker")
+    parser.add_argument("--checkpoint", default=None, help="padrão: <saída>.checkpoint")
+    parser.add_argument("--resume", action="store_true", help="continua a partir do checkpoint existente")
+    parser.add_argument("--entities", nargs="+", help="só estes tipos (ex.: CPF EMAIL_ADDRESS); padrão: todos")
+    parser.add_argument("--id-field", help="campo/coluna com o identificador do documento no cofre (VAULT_DB); "
+                                           f"registros sem ID recebem o gerado (padrão: '{DOCUMENT_ID_FIELD}')")
+    args = parser.parse_args(argv)
+
+    try:
+        run(args.input, args.output, field=args.field, workers=args.workers,
+            block_size=args.block_size, chunk_size=args.chunk_size,
+            checkpoint_path=args.checkpoint, resume=args.resume, entities=args.entities,
+            id_field=args.id_field)
+    except ValueError as e:
+        parser.error(str(e))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""Cache de resultados do analisador, endereçado pelo conteúdo.
+
+Documents are analyzed paragraph by paragraph and the analyzer spans of
+each paragraph are cached under ``HMAC(key, fingerprint + paragraph)``, so
+boilerplate repeated across documents (headers, signatures, standard
+clauses) skips spaCy and the recognizers. Spans are cached rather than
+anonymized text because pseudonym numbering depends on the rest of the
+document; only entity types, offsets, scores and the analysis tier are
+stored, never the text itself.
+
+The fingerprint covers the recognizers (class, source file, patterns,
+context, gazetteer file), the settings in config.py, the languages config file and the
+spaCy models, so any change to them starts a fresh key space and stale
+entries simply age out.
+
+The keys are HMACs so that the SQLite file does not let anyone confirm a
+guessed short value (a CPF, a name) by hashing it. The key comes from the
+``CACHE_KEY`` environment variable; without it each cache draws a random
+key, so the SQLite file is only shared by the processes forked after the
+cache was created and its entries are not reused after a restart.
+
+Analyzing paragraph by paragraph changes the results: context words in a
+neighbouring paragraph no longer raise scores and patterns cannot match
+across a paragraph break. That is why ``RESULT_CACHE`` is opt-in.
+
+Two tiers: an in-process LRU with size and TTL eviction, and an optional
+SQLite file (``CACHE_DB``) shared by every worker process.
+"""
+import hashlib
+import hmac
+import inspect
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Sequence
+
+from dotenv import load_dotenv
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+import config
+from tools.tiering import TieredResults, result_tier
+from config import CACHE_SIZE, CACHE_TTL, CACHE_DB
+
+load_dotenv()
+
+KEY_VARIABLE = "CACHE_KEY"
+
+
+def _file_digest(path: Optional[str]) -> Optional[str]:
+    try:
+        with open(path, "rb") as f:
+            return hashlib.sha256(f.read()).hexdigest()
+    except (OSError, TypeError):
+        return None
+
+
+def fingerprint(registry, nlp_engine=None) -> str:
+    """Hash of everything that can change the analyzer output for a given text"""
+    recognizers = []
+    for recognizer in registry.recognizers:
+        cls = type(recognizer)
+        try:
+            source = inspect.getsourcefile(cls)
+        except TypeError:
+            source = None
+        recognizers.append({
+            "class": f"{cls.__module__}.{cls.__qualname__}",
+            "source": _file_digest(source),
+            "name": recognizer.name,
+            "entities": recognizer.supported_entities,
+            "language": recognizer.supported_language,
+            "patterns": [(p.name, p.regex, p.score) for p in getattr(recognizer, "patterns", [])],
+            "context": getattr(recognizer, "context", None),
+            "data": _file_digest(getattr(recognizer, "path", None)),
+        })
+
+    settings = {name: repr(value) for name, value in vars(config).items() if name.isupper()}
+
+    models = {}
+    if hasattr(nlp_engine, "describe"):
+        # Sem carregar os modelos (tools.nlp os carrega no primeiro uso)
+        models = nlp_engine.describe()
+    else:
+        for language, nlp in (getattr(nlp_engine, "nlp", None) or {}).items():
+            meta = getattr(nlp, "meta", {})
+            models[language] = (meta.get("lang"), meta.get("name"), meta.get("version"), nlp.pipe_names)
+
+    state = {
+        "recognizers": sorted(recognizers, key=lambda r: (r["class"], r["name"], r["language"])),
+        "settings": settings,
+        "languages_config": _file_digest(config.LANGUAGES_CONFIG_FILE),
+        "models": models,
+    }
+    return hashlib.sha256(json.dumps(state, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
+def _dump(results: List[RecognizerResult]) -> str:
+    return json.dumps({"tier": result_tier(results),
+                       "results": [[r.entity_type, r.start, r.end, r.score] for r in results]})
+
+
+def _load(value: str) -> TieredResults:
+    value = json.loads(value)
+    return TieredResults((RecognizerResult(entity_type, start, end, score)
+                          for entity_type, start, end, score in value["results"]), value["tier"])
+
+
+class ResultCache:
+    """Two-tier cache of analyzer results, keyed by content hash
+
+    :param fingerprint: configuration hash mixed into every key
+    :param max_entries: entries kept in memory (least recently used are evicted)
+    :param ttl: seconds an entry stays valid, in both tiers
+    :param path: SQLite file shared between processes, or ``None`` for memory only
+    :param key: secret for the key HMACs; defaults to the ``CACHE_KEY``
+        environment variable, or a random key when it is not set
+    """
+
+    def __init__(self, fingerprint: str = "", max_entries: int = CACHE_SIZE,
+                 ttl: float = CACHE_TTL, path: Optional[str] = CACHE_DB,
+                 key: Optional[str] = None):
+        key = key or os.getenv(KEY_VARIABLE)
+        key = key.encode("utf-8") if isinstance(key, str) else key
+        # Sem chave configurada, uma aleatória: o arquivo SQLite só vale para
+        # os processos que herdarem este cache
+        self._hmac_key = hashlib.sha256(b"result-cache\0" + key).digest() if key else os.urandom(32)
+        self.fingerprint = fingerprint
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.path = path
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_pid = None
+        self._db_lock = threading.Lock()
+        self._puts = 0
+        self.hits = 0
+        self.misses = 0
+        self.disk_hits = 0
+
+    def key(self, text: str, entities: Optional[Sequence[str]] = None) -> str:
+        """Key of ``text`` analyzed for ``entities`` (``None``: every entity)"""
+        if entities is not None:
+            text = f"{','.join(sorted(entities))}\0{text}"
+        return hmac.new(self._hmac_key, f"{self.fingerprint}\0{text}".encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def get(self, key: str) -> Optional[List[RecognizerResult]]:
+        """Cached results for ``key`` (fresh copies), or ``None``"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                expires, value = entry
+                if expires > now:
+                    self._memory.move_to_end(key)
+                    self.hits += 1
+                    return _load(value)
+                del self._memory[key]
+
+        value = self._disk_get(key, now)
+        with self._lock:
+            if value is None:
+                self.misses += 1
+                return None
+            self._remember(key, value, now)
+            self.hits += 1
+            self.disk_hits += 1
+        return _load(value)
+
+    def put(self, key: str, results: List[RecognizerResult]) -> None:
+        value = _dump(results)
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+        self._disk_put(key, value, now)
+
+    def _remember(self, key: str, value: str, now: float) -> None:
+        self._memory[key] = (now + self.ttl, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_entries:
+            self._memory.popitem(last=False)
+
+    def _connection(self):
+        # Uma conexão por processo: conexões SQLite não sobrevivem a um fork
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("CREATE TABLE IF NOT EXISTS results (key TEXT PRIMARY KEY, value TEXT, created REAL)")
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _disk_get(self, key: str, now: float) -> Optional[str]:
+        if not self.path:
+            return None
+        with self._db_lock:
+            row = self._connection().execute(
+                "SELECT value FROM results WHERE key = ? AND created > ?", (key, now - self.ttl)
+            ).fetchone()
+        return row[0] if row else None
+
+    def _disk_put(self, key: str, value: str, now: float) -> None:
+        if not self.path:
+            return
+        with self._db_lock:
+            db = self._connection()
+            db.execute("INSERT OR REPLACE INTO results (key, value, created) VALUES (?, ?, ?)", (key, value, now))
+            self._puts += 1
+            if self._puts % 1000 == 0:
+                db.execute("DELETE FROM results WHERE created <= ?", (now - self.ttl,))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._memory.clear()
+        if self.path:
+            with self._db_lock:
+                self._connection().execute("DELETE FROM results")
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "disk_hits": self.disk_hits,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "entries": len(self._memory),
+            }
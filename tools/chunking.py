@@ -0,0 +1,174 @@
+"""Análise de documentos longos em blocos sobrepostos.
+
+Long documents are split on paragraph (or sentence) boundaries into chunks
+that overlap by a few hundred characters, the chunks are analyzed in
+parallel and the results are remapped to document offsets. Entities found
+twice in an overlap are deduplicated, and entities cut by a chunk edge are
+stitched back together with the copy seen by the neighbouring chunk.
+"""
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Tuple
+
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?;:])\s+")
+WHITESPACE = re.compile(r"\s+")
+
+
+def _last_break(pattern, text, lo, hi):
+    """End offset of the last ``pattern`` match inside ``text[lo:hi]``"""
+    cut = None
+    for match in pattern.finditer(text, lo, hi):
+        cut = match.end()
+    return cut
+
+
+def split_text(text: str, max_chars: int, overlap: int) -> List[Tuple[int, str]]:
+    """Split ``text`` into ``(offset, chunk)`` pairs of at most ``max_chars``
+
+    Cuts prefer paragraph breaks, then sentence ends, then whitespace, and
+    only fall back to a hard cut when none exists in the second half of the
+    window. Consecutive chunks share about ``overlap`` characters.
+    """
+    if max_chars <= overlap:
+        raise ValueError("max_chars deve ser maior que overlap")
+
+    chunks = []
+    start = 0
+    while True:
+        if len(text) - start <= max_chars:
+            chunks.append((start, text[start:]))
+            return chunks
+
+        hi = start + max_chars
+        lo = start + max_chars // 2
+        cut = (_last_break(PARAGRAPH_BREAK, text, lo, hi)
+               or _last_break(SENTENCE_BREAK, text, lo, hi)
+               or _last_break(WHITESPACE, text, lo, hi)
+               or hi)
+        chunks.append((start, text[start:cut]))
+
+        # Next chunk starts ``overlap`` characters back, at a word boundary
+        next_start = max(cut - overlap, start + 1)
+        space = WHITESPACE.search(text, next_start, cut)
+        start = space.end() if space else next_start
+
+
+def split_paragraphs(text: str) -> List[Tuple[int, str]]:
+    """``(offset, paragraph)`` pairs for the non-blank paragraphs of ``text``"""
+    paragraphs = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        if text[start:match.start()].strip():
+            paragraphs.append((start, text[start:match.start()]))
+        start = match.end()
+    if text[start:].strip():
+        paragraphs.append((start, text[start:]))
+    return paragraphs
+
+
+def shift_result(result: RecognizerResult, offset: int) -> RecognizerResult:
+    """Copy of ``result`` moved by ``offset`` characters"""
+    return RecognizerResult(
+        entity_type=result.entity_type,
+        start=result.start + offset,
+        end=result.end + offset,
+        score=result.score,
+        analysis_explanation=result.analysis_explanation,
+        recognition_metadata=result.recognition_metadata
+    )
+
+
+def merge_chunk_results(chunks: List[Tuple[int, str]], text_length: int,
+                        chunk_results: List[List[RecognizerResult]]) -> List[RecognizerResult]:
+    """Remap chunk results to document offsets and stitch the overlaps
+
+    A span reported by several chunks is kept once, with the highest score.
+    A span touching an interior chunk edge may have been truncated: it is
+    dropped when another chunk saw a span of the same type covering it, and
+    the pieces of an entity that no chunk saw whole are merged into their
+    union.
+    """
+    candidates = []
+    for index, ((offset, chunk), results) in enumerate(zip(chunks, chunk_results)):
+        chunk_end = offset + len(chunk)
+        for result in results:
+            shifted = shift_result(result, offset)
+            at_edge = ((shifted.start == offset and offset > 0)
+                       or (shifted.end == chunk_end and chunk_end < text_length))
+            candidates.append((shifted, index, at_edge))
+
+    candidates.sort(key=lambda c: (c[0].entity_type, c[0].start, -c[0].end))
+
+    merged = []
+    group = []
+    group_end = 0
+    for candidate in candidates:
+        result = candidate[0]
+        if group and (result.entity_type != group[0][0].entity_type or result.start >= group_end):
+            merged.extend(_resolve_group(group))
+            group = []
+        if not group:
+            group_end = result.end
+        group.append(candidate)
+        group_end = max(group_end, result.end)
+    if group:
+        merged.extend(_resolve_group(group))
+
+    return sorted(merged, key=lambda r: (r.start, r.end))
+
+
+def _resolve_group(group):
+    """Collapse one run of overlapping same-type candidates"""
+    # Cópias do mesmo span: a de maior score; só fica "na borda" se todas estiverem
+    spans = {}
+    for result, index, at_edge in group:
+        key = (result.start, result.end)
+        if key in spans:
+            best, indexes, edge = spans[key]
+            spans[key] = (result if result.score > best.score else best, indexes | {index}, edge and at_edge)
+        else:
+            spans[key] = (result, {index}, at_edge)
+
+    kept = []
+    pieces = []
+    for (start, end), (result, indexes, at_edge) in spans.items():
+        if not at_edge:
+            kept.append(result)
+        elif not any(other_start <= start and end <= other_end and (other_start, other_end) != (start, end)
+                     and other_indexes - indexes
+                     for (other_start, other_end), (_, other_indexes, _) in spans.items()):
+            # Cortado na borda e nenhum outro bloco o viu inteiro
+            pieces.append((result, indexes))
+
+    if len({index for _, indexes in pieces for index in indexes}) > 1:
+        best = max((result for result, _ in pieces), key=lambda r: r.score)
+        kept.append(RecognizerResult(
+            entity_type=best.entity_type,
+            start=min(result.start for result, _ in pieces),
+            end=max(result.end for result, _ in pieces),
+            score=best.score,
+            analysis_explanation=best.analysis_explanation,
+            recognition_metadata=best.recognition_metadata
+        ))
+    else:
+        kept.extend(result for result, _ in pieces)
+    return kept
+
+
+def analyze_in_chunks(analyze: Callable[[str], List[RecognizerResult]], text: str,
+                      max_chars: int, overlap: int, workers: int = 4) -> List[RecognizerResult]:
+    """Analyze ``text`` chunk by chunk with ``analyze`` running in a thread pool
+
+    Texts that fit in ``max_chars`` are analyzed in a single call, so their
+    results are exactly those of ``analyze(text)``.
+    """
+    if len(text) <= max_chars:
+        return analyze(text)
+
+    chunks = split_text(text, max_chars, overlap)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        chunk_results = list(executor.map(analyze, [chunk for _, chunk in chunks]))
+    return merge_chunk_results(chunks, len(text), chunk_results)
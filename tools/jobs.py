@@ -0,0 +1,448 @@
+"""Jobs assíncronos: fila durável em SQLite e processos locais que a consomem.
+
+Large submissions (``POST /jobs``) are written to ``JOBS_DIR/<id>/`` and
+queued in ``JOBS_DIR/jobs.sqlite3``; the request returns at once with the
+job ID. Worker processes (forked by ``server.py`` after the models are
+loaded, or started with ``python -m tools.jobs``) claim one job at a time,
+so ``JOB_WORKERS`` caps the jobs running at once, and write the output
+block by block, reporting progress after each block.
+
+A claimed job holds a lease of ``JOB_LEASE`` seconds, renewed by a
+heartbeat thread while the job runs and with every progress update. Only
+the worker holding the lease can update the job: a worker that lost it
+(e.g. it stalled past the lease) stops at its next update. If its worker
+dies (or the server restarts) the lease expires and another worker picks
+the job up again; CSV/JSONL jobs resume
+from the last written block (``tools.bulk`` checkpoints), text jobs start
+over so the pseudonym numbering stays consistent. A failed attempt is
+retried after ``JOB_RETRY_DELAY`` seconds, doubling each time, up to
+``JOB_MAX_ATTEMPTS``. Finished jobs and their files are deleted after
+``JOB_RETENTION`` seconds.
+
+With the vault on (``VAULT_DB``), CSV/JSONL records get their IDs as in
+``tools.bulk``; the paragraphs of a text job are recorded under the job ID
+(``tools.vault.piece_id``), which is what ``python -m tools.vault
+deanonymize saida.txt original.txt --document-id <job>`` needs. In
+``"tiered"`` mode CSV/JSONL records also get the ``camada`` field of
+``tools.bulk``.
+
+Uso (a partir da raiz do repositório):
+
+    python -m tools.jobs --workers 2
+"""
+import argparse
+import gc
+import json
+import logging
+import os
+import shutil
+import signal
+import sqlite3
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional
+
+from tools.bulk import (DOCUMENT_ID_FIELD, TIER_FIELD, BlockWriter, Checkpoint, check_header,
+                        detect_format as bulk_format, field_value, iter_blocks, open_input, read_records)
+from tools.metrics import JOBS, METRICS
+from tools.streaming import split_pieces
+from tools.vault import piece_id
+from config import (JOBS_DIR, JOB_WORKERS, JOB_MAX_ATTEMPTS, JOB_RETRY_DELAY, JOB_LEASE,
+                    JOB_BLOCK_SIZE, JOB_RETENTION)
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,  -- queued, running, done, failed
+    filename TEXT NOT NULL,  -- nome do arquivo de entrada (define o formato)
+    options TEXT NOT NULL,  -- JSON: field, id_field, entities, score_threshold
+    attempts INTEGER NOT NULL DEFAULT 0,
+    processed INTEGER NOT NULL DEFAULT 0,
+    total INTEGER,
+    error TEXT,
+    worker INTEGER,
+    lease_until REAL,
+    available_at REAL NOT NULL,
+    created REAL NOT NULL,
+    started REAL,
+    finished REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, available_at);
+"""
+
+FORMATS = ("txt", "csv", "jsonl")
+MIMETYPES = {"txt": "text/plain; charset=utf-8", "csv": "text/csv; charset=utf-8",
+             "jsonl": "application/x-ndjson"}
+ZSTD_MIMETYPE = "application/zstd"
+
+
+class LeaseLost(Exception):
+    """The job was claimed by another worker after this one's lease expired"""
+
+
+class Interrupted(Exception):
+    """The worker is stopping; the job goes back to the queue"""
+
+
+def job_format(filename: str) -> str:
+    """``txt``, ``csv`` or ``jsonl`` (CSV/JSONL may be ``.zst``); ``ValueError`` otherwise"""
+    name = filename.lower()
+    if name.endswith(".txt"):
+        return "txt"
+    try:
+        return bulk_format(name)
+    except ValueError:
+        raise ValueError(f"Formato não suportado: {filename} (use .txt, .csv ou .jsonl; .csv e .jsonl também .zst)")
+
+
+class JobQueue:
+    """Jobs table plus the input/output files of every job
+
+    :param directory: where the database and the job files live
+    """
+
+    def __init__(self, directory: str = JOBS_DIR, lease: float = JOB_LEASE,
+                 max_attempts: int = JOB_MAX_ATTEMPTS, retry_delay: float = JOB_RETRY_DELAY):
+        self.directory = directory
+        self.lease = lease
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+        self._db = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Uma conexão por processo: conexões SQLite não sobrevivem a um fork
+        if self._db is None or self._db_pid != os.getpid():
+            os.makedirs(self.directory, exist_ok=True)
+            self._db = sqlite3.connect(os.path.join(self.directory, "jobs.sqlite3"), timeout=30,
+                                       check_same_thread=False, isolation_level=None)
+            self._db.row_factory = sqlite3.Row
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _execute(self, sql: str, parameters=()):
+        with self._lock:
+            return self._connection().execute(sql, parameters)
+
+    def job_dir(self, job_id: str) -> str:
+        return os.path.join(self.directory, job_id)
+
+    def input_path(self, job) -> str:
+        return os.path.join(self.job_dir(job["id"]), "input-" + job["filename"])
+
+    def output_path(self, job) -> str:
+        return os.path.join(self.job_dir(job["id"]), "output-" + job["filename"])
+
+    def submit(self, filename: str, save: Callable[[str], None], options: Optional[Dict] = None) -> str:
+        """Store the input with ``save(path)`` and queue the job; returns its ID"""
+        job_format(filename)
+        job_id = uuid.uuid4().hex
+        job = {"id": job_id, "filename": os.path.basename(filename)}
+        os.makedirs(self.job_dir(job_id), exist_ok=True)
+        try:
+            save(self.input_path(job))
+        except BaseException:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+            raise
+        now = time.time()
+        self._execute("INSERT INTO jobs (id, status, filename, options, available_at, created) "
+                      "VALUES (?, 'queued', ?, ?, ?, ?)",
+                      (job_id, job["filename"], json.dumps(options or {}), now, now))
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        row = self._execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(row) if row else None
+
+    def pending(self) -> int:
+        return self._execute("SELECT COUNT(*) FROM jobs WHERE status IN ('queued', 'running')").fetchone()[0]
+
+    def claim(self, worker: int) -> Optional[Dict]:
+        """Take the oldest job that is due (or whose lease expired), or ``None``"""
+        now = time.time()
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                # Worker morreu na última tentativa: não há outra
+                db.execute("UPDATE jobs SET status = 'failed', finished = ?, worker = NULL, "
+                           "error = 'Worker interrompido na última tentativa' "
+                           "WHERE status = 'running' AND lease_until < ? AND attempts >= ?",
+                           (now, now, self.max_attempts))
+                row = db.execute(
+                    "SELECT id FROM jobs WHERE (status = 'queued' AND available_at <= ?) "
+                    "OR (status = 'running' AND lease_until < ?) ORDER BY created LIMIT 1",
+                    (now, now)
+                ).fetchone()
+                if row is not None:
+                    db.execute("UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, "
+                               "lease_until = ?, started = COALESCE(started, ?) WHERE id = ?",
+                               (worker, now + self.lease, now, row["id"]))
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        return self.get(row["id"]) if row is not None else None
+
+    def _update_own(self, job: Dict, assignments: str, parameters=()) -> bool:
+        """``UPDATE`` a running job only if ``job["worker"]`` still holds it; whether it did"""
+        return self._execute(f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? AND status = 'running'",
+                             (*parameters, job["id"], job["worker"])).rowcount > 0
+
+    def heartbeat(self, job: Dict) -> bool:
+        """Renew the lease; ``False`` if another worker took the job"""
+        return self._update_own(job, "lease_until = ?", (time.time() + self.lease,))
+
+    def progress(self, job: Dict, processed: int, total: Optional[int] = None) -> None:
+        """Record progress and renew the lease; ``LeaseLost`` if another worker took the job"""
+        if not self._update_own(job, "processed = ?, total = COALESCE(?, total), lease_until = ?",
+                                (processed, total, time.time() + self.lease)):
+            raise LeaseLost(job["id"])
+
+    def complete(self, job: Dict) -> bool:
+        if not self._update_own(job, "status = 'done', finished = ?, worker = NULL, lease_until = NULL, "
+                                     "error = NULL", (time.time(),)):
+            return False
+        JOBS.inc("done")
+        return True
+
+    def fail(self, job: Dict, error: str) -> bool:
+        """Retry later with exponential backoff, or mark failed after the last attempt"""
+        now = time.time()
+        if job["attempts"] >= self.max_attempts:
+            if not self._update_own(job, "status = 'failed', finished = ?, worker = NULL, lease_until = NULL, "
+                                         "error = ?", (now, error)):
+                return False
+            JOBS.inc("failed")
+        else:
+            delay = self.retry_delay * 2 ** (job["attempts"] - 1)
+            if not self._update_own(job, "status = 'queued', available_at = ?, worker = NULL, "
+                                         "lease_until = NULL, error = ?", (now + delay, error)):
+                return False
+            JOBS.inc("retried")
+        return True
+
+    def release(self, job: Dict) -> bool:
+        """Give a job back without counting the attempt (the worker is stopping)"""
+        return self._update_own(job, "status = 'queued', attempts = attempts - 1, worker = NULL, "
+                                     "lease_until = NULL")
+
+    def delete(self, job_id: str) -> bool:
+        """Remove a job that is not running, with its files"""
+        deleted = self._execute("DELETE FROM jobs WHERE id = ? AND status != 'running'", (job_id,)).rowcount
+        if deleted:
+            shutil.rmtree(self.job_dir(job_id), ignore_errors=True)
+        return bool(deleted)
+
+    def purge(self, older_than: float = JOB_RETENTION) -> int:
+        """Delete finished jobs (and files) older than ``older_than`` seconds"""
+        rows = self._execute("SELECT id FROM jobs WHERE status IN ('done', 'failed') AND finished < ?",
+                             (time.time() - older_than,)).fetchall()
+        return sum(self.delete(row["id"]) for row in rows)
+
+
+def count_items(path: str, fmt: str) -> int:
+    """Records (CSV/JSONL) or paragraphs (text) in the input"""
+    if fmt == "txt":
+        with open(path, encoding="utf-8") as f:
+            return len(split_pieces(f.read()))
+    if fmt == "csv":
+        return sum(1 for _ in read_records(path, fmt))
+    with open_input(path) as f:
+        return sum(1 for line in f if line.strip())
+
+
+def process(queue: JobQueue, job: Dict, anonymizer, stopping: Callable[[], bool] = lambda: False,
+            block_size: int = JOB_BLOCK_SIZE) -> None:
+    """Run one job, writing the output and reporting progress block by block"""
+    fmt = job_format(job["filename"])
+    options = json.loads(job["options"])
+    analysis = {"entities": options.get("entities"), "score_threshold": options.get("score_threshold")}
+    input_path, output_path = queue.input_path(job), queue.output_path(job)
+    total = count_items(input_path, fmt)
+    queue.progress(job, 0, total)
+
+    if fmt == "txt":
+        # Um documento só: todos os parágrafos no mesmo escopo; recomeça do zero
+        with open(input_path, encoding="utf-8") as f:
+            pieces = split_pieces(f.read())
+        scope = anonymizer.new_scope()
+        with open(output_path, "w", encoding="utf-8") as out:
+            for start in range(0, len(pieces), block_size):
+                if stopping():
+                    raise Interrupted()
+                # No cofre, cada parágrafo fica sob "<ID do job>:<índice>"
+                block = pieces[start:start + block_size]
+                ids = [piece_id(job["id"], start + i) for i in range(len(block))]
+                out.writelines(anonymizer.anonymize_batch(block, scope=scope, document_ids=ids, **analysis))
+                queue.progress(job, min(start + block_size, len(pieces)))
+        return
+
+    field = options.get("field", "text")
+    id_field = options.get("id_field")
+    checkpoint = Checkpoint(output_path + ".checkpoint", input_path)
+    if os.path.exists(checkpoint.path):
+        checkpoint.load()
+    writer = BlockWriter(output_path, fmt, field, checkpoint.output_bytes,
+                         id_field=(id_field or DOCUMENT_ID_FIELD) if anonymizer.vault is not None else None,
+                         tier_field=TIER_FIELD if anonymizer.mode == "tiered" else None)
+    try:
+        for block in iter_blocks(read_records(input_path, fmt), block_size, skip=checkpoint.records):
+            if stopping():
+                raise Interrupted()
+            header = block[0][1]
+            check_header(header, field)
+            block = [record for record, _ in block]
+            # Registros sem o campo textual (ou que não são objetos JSON) passam intactos
+            present = [record for record in block if isinstance(field_value(record, field), str)]
+            ids = [None if id_field is None or record.get(id_field) in (None, "") else str(record[id_field])
+                   for record in present]
+            used = [anonymizer.document_id(record[field], document_id) for record, document_id in zip(present, ids)]
+            # Só o ID gerado (hash do texto) vai para a saída; os do próprio registro já estão lá
+            generated = [None if document_id is not None else new for document_id, new in zip(ids, used)]
+            anonymized, tiers = anonymizer.anonymize_batch([record[field] for record in present], document_ids=used,
+                                                           tiers=True, **analysis) if present else ([], [])
+            anonymized = iter(zip(anonymized, generated, tiers))
+            items = [next(anonymized) if isinstance(field_value(record, field), str) else (None, None, None)
+                     for record in block]
+            values, document_ids, tiers = zip(*items)
+            checkpoint.output_bytes = writer.write_block(block, values, header, document_ids, tiers)
+            checkpoint.records += len(block)
+            checkpoint.save()
+            queue.progress(job, checkpoint.records)
+    finally:
+        writer.close()
+    os.remove(checkpoint.path)
+
+
+@contextmanager
+def heartbeat(queue: JobQueue, job: Dict):
+    """Renew the lease of ``job`` every third of the lease while the block runs (in a thread)"""
+    stop = threading.Event()
+
+    def beat():
+        while not stop.wait(queue.lease / 3) and queue.heartbeat(job):
+            pass
+
+    thread = threading.Thread(target=beat, name=f"heartbeat-{job['id']}", daemon=True)
+    thread.start()
+    try:
+        yield
+    finally:
+        stop.set()
+        thread.join()
+
+
+def work(queue: JobQueue, anonymizer, stopping: Callable[[], bool], poll: float = 1.0) -> None:
+    """Claim and run jobs until ``stopping()``"""
+    last_purge = 0.0
+    while not stopping():
+        if time.time() - last_purge > 3600:
+            queue.purge()
+            last_purge = time.time()
+        job = queue.claim(os.getpid())
+        if job is None:
+            time.sleep(poll)
+            continue
+        logger.info("Job %s: tentativa %d", job["id"], job["attempts"])
+        try:
+            with heartbeat(queue, job):
+                process(queue, job, anonymizer, stopping)
+        except LeaseLost:
+            logger.warning("Job %s assumido por outro worker; abandonado", job["id"])
+        except Interrupted:
+            if queue.release(job):
+                logger.info("Job %s devolvido à fila", job["id"])
+        except Exception as e:
+            # Só o tipo e a mensagem: o conteúdo dos documentos não vai para o banco
+            logger.exception("Job %s falhou", job["id"])
+            if not queue.fail(job, f"{type(e).__name__}: {e}"[:500]):
+                logger.warning("Job %s assumido por outro worker; falha descartada", job["id"])
+        else:
+            if queue.complete(job):
+                logger.info("Job %s concluído", job["id"])
+            else:
+                logger.warning("Job %s assumido por outro worker; conclusão descartada", job["id"])
+
+
+def spawn_worker(queue: JobQueue) -> int:
+    """Fork a job worker; the models loaded in the parent are shared copy-on-write"""
+    pid = os.fork()
+    if pid != 0:
+        return pid
+    try:
+        stop = threading.Event()
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+        signal.signal(signal.SIGINT, lambda signum, frame: stop.set())
+        if METRICS.directory:
+            METRICS.start_autosave()
+        from tools.anonimization import get_anonymizer
+        work(queue, get_anonymizer(), stop.is_set)
+        # Os últimos valores, antes de o mestre recolher o arquivo
+        METRICS.save()
+    finally:
+        os._exit(0)
+
+
+def stop_workers(pids: List[int]) -> None:
+    for pid in pids:
+        try:
+            os.kill(pid, signal.SIGTERM)
+        except ProcessLookupError:
+            pass
+    for pid in pids:
+        try:
+            os.waitpid(pid, 0)
+        except ChildProcessError:
+            pass
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Workers da fila de jobs")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    parser.add_argument("--dir", default=JOBS_DIR, help="diretório da fila (padrão: JOBS_DIR)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(process)d] %(message)s")
+
+    from tools.anonimization import get_anonymizer
+    get_anonymizer().warm_up()
+    # Como no server.py: fora do GC, as páginas dos modelos ficam compartilhadas
+    gc.collect()
+    gc.freeze()
+
+    queue = JobQueue(args.dir)
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    workers = {spawn_worker(queue) for _ in range(args.workers)}
+    logger.info("%d workers de jobs em %s", len(workers), args.dir)
+    while not stopping:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            pid = 0
+        if pid and pid in workers:
+            workers.discard(pid)
+            logger.warning("Worker de jobs %d terminou (status %d); iniciando outro", pid, status)
+            workers.add(spawn_worker(queue))
+        else:
+            time.sleep(0.5)
+    stop_workers(list(workers))
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,433 @@
+"""Instrumentação: duração de cada etapa, contagem de entidades e perfis amostrados.
+
+Every stage of a request is timed into Prometheus-style histograms:
+
+- ``nlp``: spaCy (``process_text`` / ``process_batch``)
+- ``recognizer``: each recognizer's ``analyze``, labelled by recognizer name
+- ``context``: Presidio's context enhancement
+- ``anonymizer``: span resolution and replacement (``tools.spans``)
+- ``vault``: recording the replacements in the re-identification vault
+- ``agent``: the optional LLM refinement
+
+``anonimizador_tier_texts_total`` counts, in ``ANALYSIS_MODE = "tiered"``,
+the texts that stayed in the regex tier and those that reached spaCy NER.
+
+Presidio runs the first three inside ``AnalyzerEngine.analyze``, so
+``instrument_analyzer`` wraps those methods on the engine's own objects.
+``render`` returns the Prometheus text format served by ``GET /metrics``.
+
+With several worker processes (``server.py``), ``METRICS.directory`` points
+to a shared directory: each process saves its values to ``<pid>.json`` and
+``render`` adds up the files of live processes, so any worker answers for
+the whole server. When the master reaps a worker, ``retire`` folds its file
+into ``retired.json``, so counters never go down when workers are replaced.
+
+``Profiler`` profiles a sampled fraction of requests (cProfile or
+tracemalloc) and keeps the dumps of the slowest ones. With
+``PROFILE_SAMPLE_RATE = 0`` it costs one comparison per request.
+"""
+import bisect
+import cProfile
+import functools
+import glob
+import heapq
+import json
+import logging
+import os
+import random
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence
+
+from config import PROFILE_SAMPLE_RATE, PROFILE_MODE, PROFILE_DIR, PROFILE_KEEP
+
+logger = logging.getLogger(__name__)
+
+SECONDS_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CHARS_BUCKETS = (100, 500, 1000, 5000, 10000, 50000, 100000, 500000, 1000000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 500)
+
+
+class Histogram:
+    """Cumulative histogram with labels, as in the Prometheus data model"""
+
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = SECONDS_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._values: Dict[tuple, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *label_values: str) -> None:
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            entry = self._values.get(label_values)
+            if entry is None:
+                entry = self._values[label_values] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            entry[0][index] += 1
+            entry[1] += value
+            entry[2] += 1
+
+    @contextmanager
+    def time(self, *label_values: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, *label_values)
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), counts[:], total, count] for labels, (counts, total, count) in self._values.items()]
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[tuple, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        with self._lock:
+            self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def snapshot(self) -> List:
+        with self._lock:
+            return [[list(labels), value] for labels, value in self._values.items()]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names, values, extra=()) -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in list(zip(names, values)) + list(extra)]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _bound(value: float) -> str:
+    return repr(float(value))
+
+
+RETIRED_FILE = "retired.json"
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _merge(snapshots: List[Dict[str, List]]) -> Dict[str, Dict[tuple, object]]:
+    """Snapshots added up per metric and label set"""
+    merged = {}
+    for snapshot in snapshots:
+        for name, entries in snapshot.items():
+            values = merged.setdefault(name, {})
+            for entry in entries:
+                labels = tuple(entry[0])
+                current = values.get(labels)
+                if len(entry) == 2:
+                    values[labels] = (current or 0) + entry[1]
+                elif current is None:
+                    values[labels] = [entry[1][:], entry[2], entry[3]]
+                else:
+                    current[0] = [a + b for a, b in zip(current[0], entry[1])]
+                    current[1] += entry[2]
+                    current[2] += entry[3]
+    return merged
+
+
+def _load_snapshot(path: str) -> Optional[Dict[str, List]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path: str, snapshot: Dict[str, List]) -> None:
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(path + ".tmp", path)
+
+
+class MetricsRegistry:
+    """All metrics of the process, rendered together by ``render``
+
+    :param directory: shared directory used to add up the metrics of every
+        worker process; ``None`` keeps them in this process only
+    """
+
+    def __init__(self, directory: Optional[str] = None):
+        self.directory = directory
+        self._metrics = []
+
+    def histogram(self, *args, **kwargs) -> Histogram:
+        metric = Histogram(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, *args, **kwargs) -> Counter:
+        metric = Counter(*args, **kwargs)
+        self._metrics.append(metric)
+        return metric
+
+    def snapshot(self) -> Dict[str, List]:
+        return {metric.name: metric.snapshot() for metric in self._metrics}
+
+    def reset(self) -> None:
+        """Zero this process's values and remove the files left in ``directory``"""
+        for metric in self._metrics:
+            with metric._lock:
+                metric._values.clear()
+        if self.directory:
+            # Arquivos de uma execução anterior: um PID reaproveitado seria somado
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+
+    def save(self) -> None:
+        """Write this process's values to ``directory``"""
+        if not self.directory:
+            return
+        _write_snapshot(os.path.join(self.directory, f"{os.getpid()}.json"), self.snapshot())
+
+    def retire(self, pid: int) -> None:
+        """Fold the file of the (already reaped) worker ``pid`` into ``retired.json``
+
+        Called by the master only, so ``retired.json`` has a single writer.
+        """
+        if not self.directory:
+            return
+        path = os.path.join(self.directory, f"{pid}.json")
+        snapshot = _load_snapshot(path)
+        if snapshot is not None:
+            retired_path = os.path.join(self.directory, RETIRED_FILE)
+            merged = _merge([_load_snapshot(retired_path) or {}, snapshot])
+            _write_snapshot(retired_path, {
+                name: [[list(labels)] + (value if isinstance(value, list) else [value])
+                       for labels, value in values.items()]
+                for name, values in merged.items()
+            })
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+    def start_autosave(self, interval: float = 1.0) -> None:
+        """Save every ``interval`` seconds from a daemon thread (one per worker)"""
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.save()
+                except OSError:
+                    logger.exception("Falha ao salvar métricas")
+        threading.Thread(target=loop, name="metrics-autosave", daemon=True).start()
+
+    def _collect(self) -> Dict[str, Dict[tuple, object]]:
+        """Values of every process, added up per metric and label set"""
+        snapshots = [self.snapshot()]
+        if self.directory:
+            self.save()
+            snapshots = []
+            for path in glob.glob(os.path.join(self.directory, "*.json")):
+                name = os.path.basename(path)[:-len(".json")]
+                # Worker morto e ainda não recolhido pelo mestre: seu PID pode
+                # ser de outro processo agora
+                if name.isdigit() and not _alive(int(name)):
+                    continue
+                snapshot = _load_snapshot(path)
+                if snapshot is not None:
+                    snapshots.append(snapshot)
+
+        merged = _merge(snapshots)
+        return {metric.name: merged.get(metric.name, {}) for metric in self._metrics}
+
+    def render(self) -> str:
+        """Prometheus text exposition format (version 0.0.4)"""
+        merged = self._collect()
+        lines = []
+        for metric in self._metrics:
+            values = merged[metric.name]
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            if isinstance(metric, Counter):
+                lines.append(f"# TYPE {metric.name} counter")
+                for labels, value in sorted(values.items()):
+                    lines.append(f"{metric.name}{_labels(metric.labels, labels)} {value}")
+                continue
+
+            lines.append(f"# TYPE {metric.name} histogram")
+            for labels, (counts, total, count) in sorted(values.items()):
+                cumulative = 0
+                for bound, bucket in zip(metric.buckets, counts):
+                    cumulative += bucket
+                    lines.append(f"{metric.name}_bucket{_labels(metric.labels, labels, [('le', _bound(bound))])} "
+                                 f"{cumulative}")
+                lines.append(f"{metric.name}_bucket{_labels(metric.labels, labels, [('le', '+Inf')])} {count}")
+                lines.append(f"{metric.name}_sum{_labels(metric.labels, labels)} {total}")
+                lines.append(f"{metric.name}_count{_labels(metric.labels, labels)} {count}")
+        return "\n".join(lines) + "\n"
+
+
+METRICS = MetricsRegistry()
+
+STAGE_SECONDS = METRICS.histogram(
+    "anonimizador_stage_seconds", "Duração de cada etapa do pipeline", ["stage"])
+RECOGNIZER_SECONDS = METRICS.histogram(
+    "anonimizador_recognizer_seconds", "Duração de cada reconhecedor", ["recognizer"])
+REQUEST_SECONDS = METRICS.histogram(
+    "anonimizador_request_seconds", "Duração das requisições HTTP", ["endpoint", "status"])
+INPUT_CHARS = METRICS.histogram(
+    "anonimizador_input_chars", "Tamanho dos textos anonimizados (caracteres)", buckets=CHARS_BUCKETS)
+DOCUMENT_ENTITIES = METRICS.histogram(
+    "anonimizador_document_entities", "Entidades substituídas por texto", buckets=COUNT_BUCKETS)
+ENTITIES = METRICS.counter(
+    "anonimizador_entities_total", "Entidades substituídas, por tipo", ["entity_type"])
+JOBS = METRICS.counter(
+    "anonimizador_jobs_total", "Tentativas de jobs assíncronos, por resultado (done, retried, failed)", ["status"])
+TIER_TEXTS = METRICS.counter(
+    "anonimizador_tier_texts_total", "Textos analisados no modo em camadas, pela camada mais alta usada", ["tier"])
+
+
+def _timed(method, histogram: Histogram, *label_values: str):
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return method(*args, **kwargs)
+        finally:
+            histogram.observe(time.perf_counter() - start, *label_values)
+    return wrapper
+
+
+def _timed_items(method, histogram: Histogram, *label_values: str):
+    """Like ``_timed`` for generators: one observation per item produced"""
+    @functools.wraps(method)
+    def wrapper(*args, **kwargs):
+        iterator = iter(method(*args, **kwargs))
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            histogram.observe(time.perf_counter() - start, *label_values)
+            yield item
+    return wrapper
+
+
+def instrument_analyzer(analyzer) -> None:
+    """Time the NLP engine, every recognizer and context enhancement of ``analyzer``
+
+    Safe to call more than once: objects already wrapped are skipped.
+    """
+    targets = [
+        (analyzer.nlp_engine, "process_text", STAGE_SECONDS, "nlp"),
+        # process_batch é um gerador: o tempo é medido a cada documento
+        (analyzer.nlp_engine, "process_batch", STAGE_SECONDS, "nlp"),
+        # Só o tokenizador, quando nenhum reconhecedor pedido usa o spaCy
+        (analyzer.nlp_engine, "tokenize", STAGE_SECONDS, "tokenize"),
+        (analyzer.context_aware_enhancer, "enhance_using_context", STAGE_SECONDS, "context"),
+    ]
+    targets += [(recognizer, "analyze", RECOGNIZER_SECONDS, recognizer.name)
+                for recognizer in analyzer.registry.recognizers]
+    for obj, name, histogram, label in targets:
+        method = getattr(obj, name, None)
+        if method is None or getattr(method, "_instrumented", False):
+            continue
+        wrap = _timed_items if name == "process_batch" else _timed
+        wrapper = wrap(method, histogram, label)
+        wrapper._instrumented = True
+        setattr(obj, name, wrapper)
+
+
+def record_document(text: str, entity_types: Sequence[str]) -> None:
+    """Input size and replaced entities of one document"""
+    INPUT_CHARS.observe(len(text))
+    DOCUMENT_ENTITIES.observe(len(entity_types))
+    for entity_type in entity_types:
+        ENTITIES.inc(entity_type)
+
+
+class Profiler:
+    """Profile a sample of requests and keep the dumps of the ``keep`` slowest
+
+    Only one request is profiled at a time (Python allows a single active
+    profiler); samples that arrive meanwhile are skipped. tracemalloc is
+    process-wide, so its snapshots include other threads' allocations.
+
+    :param rate: fraction of requests to profile (0 disables)
+    :param mode: ``"cprofile"`` (``.prof``, open with pstats/snakeviz) or
+        ``"tracemalloc"`` (``.snapshot``, load with ``tracemalloc.Snapshot.load``)
+    """
+
+    def __init__(self, rate: float = PROFILE_SAMPLE_RATE, mode: str = PROFILE_MODE,
+                 directory: str = PROFILE_DIR, keep: int = PROFILE_KEEP):
+        if mode not in ("cprofile", "tracemalloc"):
+            raise ValueError(f"PROFILE_MODE inválido: {mode}")
+        self.rate = rate
+        self.mode = mode
+        self.directory = directory
+        self.keep = keep
+        self._busy = threading.Lock()
+        self._slowest = []  # heap de (duração, arquivo)
+        self._heap_lock = threading.Lock()
+
+    def start(self):
+        """Begin profiling this request if it is sampled; returns a token for ``stop``"""
+        if self.rate <= 0 or random.random() >= self.rate or not self._busy.acquire(blocking=False):
+            return None
+        if self.mode == "cprofile":
+            profile = cProfile.Profile()
+            profile.enable()
+            return profile
+        tracemalloc.start()
+        return tracemalloc
+
+    def stop(self, token, duration: float, label: str) -> Optional[str]:
+        """End profiling; returns the dump path if the request is among the slowest"""
+        if token is None:
+            return None
+        try:
+            if self.mode == "cprofile":
+                token.disable()
+                snapshot = token
+            else:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+        finally:
+            self._busy.release()
+
+        with self._heap_lock:
+            if len(self._slowest) >= self.keep and duration <= self._slowest[0][0]:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            extension = "prof" if self.mode == "cprofile" else "snapshot"
+            path = os.path.join(self.directory, f"{label}-{duration * 1000:.0f}ms-{os.getpid()}-{time.time_ns()}.{extension}")
+            if self.mode == "cprofile":
+                snapshot.dump_stats(path)
+            else:
+                snapshot.dump(path)
+            heapq.heappush(self._slowest, (duration, path))
+            if len(self._slowest) > self.keep:
+                _, removed = heapq.heappop(self._slowest)
+                try:
+                    os.remove(removed)
+                except OSError:
+                    pass
+            logger.info("Perfil salvo em %s", path)
+            return path
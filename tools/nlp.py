@@ -0,0 +1,291 @@
+"""Motor spaCy com perfil de pipeline e tamanho de modelo selecionáveis.
+
+Presidio only uses the tokens, the lemmas (for context words) and the
+entities from spaCy, so the dependency parser, the morphologizer and the
+other components only cost time and memory. The languages config file
+(``LANGUAGES_CONFIG_FILE``) chooses:
+
+- ``pipeline_profile``: a key of ``pipeline_profiles``, each one the list
+  of components left out of ``spacy.load`` (``exclude``). A model entry
+  with its own ``exclude`` list overrides the profile for that language;
+- ``model_size``: ``sm``, ``md`` or ``lg``, replacing ``{size}`` in each
+  ``model_name``.
+
+``PIPELINE_PROFILE`` and ``MODEL_SIZE`` in ``config.py`` override the file
+for one deployment. ``python -m benchmarks.pipeline_profiles`` compares the
+combinations.
+
+Models are loaded per language on first use, so a process that only
+analyzes Portuguese never loads the English model. With
+``ENGINE_SNAPSHOT_DIR`` set, a model is loaded from the snapshot written by::
+
+    python -m tools.nlp snapshot --languages pt
+
+the pipeline already without its excluded components and with the word
+vectors memory-mapped instead of read into each process: their pages are
+loaded on demand and shared by every process on the machine. A snapshot that no longer
+matches the configured model (name, version, excluded components, spaCy
+version) is ignored with a warning.
+"""
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from collections.abc import Mapping
+from typing import Callable, Dict, Iterable, List, Optional
+
+import numpy
+import spacy
+import yaml
+from presidio_analyzer.nlp_engine import (NerModelConfiguration, NlpArtifacts, NlpEngine,
+                                          NlpEngineProvider, SpacyNlpEngine)
+from spacy.language import Language
+from spacy.tokens import Doc
+
+from config import PIPELINE_PROFILE, MODEL_SIZE, ENGINE_SNAPSHOT_DIR, LANGUAGES_CONFIG_FILE
+from tools.startup import startup_stage
+
+logger = logging.getLogger(__name__)
+
+MODEL_SIZES = ("sm", "md", "lg")
+# Arquivos do snapshot de cada idioma, além do pipeline salvo pelo spaCy
+SNAPSHOT_META = "snapshot.json"
+SNAPSHOT_VECTORS = "vectors.npy"
+
+
+def model_version(model_name: str) -> Optional[str]:
+    """Version of an installed model package or model directory, without loading it"""
+    if os.path.isdir(model_name):
+        meta_path = os.path.join(model_name, "meta.json")
+        return spacy.util.load_meta(meta_path).get("version") if os.path.exists(meta_path) else None
+    return spacy.util.get_package_version(model_name)
+
+
+class LazyModels(Mapping):
+    """Language code -> spaCy pipeline, each one loaded on first access
+
+    :param load: loads the pipeline of a language
+    :param languages: configured language codes
+    """
+
+    def __init__(self, load: Callable[[str], Language], languages: Iterable[str]):
+        self._load = load
+        self._languages = list(languages)
+        self._models: Dict[str, Language] = {}
+        self._lock = threading.Lock()
+
+    def __getitem__(self, language: str) -> Language:
+        nlp = self._models.get(language)
+        if nlp is None:
+            if language not in self._languages:
+                raise KeyError(language)
+            with self._lock:
+                nlp = self._models.get(language)
+                if nlp is None:
+                    nlp = self._models[language] = self._load(language)
+        return nlp
+
+    def __iter__(self):
+        return iter(self._languages)
+
+    def __len__(self) -> int:
+        return len(self._languages)
+
+    def loaded(self) -> List[str]:
+        """Languages whose pipeline is already in memory"""
+        return list(self._models)
+
+
+class ProfiledSpacyNlpEngine(SpacyNlpEngine):
+    """``SpacyNlpEngine`` that loads each model without the excluded components, on first use
+
+    :param exclude: components left out of each model, by language code
+    :param snapshot_dir: directory of an engine snapshot (see ``save_snapshot``)
+    """
+
+    def __init__(self, models: Optional[List[Dict[str, str]]] = None,
+                 ner_model_configuration: Optional[NerModelConfiguration] = None,
+                 exclude: Optional[Dict[str, List[str]]] = None, snapshot_dir: Optional[str] = None):
+        super().__init__(models=models, ner_model_configuration=ner_model_configuration)
+        self.exclude = exclude or {}
+        self.snapshot_dir = snapshot_dir
+
+    def load(self) -> None:
+        """Check the configuration; each model is only loaded when its language is first used"""
+        for model in self.models:
+            self._validate_model_params(model)
+        self.nlp = LazyModels(self._load_model, [model["lang_code"] for model in self.models])
+
+    def model_name(self, language: str) -> str:
+        return next(model["model_name"] for model in self.models if model["lang_code"] == language)
+
+    def describe(self) -> Dict[str, Dict]:
+        """Model name, version and excluded components of each language, without loading them"""
+        return {model["lang_code"]: {
+            "model": model["model_name"],
+            "version": model_version(model["model_name"]),
+            "exclude": sorted(self.exclude.get(model["lang_code"], [])),
+            "spacy": spacy.__version__,
+        } for model in self.models}
+
+    def _load_model(self, language: str) -> Language:
+        model_name = self.model_name(language)
+        with startup_stage(f"model:{language}"):
+            started = time.perf_counter()
+            nlp = self._load_snapshot(language) if self.snapshot_dir else None
+            source = "snapshot"
+            if nlp is None:
+                self._download_spacy_model_if_needed(model_name)
+                nlp = spacy.load(model_name, exclude=self.exclude.get(language, []))
+                source = "modelo"
+        self._check_lemmatizer(nlp, model_name)
+        logger.info("Modelo %s carregado (%s) em %.1fs com %s", model_name, source,
+                    time.perf_counter() - started, nlp.pipe_names)
+        return nlp
+
+    def _load_snapshot(self, language: str) -> Optional[Language]:
+        path = os.path.join(self.snapshot_dir, language)
+        try:
+            with open(os.path.join(path, SNAPSHOT_META), encoding="utf-8") as f:
+                meta = json.load(f)
+        except FileNotFoundError:
+            return None
+        if meta != self.describe()[language]:
+            logger.warning("Snapshot %s não corresponde ao modelo configurado (%s); carregando o modelo",
+                           path, meta)
+            return None
+        nlp = spacy.load(path)
+        vectors = os.path.join(path, SNAPSHOT_VECTORS)
+        if os.path.exists(vectors):
+            # Só leitura: as páginas vêm do disco sob demanda e são compartilhadas entre processos
+            nlp.vocab.vectors.data = numpy.load(vectors, mmap_mode="r")
+        return nlp
+
+    @staticmethod
+    def _check_lemmatizer(nlp, model_name: str):
+        # O lematizador por regras depende das classes gramaticais (POS)
+        if "lemmatizer" not in nlp.pipe_names:
+            return
+        if getattr(nlp.get_pipe("lemmatizer"), "mode", None) == "rule" and not (
+                {"tagger", "morphologizer"} & set(nlp.pipe_names)):
+            logger.warning("%s: lematizador por regras sem tagger/morphologizer; "
+                           "os lemas (usados nas palavras de contexto) ficarão imprecisos", model_name)
+
+    def tokenize(self, text: str, language: str) -> NlpArtifacts:
+        """Artifacts from the tokenizer alone: tokens and lemmas, no entities
+
+        Enough for regex recognizers and context words when no spaCy-based
+        recognizer is needed, at a fraction of the cost of the full pipeline.
+        """
+        return self._doc_to_nlp_artifact(self.nlp[language].make_doc(text), language)
+
+    def _doc_to_nlp_artifact(self, doc: Doc, language: str) -> NlpArtifacts:
+        # Sem lematizador o lema vem vazio; o texto em minúsculas ainda casa
+        # com as palavras de contexto escritas na forma base
+        lemmas = [token.lemma_ or token.lower_ for token in doc]
+        entities, scores = self._get_updated_entities(self._get_entities(doc), self._get_scores_for_entities(doc))
+        return NlpArtifacts(
+            entities=entities,
+            tokens=doc,
+            tokens_indices=[token.idx for token in doc],
+            lemmas=lemmas,
+            nlp_engine=self,
+            language=language,
+            scores=scores,
+        )
+
+
+def create_nlp_engine(conf_file: str, profile: Optional[str] = None, size: Optional[str] = None,
+                      snapshot_dir: Optional[str] = ENGINE_SNAPSHOT_DIR) -> NlpEngine:
+    """Build the NLP engine described by ``conf_file`` (spaCy models load on first use)
+
+    :param profile: pipeline profile (default: ``PIPELINE_PROFILE`` or the file)
+    :param size: model size (default: ``MODEL_SIZE`` or the file)
+    :param snapshot_dir: engine snapshot to load the models from, when it matches
+    """
+    with open(conf_file, encoding="utf-8") as f:
+        conf = yaml.safe_load(f)
+
+    if conf.get("nlp_engine_name", "spacy") != "spacy":
+        return NlpEngineProvider(nlp_configuration=conf).create_engine()
+
+    profiles = conf.get("pipeline_profiles", {"full": []})
+    profile = profile or PIPELINE_PROFILE or conf.get("pipeline_profile", "full")
+    if profile not in profiles:
+        raise ValueError(f"Perfil de pipeline desconhecido: {profile} (opções: {', '.join(profiles)})")
+    size = size or MODEL_SIZE or conf.get("model_size", "lg")
+    if size not in MODEL_SIZES:
+        raise ValueError(f"Tamanho de modelo inválido: {size} (opções: {', '.join(MODEL_SIZES)})")
+
+    models = []
+    exclude = {}
+    for model in conf["models"]:
+        model = dict(model)
+        exclude[model["lang_code"]] = model.pop("exclude", profiles[profile]) or []
+        model["model_name"] = model["model_name"].replace("{size}", size)
+        models.append(model)
+
+    ner_conf = conf.get("ner_model_configuration")
+    engine = ProfiledSpacyNlpEngine(
+        models=models,
+        ner_model_configuration=NerModelConfiguration.from_dict(ner_conf) if ner_conf else None,
+        exclude=exclude,
+        snapshot_dir=snapshot_dir,
+    )
+    engine.load()
+    logger.info("Perfil de pipeline '%s', modelos %s", profile, size)
+    return engine
+
+
+def save_snapshot(engine: ProfiledSpacyNlpEngine, directory: str,
+                  languages: Optional[List[str]] = None) -> List[str]:
+    """Write the pipeline of each language (default: all) to ``directory/<language>``
+
+    The word vectors go to a separate ``.npy`` file, which the engine
+    memory-maps when loading the snapshot.
+    """
+    os.makedirs(directory, exist_ok=True)
+    written = []
+    for language in languages or list(engine.nlp):
+        nlp = engine.nlp[language]
+        path = os.path.join(directory, language)
+        tmp = path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        nlp.to_disk(tmp)
+        vectors = os.path.join(tmp, "vocab", "vectors")
+        if os.path.exists(vectors):
+            os.replace(vectors, os.path.join(tmp, SNAPSHOT_VECTORS))
+        with open(os.path.join(tmp, SNAPSHOT_META), "w", encoding="utf-8") as f:
+            json.dump(engine.describe()[language], f, indent=2)
+        shutil.rmtree(path, ignore_errors=True)
+        os.replace(tmp, path)
+        written.append(path)
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Motor spaCy do anonimizador")
+    commands = parser.add_subparsers(dest="command", required=True)
+    snapshot_parser = commands.add_parser("snapshot", help="salva os modelos já perfilados para carga rápida")
+    snapshot_parser.add_argument("--languages", nargs="+", help="idiomas (padrão: todos os configurados)")
+    snapshot_parser.add_argument("--output", default=ENGINE_SNAPSHOT_DIR or "data/engine_snapshot",
+                                 help="diretório do snapshot (use o mesmo em ENGINE_SNAPSHOT_DIR)")
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+
+    engine = create_nlp_engine(LANGUAGES_CONFIG_FILE, snapshot_dir=None)
+    if not isinstance(engine, ProfiledSpacyNlpEngine):
+        parser.error("snapshot só é suportado com nlp_engine_name: spacy")
+    unknown = set(args.languages or []) - set(engine.nlp)
+    if unknown:
+        parser.error(f"idiomas não configurados: {', '.join(sorted(unknown))}")
+    for path in save_snapshot(engine, args.output, args.languages):
+        print(f"Snapshot salvo em {path}", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
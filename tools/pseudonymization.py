@@ -0,0 +1,109 @@
+"""Pseudonimização determinística: ``<PERSON1>``, ``<PERSON2>``, ``<CPF1>``...
+
+Each distinct (entity type, normalized value) pair gets a stable numbered
+placeholder, so "João Silva" and "JOÃO SILVA" share ``<PERSON1>``. A
+``PseudonymScope`` lives for one document by default; sharing one scope
+across documents keeps the numbering consistent between them. A shared
+scope is bounded: past ``max_entries`` the least recently seen values are
+forgotten, and if they come back they get a new number.
+
+``Anonymizer`` calls ``PseudonymScope.placeholder`` from its one-pass
+renderer (``tools.spans.render``); ``PseudonymizeOperator`` gives the same
+numbering to code that uses Presidio's ``AnonymizerEngine`` directly.
+"""
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from presidio_analyzer.recognizer_result import RecognizerResult
+from presidio_anonymizer.entities import InvalidParamError
+from presidio_anonymizer.operators import Operator, OperatorType
+
+# Entidades cuja identidade está nos dígitos, não na formatação
+DIGIT_ENTITIES = {"CPF", "PHONE_NUMBER"}
+
+NON_DIGITS = re.compile(r"\D+")
+SPACES = re.compile(r"\s+")
+
+
+def normalize(entity_type: str, value: str) -> str:
+    """Key used to decide whether two mentions are the same entity"""
+    if entity_type in DIGIT_ENTITIES:
+        digits = NON_DIGITS.sub("", value)
+        if digits:
+            return digits
+    decomposed = unicodedata.normalize("NFKD", value)
+    without_accents = "".join(c for c in decomposed if not unicodedata.combining(c))
+    return SPACES.sub(" ", without_accents).strip().casefold()
+
+
+class PseudonymScope:
+    """Numbering state shared by every placeholder issued in one scope
+
+    :param max_entries: distinct values remembered (least recently seen are
+        forgotten first); ``None`` keeps them all
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries
+        self._ids: Dict[tuple, str] = OrderedDict()
+        self._counters: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def placeholder(self, entity_type: str, value: str) -> str:
+        key = (entity_type, normalize(entity_type, value))
+        placeholder = self._ids.get(key)
+        if placeholder is not None and self.max_entries is None:
+            return placeholder
+        with self._lock:
+            placeholder = self._ids.get(key)
+            if placeholder is None:
+                # O contador nunca volta: um valor esquecido ganha um número novo,
+                # nunca o de outro valor
+                number = self._counters.get(entity_type, 0) + 1
+                self._counters[entity_type] = number
+                placeholder = f"<{entity_type}{number}>"
+                self._ids[key] = placeholder
+                if self.max_entries is not None and len(self._ids) > self.max_entries:
+                    self._ids.popitem(last=False)
+            elif self.max_entries is not None:
+                self._ids.move_to_end(key)
+        return placeholder
+
+    def reserve(self, text: str, results: List[RecognizerResult]) -> None:
+        """Number the entities in order of appearance
+
+        Presidio operates from the end of the text to the start, so without
+        this the first person in the document would get the highest number.
+        """
+        for result in sorted(results, key=lambda r: r.start):
+            self.placeholder(result.entity_type, text[result.start:result.end])
+
+
+class PseudonymizeOperator(Operator):
+    """Presidio operator replacing each entity with its scope placeholder
+
+    Usage (``reserve`` first, so numbers follow the order of appearance)::
+
+        scope = PseudonymScope()
+        scope.reserve(text, results)
+        engine.add_anonymizer(PseudonymizeOperator)
+        engine.anonymize(text, results, operators={
+            "DEFAULT": OperatorConfig("pseudonymize", {"scope": scope})
+        })
+    """
+
+    def operate(self, text: str, params: Dict = None) -> str:
+        return params["scope"].placeholder(params["entity_type"], text)
+
+    def validate(self, params: Dict = None) -> None:
+        if not isinstance(params.get("scope"), PseudonymScope):
+            raise InvalidParamError("Parâmetro 'scope' deve ser um PseudonymScope")
+
+    def operator_name(self) -> str:
+        return "pseudonymize"
+
+    def operator_type(self) -> OperatorType:
+        return OperatorType.Anonymize
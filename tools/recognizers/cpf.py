@@ -1,4 +1,5 @@
-from presidio_analyzer import PatternRecognizer, Pattern, RecognizerRegistry
+from presidio_analyzer import Pattern, RecognizerRegistry
+from tools.recognizers.prefilter import PrefilteredPatternRecognizer
 import re
 
 # Expressão regular básica para CPF (aceita formatos com ou sem pontuação)
@@ -8,8 +9,9 @@ cpf_pattern = Pattern(
     score=0.85
 )
 
-# Criando o reconhecedor personalizado
-class CPFRecognizer(PatternRecognizer):
+# Criando o reconhecedor personalizado (sem palavras-gatilho, usa só o
+# orçamento de tempo de regex do PrefilteredPatternRecognizer)
+class CPFRecognizer(PrefilteredPatternRecognizer):
     def __init__(self):
         super().__init__(
             supported_entity="CPF",
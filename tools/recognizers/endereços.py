@@ -1,4 +1,5 @@
-from presidio_analyzer import PatternRecognizer, Pattern
+from presidio_analyzer import Pattern
+from tools.recognizers.prefilter import PrefilteredPatternRecognizer
 import re
 
 # Padrões para detectar endereços brasileiros
@@ -30,7 +31,7 @@ endereco_patterns = [
     # Cidade + Estado (formato: Cidade - UF ou Cidade/UF) - case insensitive
     Pattern(
         name="Cidade Estado",
-        regex=r"(?i)\b[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+\s*[-/]\s*[a-zA-Z]{2}\b",
+        regex=r"(?i)\b[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]++\s*[-/]\s*[a-zA-Z]{2}\b",
         score=0.90
     ),
     # Complementos de endereço - case insensitive
@@ -60,28 +61,73 @@ endereco_patterns = [
     # Endereço completo com bairro e cidade (mais específico para o caso)
     Pattern(
         name="Endereço Completo com Localização",
-        regex=r"(?i)\b(?:rua|avenida|av\.|r\.|alameda|travessa|estrada)\s+[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+,\s*\d+,\s*[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+,\s*[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+",
+        regex=r"(?i)\b(?:rua|avenida|av\.|r\.|alameda|travessa|estrada)\s+[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]++,\s*\d++,\s*[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]++,\s*[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]++",
         score=0.98
     ),
     # Nomes de ruas/avenidas específicos quando precedidos por "na/no/da/do"
     Pattern(
         name="Logradouro com Preposição",
-        regex=r"(?i)\b(?:na|no|da|do)\s+(?:rua|avenida|av\.|r\.|alameda|travessa|estrada|rodovia|praça|largo)\s+[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]+",
+        regex=r"(?i)\b(?:na|no|da|do)\s+(?:rua|avenida|av\.|r\.|alameda|travessa|estrada|rodovia|praça|largo)\s+[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s]++",
         score=0.90
     ),
     # Situado/localizado + endereço
     Pattern(
         name="Endereço com Localização",
-        regex=r"(?i)\b(?:situada|situado|localizada|localizado)\s+(?:na|no|em|à)\s+(?:rua|avenida|av\.|r\.|alameda|travessa|estrada)\s+[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s,\d]+",
+        regex=r"(?i)\b(?:situada|situado|localizada|localizado)\s+(?:na|no|em|à)\s+(?:rua|avenida|av\.|r\.|alameda|travessa|estrada)\s+[a-zA-ZÀ-ÿ][a-zA-ZÀ-ÿ\s,\d]++",
         score=0.95
     )
 ]
 
-class EnderecoRecognizer(PatternRecognizer):
-    def __init__(self):
+# Palavras-gatilho: cada lista cobre a alternância inicial do padrão
+# correspondente, que só é testado a partir dessas posições
+LOGRADOUROS = ["rua", "avenida", "av.", "r.", "alameda", "travessa", "estrada", "rodovia", "praça", "largo"]
+
+endereco_anchors = {
+    "Logradouro Completo": LOGRADOUROS + ["quadra", "qd", "conjunto", "conj."],
+    "Endereço com Número": LOGRADOUROS,
+    "Bairro": ["bairro", "no bairro", "do bairro"],
+    "Complemento": ["apartamento", "apto", "apt", "casa", "bloco", "bl", "andar", "sala", "loja", "sobreloja"],
+    "Endereço Rural": ["sítio", "fazenda", "chácara", "estância"],
+    "Condomínio": ["condomínio", "residencial", "conjunto habitacional", "vila"],
+    "Rodovia KM": ["rodovia", "rod.", "br", "sp", "rj", "mg"],
+    "Endereço Completo com Localização": ["rua", "avenida", "av.", "r.", "alameda", "travessa", "estrada"],
+    "Logradouro com Preposição": ["na", "no", "da", "do"],
+    "Endereço com Localização": ["situada", "situado", "localizada", "localizado"],
+}
+
+# Padrões que dependem de um logradouro em qualquer ponto do match
+endereco_requires = {
+    "Logradouro com Preposição": LOGRADOUROS,
+}
+
+# Padrões em que, depois do início (head), vem uma sequência de letras e
+# espaços: se o padrão falha numa posição, falha em todas as seguintes da
+# mesma sequência
+LETRA = r"[a-zA-ZÀ-ÿ]"
+SEQUENCIA = r"[a-zA-ZÀ-ÿ\s]*"
+
+
+def _head(keywords):
+    return r"(?:" + "|".join(re.escape(keyword) for keyword in keywords) + r")\s+" + LETRA
+
+
+endereco_runs = {
+    "Cidade Estado": (r"\b" + LETRA, SEQUENCIA),
+    "Logradouro Completo": (_head(endereco_anchors["Logradouro Completo"]), SEQUENCIA),
+    "Endereço com Número": (_head(endereco_anchors["Endereço com Número"]), SEQUENCIA),
+    "Endereço Completo com Localização": (_head(endereco_anchors["Endereço Completo com Localização"]), SEQUENCIA),
+}
+
+class EnderecoRecognizer(PrefilteredPatternRecognizer):
+    # exclude: nomes de padrões a deixar de fora (ex.: "Cidade Estado" quando
+    # o dicionário de municípios está carregado)
+    def __init__(self, exclude=()):
         super().__init__(
+            anchors=endereco_anchors,
+            requires=endereco_requires,
+            runs=endereco_runs,
             supported_entity="ENDEREÇO",
-            patterns=endereco_patterns,
+            patterns=[pattern for pattern in endereco_patterns if pattern.name not in exclude],
             supported_language="pt",
             context=[
                 # Tipos de logradouro
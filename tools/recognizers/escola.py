@@ -1,4 +1,5 @@
-from presidio_analyzer import PatternRecognizer, Pattern
+from presidio_analyzer import Pattern
+from tools.recognizers.prefilter import PrefilteredPatternRecognizer
 import re
 
 # Padrões para detectar nomes de escolas
@@ -59,10 +60,24 @@ escola_patterns = [
     )
 ]
 
+# Palavras que iniciam cada padrão; os padrões só são testados nessas posições
+escola_anchors = {
+    "Escola Municipal/Estadual/Federal": ["Escola"],
+    "Colégio": ["Colégio"],
+    "Centro Educacional": ["Centro"],
+    "Instituto": ["Instituto"],
+    "Universidade": ["Universidade"],
+    "Faculdade": ["Faculdade"],
+    "Escolas SP Abrev": ["EMEF", "EMEI", "CEI", "CIEJA"],
+    "Escolas Abrev Gerais": ["E.M.", "E.E.", "E.F."],
+    "Campus": ["Campus"],
+}
+
 # Criando o reconhecedor personalizado para escolas
-class EscolaRecognizer(PatternRecognizer):
+class EscolaRecognizer(PrefilteredPatternRecognizer):
     def __init__(self):
         super().__init__(
+            anchors=escola_anchors,
             supported_entity="ESCOLA",
             patterns=escola_patterns,
             supported_language="pt",
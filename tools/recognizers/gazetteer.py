@@ -0,0 +1,245 @@
+"""Reconhecedores por dicionário (municípios, bairros, escolas) sobre marisa-trie.
+
+Each gazetteer is a list of names (e.g. IBGE municipalities, neighborhoods,
+INEP school names) compiled once into a ``marisa-trie`` file with::
+
+    python -m tools.recognizers.gazetteer build municipios municipios.csv --column nome
+    python -m tools.recognizers.gazetteer build escolas escolas.csv --column NO_ENTIDADE --delimiter ";" --encoding latin-1
+
+The files in ``GAZETTEER_DIR`` are memory-mapped at startup, which takes
+milliseconds whatever their size, and a gazetteer whose file is missing is
+simply not registered.
+
+Names are matched in a folded form: lowercase, without accents, with
+hyphens and apostrophes as blanks, so "SAO PAULO", "São Paulo" and
+"Embu-Guaçu"/"Embu Guaçu" all find their entry. Folding keeps the length
+of the text, so it is done once for the whole text; then, from each
+capitalized word, one ``prefixes`` lookup returns every entry starting
+there, the longest one that ends on a word boundary wins and the scan
+resumes after it. Names never continue across punctuation or line breaks.
+"""
+import argparse
+import csv
+import logging
+import os
+import re
+import sys
+import unicodedata
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import marisa_trie
+from presidio_analyzer import AnalysisExplanation, EntityRecognizer, RecognizerResult
+
+from config import GAZETTEER_DIR
+
+logger = logging.getLogger(__name__)
+
+# Onde uma busca pode começar: palavra com inicial maiúscula (ou qualquer palavra)
+CAPITALIZED = re.compile(r"\b[^\W\d_a-zà-ÿ]")
+WORD_START = re.compile(r"\b[^\W_]")
+SPACES = re.compile(r" +")
+# Nomes mais longos que isso (depois de normalizados) ficam fora do dicionário
+MAX_KEY_CHARS = 160
+STATES = ["AC", "AL", "AP", "AM", "BA", "CE", "DF", "ES", "GO", "MA", "MT", "MS", "MG", "PA",
+          "PB", "PR", "PE", "PI", "RJ", "RN", "RS", "RO", "RR", "SC", "SP", "SE", "TO"]
+STATE_SUFFIX = re.compile(r"\s*[-/–]\s*(?:" + "|".join(STATES) + r")\b")
+
+# Letras acentuadas -> letra base e separadores de nomes -> espaço, sempre
+# caractere por caractere (diferente do NFKD, mantém as posições)
+FOLD = {ord(c): " " for c in "-'’\t\xa0"}
+for code in range(0xC0, 0x250):
+    base = unicodedata.normalize("NFKD", chr(code))[0]
+    if base != chr(code) and base.isascii():
+        FOLD[code] = base
+
+# Dicionários conhecidos: arquivo <nome>.marisa em GAZETTEER_DIR. "replaces"
+# lista padrões do EnderecoRecognizer que o dicionário torna desnecessários
+GAZETTEERS = {
+    "municipios": {
+        "entity": "ENDEREÇO",
+        "score": 0.6,
+        "state_score": 0.9,  # município seguido de "- UF" ou "/UF"
+        "replaces": ["Cidade Estado"],
+        "context": ["cidade", "município", "natural", "residente", "domiciliado", "mora", "reside",
+                    "em", "comarca", "estado", "naturalidade"],
+    },
+    "bairros": {
+        "entity": "ENDEREÇO",
+        "score": 0.5,
+        "context": ["bairro", "rua", "avenida", "mora", "reside", "residente", "endereço", "localizado"],
+    },
+    "escolas": {
+        "entity": "ESCOLA",
+        "score": 0.85,
+        "context": ["escola", "colégio", "estuda", "aluno", "aluna", "estudante", "matrícula",
+                    "matriculado", "matriculada", "professor", "ensino"],
+    },
+}
+
+
+def fold(text: str) -> str:
+    """Lowercase, unaccented ``text`` with the same length (and offsets)"""
+    folded = text.lower()
+    if len(folded) != len(text):
+        # Raro: minúscula com mais de um caractere (ex.: "İ")
+        folded = "".join(c.lower() if len(c.lower()) == 1 else c for c in text)
+    return folded.translate(FOLD)
+
+
+def gazetteer_key(name: str) -> str:
+    """Lookup key of a name: folded, with single spaces between words"""
+    return SPACES.sub(" ", fold(name)).strip()
+
+
+class GazetteerRecognizer(EntityRecognizer):
+    """Longest-match lookup of the words of a text in a ``marisa_trie.Trie``
+
+    :param trie: normalized names (see ``gazetteer_key``)
+    :param supported_entity: entity type of every match
+    :param score: score of a match
+    :param state_score: score of a match followed by a state code ("Niterói - RJ"),
+        which is then included in the span; ``None`` ignores state codes
+    :param capitalized: only start matches at capitalized words
+    :param replaces: pattern names of other recognizers this gazetteer supersedes
+    :param path: trie file, for the cache fingerprint
+    """
+
+    def __init__(self, trie: marisa_trie.Trie, supported_entity: str, name: Optional[str] = None,
+                 score: float = 0.6, state_score: Optional[float] = None, capitalized: bool = True,
+                 replaces: Optional[List[str]] = None, path: Optional[str] = None,
+                 supported_language: str = "pt", context: Optional[List[str]] = None):
+        self.trie = trie
+        self.score = score
+        self.state_score = state_score
+        self.capitalized = capitalized
+        self.replaces = replaces or []
+        self.path = path
+        super().__init__(supported_entities=[supported_entity], name=name,
+                         supported_language=supported_language, context=context)
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> "GazetteerRecognizer":
+        trie = marisa_trie.Trie()
+        trie.mmap(path)
+        return cls(trie, path=path, **kwargs)
+
+    def load(self) -> None:
+        pass
+
+    def matches(self, text: str) -> Iterator[tuple]:
+        """``(start, end, with_state)`` of every longest match, left to right"""
+        folded = fold(text)
+        resume = 0
+        for word in (CAPITALIZED if self.capitalized else WORD_START).finditer(text):
+            start = word.start()
+            if start < resume:
+                continue
+            end = None
+            for key in self.trie.prefixes(folded[start:start + MAX_KEY_CHARS]):
+                candidate = start + len(key)
+                # Só vale se terminar no fim de uma palavra
+                if (candidate == len(text) or not folded[candidate].isalnum()) and (end is None or candidate > end):
+                    end = candidate
+            if end is None:
+                continue
+
+            suffix = STATE_SUFFIX.match(text, end) if self.state_score is not None else None
+            resume = suffix.end() if suffix else end
+            yield start, resume, suffix is not None
+
+    def analyze(self, text: str, entities: List[str], nlp_artifacts=None) -> List[RecognizerResult]:
+        results = []
+        for start, end, with_state in self.matches(text):
+            score = self.state_score if with_state else self.score
+            explanation = AnalysisExplanation(
+                recognizer=self.name,
+                original_score=score,
+                textual_explanation=f"Encontrado no dicionário {self.name}",
+            )
+            results.append(RecognizerResult(
+                entity_type=self.supported_entities[0],
+                start=start,
+                end=end,
+                score=score,
+                analysis_explanation=explanation,
+                recognition_metadata={
+                    RecognizerResult.RECOGNIZER_NAME_KEY: self.name,
+                    RecognizerResult.RECOGNIZER_IDENTIFIER_KEY: self.id,
+                },
+            ))
+        return results
+
+
+def gazetteer_path(name: str, directory: str = GAZETTEER_DIR) -> str:
+    return os.path.join(directory, f"{name}.marisa")
+
+
+def load_gazetteers(directory: Optional[str] = GAZETTEER_DIR) -> List[GazetteerRecognizer]:
+    """Recognizers for the gazetteers whose trie file exists in ``directory``"""
+    recognizers = []
+    if not directory:
+        return recognizers
+    for name, settings in GAZETTEERS.items():
+        path = gazetteer_path(name, directory)
+        if not os.path.exists(path):
+            continue
+        settings = dict(settings)
+        recognizers.append(GazetteerRecognizer.from_file(
+            path, name=f"Gazetteer_{name}", supported_entity=settings.pop("entity"), **settings
+        ))
+        logger.info("Dicionário %s carregado (%d nomes)", name, len(recognizers[-1].trie))
+    return recognizers
+
+
+def read_names(path: str, column: Optional[str] = None, delimiter: str = ",",
+               encoding: str = "utf-8") -> Iterator[str]:
+    """Names from a text file (one per line) or from ``column`` of a CSV file"""
+    with open(path, encoding=encoding, newline="") as f:
+        if column is None:
+            for line in f:
+                yield line.strip()
+        else:
+            reader = csv.DictReader(f, delimiter=delimiter)
+            if column not in (reader.fieldnames or []):
+                raise ValueError(f"{path}: coluna '{column}' não encontrada ({', '.join(reader.fieldnames or [])})")
+            for row in reader:
+                yield (row[column] or "").strip()
+
+
+def build(names: Iterable[str], output: str, min_chars: int = 3) -> Dict[str, int]:
+    """Compile ``names`` into a trie file; returns counts of kept and skipped names"""
+    keys = set()
+    skipped = 0
+    for name in names:
+        key = gazetteer_key(name)
+        if len(key) < min_chars or len(key) > MAX_KEY_CHARS:
+            skipped += int(bool(name))
+            continue
+        keys.add(key)
+    os.makedirs(os.path.dirname(output) or ".", exist_ok=True)
+    marisa_trie.Trie(keys).save(output)
+    return {"keys": len(keys), "skipped": skipped}
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Dicionários de municípios, bairros e escolas")
+    commands = parser.add_subparsers(dest="command", required=True)
+    build_parser = commands.add_parser("build", help="gera o arquivo .marisa de um dicionário")
+    build_parser.add_argument("name", choices=sorted(GAZETTEERS))
+    build_parser.add_argument("sources", nargs="+", help="arquivos .txt (um nome por linha) ou .csv")
+    build_parser.add_argument("--column", help="coluna com os nomes (arquivos CSV)")
+    build_parser.add_argument("--delimiter", default=",")
+    build_parser.add_argument("--encoding", default="utf-8")
+    build_parser.add_argument("--min-chars", type=int, default=3, help="descarta nomes mais curtos")
+    build_parser.add_argument("--output", help=f"padrão: {GAZETTEER_DIR}/<nome>.marisa")
+    args = parser.parse_args(argv)
+
+    output = args.output or gazetteer_path(args.name)
+    names = (name for source in args.sources
+             for name in read_names(source, args.column, args.delimiter, args.encoding))
+    counts = build(names, output, args.min_chars)
+    print(f"{output}: {counts['keys']} nomes ({counts['skipped']} descartados)", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,227 @@
+from presidio_analyzer import PatternRecognizer, EntityRecognizer, RecognizerResult
+from typing import Dict, List, Optional, Tuple
+import logging
+import time
+import regex as re
+from config import REGEX_TIME_BUDGET
+
+logger = logging.getLogger(__name__)
+
+
+class PrefilteredPatternRecognizer(PatternRecognizer):
+    """PatternRecognizer que só executa cada padrão onde suas palavras-gatilho ocorrem
+
+    A single pass of one combined regex finds every position where any
+    trigger keyword starts. Then, per pattern:
+
+    - ``anchors``: the pattern can only match starting at one of these
+      keywords, so it is tried (anchored) at those positions only;
+    - ``requires``: the pattern can only match if one of these keywords
+      occurs somewhere, so it is skipped entirely otherwise;
+    - patterns listed in neither run over the whole text as usual.
+
+    Matches are emulated exactly as ``finditer`` would return them
+    (left to right, non-overlapping), so results are identical to
+    ``PatternRecognizer``'s as long as the keyword lists cover the leading
+    alternation of each anchored pattern.
+
+    Patterns listed in ``runs`` continue, after a short ``head`` (e.g. a
+    keyword, blanks and one letter), with an unbounded run of characters
+    matched by ``run`` (e.g. ``[a-z\s]*``). When the pattern fails at a
+    position where ``head`` matched, it also fails at every later start
+    inside the same run, so those starts are skipped; this keeps patterns
+    like ``[a-z][a-z\s]+\s*[-/]...`` linear instead of quadratic. Patterns
+    in ``runs`` without ``anchors`` are tried wherever ``head`` matches.
+
+    All regex work on one document shares a ``time_budget`` (seconds). When
+    it runs out the remaining matching is abandoned with a warning and the
+    results found so far are returned, so a malformed document cannot
+    stall a worker.
+
+    :param anchors: pattern name -> keywords that start every match
+    :param requires: pattern name -> keywords that every match depends on
+    :param runs: pattern name -> ``(head, run)`` regexes as described above
+    :param time_budget: seconds of regex matching per document, ``None`` for no limit
+    """
+
+    def __init__(self, anchors: Dict[str, List[str]] = None, requires: Dict[str, List[str]] = None,
+                 runs: Dict[str, Tuple[str, str]] = None, time_budget: Optional[float] = REGEX_TIME_BUDGET,
+                 **kwargs):
+        super().__init__(**kwargs)
+        self.anchors = anchors or {}
+        self.requires = requires or {}
+        self.runs = runs or {}
+        self.time_budget = time_budget
+        groups = {tuple(keywords) for keywords in list(self.anchors.values()) + list(self.requires.values())}
+        self._groups = sorted(groups)
+        self._compiled_flags = None
+
+    def _compile_triggers(self, flags: int):
+        if self._compiled_flags == flags:
+            return
+        keywords = sorted({keyword for group in self._groups for keyword in group}, key=len, reverse=True)
+        # Alternativas mais longas primeiro: cada posição devolve o maior gatilho que casa ali
+        self._scanner = re.compile(
+            r"\b(?:" + "|".join(re.escape(keyword) for keyword in keywords) + ")", flags
+        ) if keywords else None
+        # Groups to credit for a hit on a given (longest) keyword: every group
+        # holding a keyword that is a prefix of it
+        self._groups_by_keyword = {
+            keyword.lower(): [group for group in self._groups
+                              if any(keyword.lower().startswith(other.lower()) for other in group)]
+            for keyword in keywords
+        }
+        self._heads = {group: re.compile("|".join(re.escape(keyword) for keyword in group), flags)
+                       for group in self._groups}
+        self._runs = {}
+        for name, (head, run) in self.runs.items():
+            run_regex = re.compile(run, flags)
+            # Gatilhos com caracteres de fora da sequência (ex.: "av.") podem
+            # começar dentro dela e terminar depois: esses nunca são pulados
+            straddling = [keyword for keyword in self.anchors.get(name, []) if not run_regex.fullmatch(keyword)]
+            self._runs[name] = (
+                re.compile(head, flags),
+                run_regex,
+                re.compile("|".join(re.escape(keyword) for keyword in straddling), flags) if straddling else None,
+            )
+        self._compiled_flags = flags
+
+    def find_triggers(self, text: str, flags: int, deadline: Optional[float] = None) -> Dict[tuple, List[int]]:
+        """Start positions of each keyword group, from one scan of the text"""
+        self._compile_triggers(flags)
+        positions = {group: [] for group in self._groups}
+        if self._scanner is None:
+            return positions
+        for hit in self._scanner.finditer(text, overlapped=True, timeout=self._remaining(deadline)):
+            start = hit.start()
+            groups = self._groups_by_keyword.get(hit.group().lower())
+            if groups is None:
+                # Caixa que não se reduz com lower(): confere grupo a grupo
+                groups = [group for group, head in self._heads.items() if head.match(text, start)]
+            for group in groups:
+                positions[group].append(start)
+        return positions
+
+    @staticmethod
+    def _remaining(deadline: Optional[float]) -> Optional[float]:
+        if deadline is None:
+            return None
+        remaining = deadline - time.perf_counter()
+        if remaining <= 0:
+            raise TimeoutError("regex time budget exhausted")
+        return remaining
+
+    def iter_matches(self, pattern, compiled, text: str, triggers: Dict[tuple, List[int]],
+                     deadline: Optional[float] = None):
+        """Same matches as ``compiled.finditer(text)``, restricted to trigger windows
+
+        Raises ``TimeoutError`` once ``deadline`` (a ``time.perf_counter`` value) passes.
+        """
+        required = self.requires.get(pattern.name)
+        if required is not None and not triggers[tuple(required)]:
+            return
+
+        runs = self._runs.get(pattern.name)
+        anchors = self.anchors.get(pattern.name)
+        if anchors is None and runs is None:
+            yield from compiled.finditer(text, timeout=self._remaining(deadline))
+            return
+
+        if anchors is None:
+            head = runs[0]
+            position = 0
+            while True:
+                candidate = head.search(text, position, timeout=self._remaining(deadline))
+                if candidate is None:
+                    return
+                start = candidate.start()
+                match = compiled.match(text, start, timeout=self._remaining(deadline))
+                if match:
+                    yield match
+                    position = max(match.end(), start + 1)
+                else:
+                    position = max(self._run_end(runs, text, start), start + 1)
+
+        resume_at = 0
+        skip_until = 0
+        for start in triggers[tuple(anchors)]:
+            if start < resume_at:
+                continue
+            if start < skip_until and not (runs[2] and runs[2].match(text, start)):
+                continue
+            match = compiled.match(text, start, timeout=self._remaining(deadline))
+            if match:
+                yield match
+                resume_at = max(match.end(), start + 1)
+            elif runs is not None:
+                skip_until = self._run_end(runs, text, start)
+
+    @staticmethod
+    def _run_end(runs, text: str, start: int) -> int:
+        """End of the run following ``head`` at ``start`` (``start`` if ``head`` does not match)"""
+        head, run, _ = runs
+        match = head.match(text, start)
+        return run.match(text, match.end()).end() if match else start
+
+    def analyze(self, text: str, entities: List[str], nlp_artifacts=None,
+                regex_flags: Optional[int] = None) -> List[RecognizerResult]:
+        if not self.patterns:
+            return []
+
+        flags = regex_flags if regex_flags else self.global_regex_flags
+        deadline = time.perf_counter() + self.time_budget if self.time_budget else None
+        results = []
+        pattern = None
+        try:
+            triggers = self.find_triggers(text, flags, deadline)
+            for pattern in self.patterns:
+                # Compila o regex se as flags mudaram (mesma regra do PatternRecognizer)
+                if not pattern.compiled_regex or pattern.compiled_with_flags != flags:
+                    pattern.compiled_with_flags = flags
+                    pattern.compiled_regex = re.compile(pattern.regex, flags=flags)
+
+                for match in self.iter_matches(pattern, pattern.compiled_regex, text, triggers, deadline):
+                    result = self._build_result(text, match, pattern, flags)
+                    if result is not None:
+                        results.append(result)
+        except TimeoutError:
+            logger.warning(
+                "%s: orçamento de %.2fs para regex esgotado no padrão '%s' (%d caracteres); "
+                "resultados parciais",
+                self.name, self.time_budget, pattern.name if pattern else "gatilhos", len(text)
+            )
+
+        return EntityRecognizer.remove_duplicates(results)
+
+    def _build_result(self, text: str, match, pattern, flags: int) -> Optional[RecognizerResult]:
+        """Turn a match into a result exactly as ``PatternRecognizer`` does"""
+        start, end = match.span()
+        current_match = text[start:end]
+        if current_match == "":
+            return None
+
+        validation_result = self.validate_result(current_match)
+        description = self.build_regex_explanation(
+            self.name, pattern.name, pattern.regex, pattern.score, validation_result, flags
+        )
+        result = RecognizerResult(
+            entity_type=self.supported_entities[0],
+            start=start,
+            end=end,
+            score=pattern.score,
+            analysis_explanation=description,
+            recognition_metadata={
+                RecognizerResult.RECOGNIZER_NAME_KEY: self.name,
+                RecognizerResult.RECOGNIZER_IDENTIFIER_KEY: self.id,
+            },
+        )
+
+        if validation_result is not None:
+            result.score = EntityRecognizer.MAX_SCORE if validation_result else EntityRecognizer.MIN_SCORE
+
+        invalidation_result = self.invalidate_result(current_match)
+        if invalidation_result is not None and invalidation_result:
+            result.score = EntityRecognizer.MIN_SCORE
+
+        description.score = result.score
+        return result if result.score > EntityRecognizer.MIN_SCORE else None
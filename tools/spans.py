@@ -0,0 +1,125 @@
+"""Resolução de sobreposições e substituição das entidades em uma única passada.
+
+``resolve_spans`` takes the analyzer results in order of start (a heap, so
+the leftover of a trimmed entity can go back in line) and sweeps them left
+to right, keeping the output free of overlaps:
+
+- overlapping (or space-separated) entities of the same type are merged;
+- an entity contained in another is dropped (the outer one covers it);
+- on a partial overlap between types, the higher score wins (then the
+  longer span) and the other entity keeps only its non-overlapping part,
+  so no character of either entity is left in clear text.
+
+The result is a ``Spans``: parallel lists of start, end, type and score,
+sorted by start, which serializes directly to compact JSON. ``render``
+builds the anonymized text from it in one pass over the string.
+"""
+import heapq
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+
+class Spans:
+    """Non-overlapping entity spans stored column by column, sorted by start"""
+
+    __slots__ = ("start", "end", "entity_type", "score")
+
+    def __init__(self, start: Optional[List[int]] = None, end: Optional[List[int]] = None,
+                 entity_type: Optional[List[str]] = None, score: Optional[List[float]] = None):
+        self.start = start if start is not None else []
+        self.end = end if end is not None else []
+        self.entity_type = entity_type if entity_type is not None else []
+        self.score = score if score is not None else []
+
+    def __len__(self) -> int:
+        return len(self.start)
+
+    def __iter__(self) -> Iterator[Tuple[int, int, str, float]]:
+        return zip(self.start, self.end, self.entity_type, self.score)
+
+    def append(self, start: int, end: int, entity_type: str, score: float) -> None:
+        self.start.append(start)
+        self.end.append(end)
+        self.entity_type.append(entity_type)
+        self.score.append(score)
+
+    def pop(self) -> None:
+        for column in (self.start, self.end, self.entity_type, self.score):
+            column.pop()
+
+    def results(self) -> List[RecognizerResult]:
+        return [RecognizerResult(entity_type, start, end, score) for start, end, entity_type, score in self]
+
+    def to_dict(self) -> Dict[str, list]:
+        return {"start": self.start, "end": self.end, "entity_type": self.entity_type, "score": self.score}
+
+
+def resolve_spans(text: str, results: List[RecognizerResult]) -> Spans:
+    """Non-overlapping ``Spans`` for ``results``, in O(n log n)"""
+    spans = Spans()
+    starts, ends, types, scores = spans.start, spans.end, spans.entity_type, spans.score
+
+    def push(start, end, entity_type, score):
+        # Mesmo tipo separado só por espaços: uma entidade só
+        if (types and types[-1] == entity_type and start > ends[-1]
+                and text[ends[-1]:start].strip(" ") == ""):
+            ends[-1] = end
+            scores[-1] = max(scores[-1], score)
+        else:
+            spans.append(start, end, entity_type, score)
+
+    # Fila por início; o que sobra de uma entidade aparada volta para a fila
+    queue = [(r.start, -r.end, -r.score, i, r.entity_type) for i, r in enumerate(results)]
+    heapq.heapify(queue)
+    sequence = len(queue)
+    while queue:
+        start, end, score, _, entity_type = heapq.heappop(queue)
+        end, score = -end, -score
+        if not starts or start >= ends[-1]:
+            push(start, end, entity_type, score)
+        elif entity_type == types[-1]:
+            ends[-1] = max(ends[-1], end)
+            scores[-1] = max(scores[-1], score)
+        elif end <= ends[-1]:
+            continue
+        elif (score, end - start) > (scores[-1], ends[-1] - starts[-1]):
+            # A nova entidade vence: a anterior fica só com a parte antes dela
+            trimmed = start
+            while trimmed > starts[-1] and text[trimmed - 1].isspace():
+                trimmed -= 1
+            if trimmed > starts[-1]:
+                ends[-1] = trimmed
+            else:
+                spans.pop()
+            push(start, end, entity_type, score)
+        else:
+            # A anterior vence: a nova fica só com a parte depois dela
+            trimmed = ends[-1]
+            while trimmed < end and text[trimmed].isspace():
+                trimmed += 1
+            if trimmed < end:
+                heapq.heappush(queue, (trimmed, -end, -score, sequence, entity_type))
+                sequence += 1
+    return spans
+
+
+def render(text: str, spans: Spans, replacement: Callable[[str, str], str]) -> Tuple[str, Spans]:
+    """Replace every span with ``replacement(entity_type, value)`` in one pass
+
+    Returns the new text and the spans of the replacements in it.
+    """
+    pieces = []
+    output = Spans()
+    position = 0
+    last = 0
+    for start, end, entity_type, score in spans:
+        pieces.append(text[last:start])
+        position += start - last
+        value = replacement(entity_type, text[start:end])
+        pieces.append(value)
+        output.append(position, position + len(value), entity_type, score)
+        position += len(value)
+        last = end
+    pieces.append(text[last:])
+    return "".join(pieces), output
@@ -0,0 +1,89 @@
+"""Tempo de inicialização: quanto cada etapa de uma partida a frio custou neste processo.
+
+The expensive steps of a cold start are timed with ``startup_stage``:
+
+- ``import``: importing the app or ``tools.anonimization`` (Presidio,
+  spaCy, recognizers, gazetteers);
+- ``model:<language>``: loading one spaCy model (or its snapshot), which
+  only happens when that language is first used;
+- ``warm_up``: the first analysis, which includes loading the Portuguese
+  model when it was not loaded yet;
+- ``llm_client``: creating the LLM client of the agent (``AGENT``).
+
+``report`` returns them with the age of the process; ``server.py`` logs it
+and ``GET /ready`` returns it. To measure a cold start from the command
+line (a fresh process, imports included)::
+
+    python -m tools.startup
+"""
+import argparse
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+STAGES: Dict[str, float] = {}
+_lock = threading.Lock()
+
+
+@contextmanager
+def startup_stage(name: str):
+    """Add the duration of the block to stage ``name``"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            STAGES[name] = STAGES.get(name, 0.0) + elapsed
+
+
+def process_age() -> Optional[float]:
+    """Seconds since this process started (Linux only; ``None`` elsewhere)"""
+    try:
+        with open("/proc/self/stat", encoding="ascii") as f:
+            # Campos depois do nome do executável; starttime é o 22º do arquivo
+            fields = f.read().rsplit(")", 1)[1].split()
+        with open("/proc/uptime", encoding="ascii") as f:
+            uptime = float(f.read().split()[0])
+    except (OSError, IndexError, ValueError):
+        return None
+    return uptime - int(fields[19]) / os.sysconf("SC_CLK_TCK")
+
+
+def report() -> Dict:
+    """Seconds spent in each stage so far and the age of the process"""
+    with _lock:
+        stages = {name: round(seconds, 3) for name, seconds in STAGES.items()}
+    age = process_age()
+    return {"etapas": stages, "processo_s": None if age is None else round(age, 2)}
+
+
+def format_report(data: Optional[Dict] = None) -> str:
+    data = data or report()
+    stages = ", ".join(f"{name}={seconds:.2f}s" for name, seconds in data["etapas"].items())
+    age = "" if data["processo_s"] is None else f" (processo iniciado há {data['processo_s']:.1f}s)"
+    return f"{stages or 'nenhuma etapa'}{age}"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Mede uma inicialização a frio do anonimizador")
+    parser.add_argument("--no-warm-up", action="store_true", help="só importa (os modelos ficam para o 1º uso)")
+    parser.add_argument("--json", action="store_true", help="imprime o relatório em JSON")
+    args = parser.parse_args(argv)
+
+    # Com "python -m" este arquivo roda como __main__; as etapas ficam em tools.startup
+    from tools.startup import format_report, report, startup_stage
+    with startup_stage("import"):
+        from tools.anonimization import get_anonymizer
+    if not args.no_warm_up:
+        get_anonymizer().warm_up()
+    data = report()
+    print(json.dumps(data, ensure_ascii=False) if args.json else format_report(data))
+    return data
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""Anonimização progressiva: um resultado por parágrafo ou registro, à medida que saem.
+
+Used by the ``POST /stream`` endpoint, which writes each item as one NDJSON
+line so clients can show partial output and progress on large inputs.
+
+- Text (``.txt`` or a JSON ``text``): split into paragraphs that keep their
+  trailing blank lines, so joining the ``text`` of every item rebuilds the
+  document. All paragraphs share one pseudonym scope, keeping
+  ``<PERSON1>`` the same person throughout the document.
+- CSV / JSONL: one item per record with the ``field`` column anonymized;
+  each record is an independent document.
+
+With the vault on (``VAULT_DB``), text items carry the ``document_id`` of
+the whole text (its paragraphs are recorded under ``tools.vault.piece_id``)
+and anonymized records get the generated ID in ``document_id``, as in
+``tools.bulk``.
+"""
+import csv
+import io
+import json
+from typing import Dict, Iterator, List
+
+from tools.anonimization import get_anonymizer
+from tools.bulk import DOCUMENT_ID_FIELD, field_value
+from tools.chunking import PARAGRAPH_BREAK
+from tools.vault import piece_id
+from config import STREAM_BATCH_SIZE
+
+
+def detect_format(filename: str) -> str:
+    name = (filename or "").lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if name.endswith(".txt"):
+        return "txt"
+    raise ValueError(f"Formato não suportado: {filename} (use .txt, .csv ou .jsonl)")
+
+
+def split_pieces(text: str) -> List[str]:
+    """Paragraphs with their trailing separators; ``"".join`` gives back ``text``"""
+    pieces = []
+    start = 0
+    for match in PARAGRAPH_BREAK.finditer(text):
+        pieces.append(text[start:match.end()])
+        start = match.end()
+    if start < len(text) or not pieces:
+        pieces.append(text[start:])
+    return pieces
+
+
+def stream_text(text: str, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield ``{"index", "total", "text"}`` for each paragraph of ``text`` (and ``document_id`` with the vault)"""
+    anonymizer = get_anonymizer()
+    scope = anonymizer.new_scope()
+    document_id = anonymizer.document_id(text)
+    pieces = split_pieces(text)
+    for start in range(0, len(pieces), batch_size):
+        batch = pieces[start:start + batch_size]
+        ids = None if document_id is None else [piece_id(document_id, start + i) for i in range(len(batch))]
+        for i, anonymized in enumerate(anonymizer.anonymize_batch(batch, scope=scope, document_ids=ids)):
+            item = {"index": start + i, "total": len(pieces), "text": anonymized}
+            if document_id is not None:
+                item["document_id"] = document_id
+            yield item
+
+
+def read_records(content: str, fmt: str, field: str) -> List[Dict]:
+    if fmt == "csv":
+        reader = csv.DictReader(io.StringIO(content))
+        records = list(reader)
+        if reader.fieldnames is None or field not in reader.fieldnames:
+            raise ValueError(f"Coluna '{field}' não encontrada no CSV")
+        return records
+    return [json.loads(line) for line in content.splitlines() if line.strip()]
+
+
+def stream_records(records: List[Dict], field: str, batch_size: int = STREAM_BATCH_SIZE) -> Iterator[Dict]:
+    """Yield ``{"index", "total", "record"}`` with ``record[field]`` anonymized
+
+    Records without a textual ``field`` (or that are not JSON objects) are
+    passed through untouched.
+    """
+    anonymizer = get_anonymizer()
+    for start in range(0, len(records), batch_size):
+        batch = records[start:start + batch_size]
+        present = [record for record in batch if isinstance(field_value(record, field), str)]
+        ids = [anonymizer.document_id(record[field]) for record in present]
+        anonymized = iter(zip(anonymizer.anonymize_batch([record[field] for record in present], document_ids=ids),
+                              ids) if present else ())
+        for i, record in enumerate(batch):
+            if isinstance(field_value(record, field), str):
+                value, document_id = next(anonymized)
+                record = dict(record, **{field: value})
+                if document_id is not None:
+                    record[DOCUMENT_ID_FIELD] = document_id
+            yield {"index": start + i, "total": len(records), "record": record}
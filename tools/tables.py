@@ -0,0 +1,183 @@
+"""Anonimização de tabelas (DataFrame, Parquet) coluna a coluna, com política por coluna.
+
+Uso (a partir da raiz do repositório):
+
+    python -m tools.tables entrada.parquet saida.parquet --policy nome=ner --policy cpf=regex \\
+        --policy observacao=CPF,EMAIL_ADDRESS
+
+Each column gets a policy:
+
+- ``"skip"`` (or no policy): passed through untouched;
+- ``"regex"``: only the pattern recognizers (CPF, email, phone, addresses,
+  schools, gazetteers), with the spaCy tokenizer alone;
+- ``"ner"``: every entity type, spaCy NER included;
+- a list of entity types (or a comma-separated string), as ``entities``
+  elsewhere.
+
+Tables are processed one Arrow record batch at a time. In each batch a
+column is dictionary-encoded, so every distinct value is anonymized once
+and the results are gathered back with ``take``; rows never become Python
+objects. Values already seen in earlier batches come from a per-column
+memo of up to ``TABLE_MEMO_SIZE`` entries, which is what makes repetitive
+columns (cities, school names, categories) cheap. Every cell is still its
+own document: its pseudonym numbering starts over, as in ``/batch``.
+"""
+import argparse
+import sys
+import time
+from typing import Dict, Iterable, Iterator, List, Optional
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from config import TABLE_BATCH_ROWS, TABLE_MEMO_SIZE
+
+POLICIES = ("skip", "regex", "ner")
+PARQUET_MIMETYPE = "application/vnd.apache.parquet"
+
+
+def is_text(data_type: pa.DataType) -> bool:
+    if pa.types.is_dictionary(data_type):
+        data_type = data_type.value_type
+    return pa.types.is_string(data_type) or pa.types.is_large_string(data_type)
+
+
+class TableAnonymizer:
+    """Anonymizes the columns of record batches that share ``schema``
+
+    :param schema: schema of the batches
+    :param policies: column name -> policy (see the module docstring)
+    :param anonymizer: defaults to the process-wide ``Anonymizer``
+    :param score_threshold: keep only entities scoring at least this
+    :param memo_size: distinct values remembered per column across batches
+    """
+
+    def __init__(self, schema: pa.Schema, policies: Dict[str, object], anonymizer=None,
+                 score_threshold: Optional[float] = None, memo_size: int = TABLE_MEMO_SIZE):
+        if anonymizer is None:
+            from tools.anonimization import get_anonymizer
+            anonymizer = get_anonymizer()
+        self.schema = schema
+        self.anonymizer = anonymizer
+        self.score_threshold = score_threshold
+        self.memo_size = memo_size
+        self.columns = self.resolve(policies)
+        self.memos: Dict[str, Dict[str, str]] = {column: {} for column in self.columns}
+        self.rows = 0
+        self.cells = 0
+        self.analyzed = 0
+
+    def resolve(self, policies: Dict[str, object]) -> Dict[str, Optional[List[str]]]:
+        """Entity types (``None``: all) of each column to anonymize; ``ValueError`` on a bad policy"""
+        columns = {}
+        for column, policy in policies.items():
+            if column not in self.schema.names:
+                raise ValueError(f"Coluna '{column}' não encontrada ({', '.join(self.schema.names)})")
+            if policy == "skip":
+                continue
+            field_type = self.schema.field(column).type
+            if not is_text(field_type):
+                raise ValueError(f"Coluna '{column}' não é de texto ({field_type})")
+            if policy == "ner":
+                entities = None
+            elif policy == "regex":
+                entities = self.anonymizer.tier_entities(None)[0]
+            elif isinstance(policy, str):
+                entities = [entity.strip() for entity in policy.split(",") if entity.strip()]
+            elif isinstance(policy, (list, tuple)) and all(isinstance(entity, str) for entity in policy):
+                entities = list(policy)
+            else:
+                raise ValueError(f"Política inválida para a coluna '{column}': {policy!r} "
+                                 f"(opções: {', '.join(POLICIES)} ou lista de entidades)")
+            columns[column] = self.anonymizer.check_entities(entities)
+        return columns
+
+    def anonymize_column(self, column: str, array: pa.Array) -> pa.Array:
+        """``array`` with each distinct value anonymized once, same type and nulls"""
+        encoded = array if pa.types.is_dictionary(array.type) else array.dictionary_encode()
+        values = encoded.dictionary.to_pylist()
+        memo = self.memos[column]
+        missing = [value for value in dict.fromkeys(values) if value not in memo]
+        if missing:
+            if len(memo) + len(missing) > self.memo_size:
+                memo.clear()
+            memo.update(zip(missing, self.anonymizer.anonymize_batch(
+                missing, entities=self.columns[column], score_threshold=self.score_threshold
+            )))
+            self.analyzed += len(missing)
+        self.cells += len(array) - array.null_count
+        anonymized = pa.array([memo[value] for value in values], type=pa.string())
+        return anonymized.take(encoded.indices).cast(array.type)
+
+    def batch(self, batch: pa.RecordBatch) -> pa.RecordBatch:
+        arrays = [self.anonymize_column(name, array) if name in self.columns else array
+                  for name, array in zip(batch.schema.names, batch.columns)]
+        self.rows += batch.num_rows
+        return pa.RecordBatch.from_arrays(arrays, schema=batch.schema)
+
+    def stats(self) -> Dict[str, int]:
+        """Rows and non-null cells processed, and distinct values that were analyzed"""
+        return {"rows": self.rows, "cells": self.cells, "analyzed": self.analyzed}
+
+
+def anonymize_batches(batches: Iterable[pa.RecordBatch], schema: pa.Schema, policies: Dict[str, object],
+                      **kwargs) -> Iterator[pa.RecordBatch]:
+    """Anonymize a stream of record batches (keyword arguments go to ``TableAnonymizer``)"""
+    tables = TableAnonymizer(schema, policies, **kwargs)
+    for batch in batches:
+        yield tables.batch(batch)
+
+
+def anonymize_table(table: pa.Table, policies: Dict[str, object], batch_rows: int = TABLE_BATCH_ROWS,
+                    **kwargs) -> pa.Table:
+    """Anonymize the columns of ``table`` according to ``policies``"""
+    batches = anonymize_batches(table.to_batches(max_chunksize=batch_rows), table.schema, policies, **kwargs)
+    return pa.Table.from_batches(list(batches), schema=table.schema)
+
+
+def anonymize_dataframe(df, policies: Dict[str, object], batch_rows: int = TABLE_BATCH_ROWS, **kwargs):
+    """Anonymize the columns of a pandas ``DataFrame``; index and dtypes are kept"""
+    return anonymize_table(pa.Table.from_pandas(df), policies, batch_rows, **kwargs).to_pandas()
+
+
+def anonymize_parquet(source, destination, policies: Dict[str, object], batch_rows: int = TABLE_BATCH_ROWS,
+                      **kwargs) -> Dict[str, int]:
+    """Stream ``source`` into ``destination`` (paths or file objects), one record batch at a time"""
+    parquet_file = pq.ParquetFile(source)
+    tables = TableAnonymizer(parquet_file.schema_arrow, policies, **kwargs)
+    with pq.ParquetWriter(destination, parquet_file.schema_arrow) as writer:
+        for batch in parquet_file.iter_batches(batch_size=batch_rows):
+            writer.write_batch(tables.batch(batch))
+    return tables.stats()
+
+
+def parse_policy(argument: str):
+    """``coluna=política`` from the command line"""
+    column, separator, policy = argument.partition("=")
+    if not separator or not column or not policy:
+        raise argparse.ArgumentTypeError(f"use coluna=política, não '{argument}'")
+    return column, policy
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Anonimização de arquivos Parquet coluna a coluna")
+    parser.add_argument("input", help="arquivo .parquet")
+    parser.add_argument("output", help="arquivo .parquet de saída, com o mesmo esquema")
+    parser.add_argument("--policy", type=parse_policy, action="append", required=True,
+                        help="coluna=skip|regex|ner|ENTIDADE,ENTIDADE (repita para cada coluna)")
+    parser.add_argument("--batch-rows", type=int, default=TABLE_BATCH_ROWS, help="linhas por lote Arrow")
+    parser.add_argument("--score-threshold", type=float, default=None)
+    args = parser.parse_args(argv)
+
+    started = time.perf_counter()
+    stats = anonymize_parquet(args.input, args.output, dict(args.policy), batch_rows=args.batch_rows,
+                              score_threshold=args.score_threshold)
+    elapsed = time.perf_counter() - started
+    print(f"Concluído: {stats['rows']} linhas, {stats['cells']} células, {stats['analyzed']} valores "
+          f"distintos analisados em {elapsed:.1f}s ({stats['rows'] / elapsed if elapsed else 0:.1f} linhas/s)",
+          file=sys.stderr)
+    return stats
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+"""Análise em camadas: padrões primeiro, NER do spaCy só onde pode haver nomes.
+
+With ``ANALYSIS_MODE = "tiered"``:
+
+1. ``regex`` tier: every recognizer that does not read spaCy entities
+   (CPF, email, phone, addresses, schools, gazetteers) runs over the whole
+   text with the tokenizer alone;
+2. ``ner`` tier: the full spaCy pipeline runs, for the NER entity types
+   only (``PERSON``), on the paragraphs that ``needs_ner`` flags.
+
+The heuristic looks at each paragraph with the entities of the first tier
+blanked out, so "Rua Getúlio Vargas" or "Colégio Santo Antônio" do not
+count, and flags it when it finds what usually surrounds a person's name:
+two or more capitalized words in a row, a capitalized word in the middle
+of a sentence, a run of words in capitals, or a context word such as
+"nome" or "filho". A CSV column of CPFs and emails never reaches spaCy.
+
+The tier decided for each text travels with its results as
+``TieredResults.tier``, through chunking and the result cache, so callers
+report the tier that actually ran rather than guessing it afterwards.
+"""
+import re
+from typing import Iterable, List, Optional, Tuple
+
+from presidio_analyzer.recognizer_result import RecognizerResult
+
+from tools.chunking import split_paragraphs
+
+TIERS = ("regex", "ner")
+
+UPPER = "A-ZÀ-ÖØ-Þ"
+LOWER = "a-zß-öø-ÿ"
+# "João Silva", "Maria dos Anjos", "Pedro de Alcântara"
+NAME_SEQUENCE = re.compile(rf"\b[{UPPER}][{LOWER}]+(?:\s+(?:(?:d[aeo]s?|e)\s+)?[{UPPER}][{LOWER}]+)+")
+# Palavra com inicial maiúscula depois de uma minúscula ou vírgula: "a pedido de Ana"
+MID_SENTENCE = re.compile(rf"(?<=[{LOWER},;:] )[{UPPER}][{LOWER}]{{2,}}")
+# "JOÃO DA SILVA"
+CAPS_SEQUENCE = re.compile(rf"\b[{UPPER}]{{2,}}(?:\s+(?:D[AEO]S?\s+)?[{UPPER}]{{2,}})+\b")
+NAME_CONTEXT = re.compile(
+    r"(?i)\b(?:nome|chamad[oa]|pessoa|filh[oa]|net[oa]|pai|mãe|irmã|irmão|espos[oa]|cônjuge|"
+    r"sr|sra|senhor|senhora|dr|dra|declarante|vítima|testemunha|requerente|requerid[oa]|"
+    r"autor|autora|réu|ré|paciente|assinad[oa])\b"
+)
+NAME_HINTS = (NAME_SEQUENCE, MID_SENTENCE, CAPS_SEQUENCE, NAME_CONTEXT)
+
+
+def needs_ner(paragraph: str) -> bool:
+    """Whether ``paragraph`` may contain a person's name"""
+    return any(hint.search(paragraph) for hint in NAME_HINTS)
+
+
+def mask(text: str, results: List[RecognizerResult]) -> str:
+    """``text`` with every result replaced by blanks (same length)"""
+    pieces = []
+    last = 0
+    for result in sorted(results, key=lambda r: r.start):
+        if result.end <= last:
+            continue
+        start = max(result.start, last)
+        pieces.append(text[last:start])
+        pieces.append(" " * (result.end - start))
+        last = result.end
+    pieces.append(text[last:])
+    return "".join(pieces)
+
+
+def ner_paragraphs(text: str, results: List[RecognizerResult]) -> List[Tuple[int, str]]:
+    """``(offset, paragraph)`` of ``text`` to send to the NER tier, given the first tier's ``results``"""
+    masked = mask(text, results)
+    return [(offset, text[offset:offset + len(paragraph)])
+            for offset, paragraph in split_paragraphs(masked) if needs_ner(paragraph)]
+
+
+class TieredResults(list):
+    """Analyzer results of one text and the highest tier that analyzed it
+
+    ``tier`` is ``"regex"``, ``"ner"``, or ``None`` outside ``"tiered"`` mode.
+    """
+
+    def __init__(self, results: Iterable[RecognizerResult] = (), tier: Optional[str] = None):
+        super().__init__(results)
+        self.tier = tier
+
+
+def result_tier(results: List[RecognizerResult]) -> Optional[str]:
+    """Tier recorded with ``results`` (``None`` for a plain list)"""
+    return getattr(results, "tier", None)
+
+
+def highest_tier(tiers: Iterable[Optional[str]]) -> Optional[str]:
+    """Highest of the tiers of a document's pieces (paragraphs, chunks)"""
+    tiers = set(tiers)
+    for tier in reversed(TIERS):
+        if tier in tiers:
+            return tier
+    return None
@@ -0,0 +1,326 @@
+"""Cofre de reidentificação: o valor original de cada substituição, cifrado em SQLite.
+
+When ``VAULT_DB`` is set, every anonymization records one row per replaced
+entity (document ID, position, placeholder, entity type, offsets and an
+HMAC of the normalized value) and one row per document holding its
+original values encrypted with Fernet (key from the ``VAULT_KEY``
+environment variable). Encrypting once per document rather than once per
+entity, and writing a whole batch in one transaction, keeps the overhead
+small for bulk runs.
+
+Indexes on document ID, placeholder and value hash answer "restore these
+documents" (``deanonymize_many``, one query per ``QUERY_CHUNK`` documents)
+and "which documents mention this value" (``find``) without decrypting
+anything else. Document IDs default to an HMAC of the original text.
+
+A text anonymized paragraph by paragraph (``/stream``, text jobs) is
+recorded one paragraph at a time, under ``<document ID>:<paragraph index>``
+(``piece_id``); ``deanonymize`` restores the whole text file given the
+document ID.
+
+There is deliberately no HTTP endpoint: re-identification is done by
+authorized staff with the command line.
+
+Uso (a partir da raiz do repositório):
+
+    python -m tools.vault key
+    python -m tools.vault deanonymize anonimizado.jsonl original.jsonl --field text --id-field id
+    python -m tools.vault deanonymize anonimizado.csv.zst original.csv.zst
+    python -m tools.vault deanonymize anonimizado.txt original.txt --document-id <ID do job>
+    python -m tools.vault --db vault.sqlite3 find CPF 529.982.247-25
+"""
+import argparse
+import csv
+import hashlib
+import hmac
+import io
+import json
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import zstandard
+from cryptography.fernet import Fernet
+from dotenv import load_dotenv
+
+from tools.bulk import DOCUMENT_ID_FIELD, detect_format, field_value, iter_blocks, read_records
+from tools.pseudonymization import normalize
+from tools.spans import Spans
+from config import VAULT_DB
+
+load_dotenv()
+
+KEY_VARIABLE = "VAULT_KEY"
+# Documentos por consulta (o SQLite limita o número de parâmetros)
+QUERY_CHUNK = 500
+PLACEHOLDER = re.compile(r"<[A-ZÀ-Ü_]+\d*>")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS documents (
+    document_id TEXT PRIMARY KEY,
+    original_values BLOB NOT NULL,  -- lista JSON dos valores, cifrada
+    created REAL NOT NULL
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS replacements (
+    document_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    placeholder TEXT NOT NULL,
+    entity_type TEXT NOT NULL,
+    value_hash TEXT NOT NULL,
+    start INTEGER NOT NULL,  -- posição no texto anonimizado
+    "end" INTEGER NOT NULL,
+    PRIMARY KEY (document_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS replacements_placeholder ON replacements (placeholder);
+CREATE INDEX IF NOT EXISTS replacements_value_hash ON replacements (value_hash);
+"""
+
+# (placeholder, início, fim, valor original)
+Mapping = Tuple[str, int, int, str]
+
+
+def piece_id(document_id: str, index: int) -> str:
+    """ID of paragraph ``index`` of a document recorded paragraph by paragraph"""
+    return f"{document_id}:{index}"
+
+
+def restore(text: str, mappings: List[Mapping]) -> str:
+    """Put the original values back into an anonymized text
+
+    Uses the recorded offsets while the text is unchanged; otherwise (e.g.
+    placeholders renumbered by the LLM agent) the placeholders found in the
+    text are matched to the recorded values in order.
+    """
+    if all(text[start:end] == placeholder for placeholder, start, end, _ in mappings):
+        pieces = []
+        last = 0
+        for _, start, end, value in mappings:
+            pieces.append(text[last:start])
+            pieces.append(value)
+            last = end
+        pieces.append(text[last:])
+        return "".join(pieces)
+
+    values = iter([value for _, _, _, value in mappings])
+    return PLACEHOLDER.sub(lambda match: next(values, match.group(0)), text)
+
+
+class Vault:
+    """Encrypted placeholder → original value store
+
+    :param path: SQLite file
+    :param key: Fernet key; defaults to the ``VAULT_KEY`` environment variable
+    """
+
+    def __init__(self, path: str = VAULT_DB, key: Optional[str] = None):
+        key = key or os.getenv(KEY_VARIABLE)
+        if not key:
+            raise ValueError(f"{KEY_VARIABLE} não definida (gere com: python -m tools.vault key)")
+        key = key.encode("ascii") if isinstance(key, str) else key
+        self.fernet = Fernet(key)
+        # Chave separada para os índices, derivada da chave do cofre
+        self._hmac_key = hashlib.sha256(b"vault-index\0" + key).digest()
+        self.path = path
+        self._db = None
+        self._db_pid = None
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        # Uma conexão por processo: conexões SQLite não sobrevivem a um fork
+        if self._db is None or self._db_pid != os.getpid():
+            self._db = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.executescript(SCHEMA)
+            self._db_pid = os.getpid()
+        return self._db
+
+    def _hmac(self, data: str) -> str:
+        return hmac.new(self._hmac_key, data.encode("utf-8"), hashlib.sha256).hexdigest()
+
+    def document_id(self, text: str) -> str:
+        """Default document ID: keyed hash of the original text"""
+        return self._hmac(text)[:32]
+
+    def value_hash(self, entity_type: str, value: str) -> str:
+        return self._hmac(f"{entity_type}\0{normalize(entity_type, value)}")
+
+    def record(self, documents: Iterable[Tuple[str, str, Spans, str, Spans]]) -> int:
+        """Store the replacements of many documents in one transaction
+
+        :param documents: ``(document_id, original text, spans, anonymized
+            text, replaced spans)``; recording a document again replaces
+            its previous rows
+        :return: number of rows written
+        """
+        latest = {}
+        for document_id, text, spans, anonymized_text, replaced in documents:
+            latest[document_id] = (text, spans, anonymized_text, replaced)
+
+        now = time.time()
+        documents_rows = []
+        rows = []
+        for document_id, (text, spans, anonymized_text, replaced) in latest.items():
+            values = []
+            for position, ((start, end, entity_type, _), (out_start, out_end, _, _)) in enumerate(zip(spans, replaced)):
+                value = text[start:end]
+                values.append(value)
+                rows.append((document_id, position, anonymized_text[out_start:out_end], entity_type,
+                             self.value_hash(entity_type, value), out_start, out_end))
+            encrypted = self.fernet.encrypt(json.dumps(values, ensure_ascii=False).encode("utf-8"))
+            documents_rows.append((document_id, encrypted, now))
+
+        ids = list(latest)
+        with self._lock:
+            db = self._connection()
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                for i in range(0, len(ids), QUERY_CHUNK):
+                    chunk = ids[i:i + QUERY_CHUNK]
+                    db.execute(f"DELETE FROM replacements WHERE document_id IN ({','.join('?' * len(chunk))})", chunk)
+                db.executemany("INSERT OR REPLACE INTO documents VALUES (?, ?, ?)", documents_rows)
+                db.executemany("INSERT INTO replacements VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            except BaseException:
+                db.execute("ROLLBACK")
+                raise
+            db.execute("COMMIT")
+        return len(rows)
+
+    def mappings(self, document_ids: List[str]) -> Dict[str, List[Mapping]]:
+        """Decrypted replacements of each document, in order of appearance"""
+        result: Dict[str, List[Mapping]] = {document_id: [] for document_id in document_ids}
+        with self._lock:
+            db = self._connection()
+            for i in range(0, len(document_ids), QUERY_CHUNK):
+                chunk = document_ids[i:i + QUERY_CHUNK]
+                marks = ','.join('?' * len(chunk))
+                values = {document_id: json.loads(self.fernet.decrypt(encrypted))
+                          for document_id, encrypted in db.execute(
+                              f"SELECT document_id, original_values FROM documents WHERE document_id IN ({marks})",
+                              chunk)}
+                rows = db.execute(
+                    f'SELECT document_id, position, placeholder, start, "end" FROM replacements '
+                    f"WHERE document_id IN ({marks}) ORDER BY document_id, position",
+                    chunk
+                )
+                for document_id, position, placeholder, start, end in rows:
+                    result[document_id].append((placeholder, start, end, values[document_id][position]))
+        return result
+
+    def deanonymize_many(self, documents: Dict[str, str]) -> Dict[str, str]:
+        """Original texts of ``{document_id: anonymized text}``"""
+        mappings = self.mappings(list(documents))
+        return {document_id: restore(text, mappings[document_id]) for document_id, text in documents.items()}
+
+    def deanonymize(self, document_id: str, text: str) -> str:
+        return self.deanonymize_many({document_id: text})[document_id]
+
+    def find(self, entity_type: str, value: str) -> List[Tuple[str, str]]:
+        """``(document_id, placeholder)`` of every recorded mention of ``value``"""
+        with self._lock:
+            return self._connection().execute(
+                "SELECT DISTINCT document_id, placeholder FROM replacements WHERE value_hash = ? ORDER BY document_id",
+                (self.value_hash(entity_type, value),)
+            ).fetchall()
+
+
+def open_output(path):
+    fh = open(path, "wb")
+    if path.endswith(".zst"):
+        fh = zstandard.ZstdCompressor().stream_writer(fh)
+    return io.TextIOWrapper(fh, encoding="utf-8", newline="")
+
+
+def deanonymize_file(vault: Vault, input_path: str, output_path: str, field: str = "text",
+                     id_field: str = DOCUMENT_ID_FIELD, block_size: int = QUERY_CHUNK) -> int:
+    """Restore ``field`` in every JSONL/CSV record (optionally .zst) whose ``id_field`` is in the vault
+
+    Records without a known ID, or that are not JSON objects, are copied as
+    they are. Returns the number of records.
+    """
+    fmt = detect_format(input_path)
+    if detect_format(output_path) != fmt:
+        raise ValueError("Entrada e saída devem ter o mesmo formato")
+    count = 0
+    with open_output(output_path) as dst:
+        writer = None
+        for block in iter_blocks(read_records(input_path, fmt), block_size):
+            header = block[0][1]
+            records = [record for record, _ in block]
+            if fmt == "csv" and writer is None:
+                missing = [column for column in (field, id_field) if column not in header]
+                if missing:
+                    raise ValueError(f"Coluna '{missing[0]}' não encontrada no CSV")
+                writer = csv.DictWriter(dst, fieldnames=header)
+                writer.writeheader()
+            ids = [field_value(record, id_field) for record in records]
+            ids = [None if document_id in (None, "") else str(document_id) for document_id in ids]
+            mappings = vault.mappings(sorted({document_id for document_id in ids if document_id is not None}))
+            for record, document_id in zip(records, ids):
+                if document_id is not None and isinstance(record.get(field), str):
+                    record = dict(record, **{field: restore(record[field], mappings[document_id])})
+                if writer is not None:
+                    writer.writerow(record)
+                else:
+                    dst.write(json.dumps(record, ensure_ascii=False) + "\n")
+            count += len(records)
+    return count
+
+
+def deanonymize_text(vault: Vault, input_path: str, output_path: str, document_id: str) -> int:
+    """Restore a text anonymized paragraph by paragraph under ``document_id``; returns the paragraphs"""
+    from tools.streaming import split_pieces
+    with open(input_path, encoding="utf-8") as f:
+        pieces = split_pieces(f.read())
+    ids = [piece_id(document_id, index) for index in range(len(pieces))]
+    restored = vault.deanonymize_many(dict(zip(ids, pieces)))
+    with open(output_path, "w", encoding="utf-8") as f:
+        f.writelines(restored[piece] for piece in ids)
+    return len(pieces)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Cofre de reidentificação")
+    parser.add_argument("--db", default=VAULT_DB, help="arquivo do cofre (padrão: VAULT_DB)")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("key", help="gera uma nova chave para VAULT_KEY")
+    restore_parser = commands.add_parser("deanonymize", help="restaura os valores originais de um JSONL/CSV/.txt")
+    restore_parser.add_argument("input", help=".jsonl/.ndjson/.csv (opcionalmente .zst) ou .txt")
+    restore_parser.add_argument("output", help="arquivo de saída no mesmo formato da entrada")
+    restore_parser.add_argument("--field", default="text", help="campo/coluna anonimizado")
+    restore_parser.add_argument("--id-field", default=DOCUMENT_ID_FIELD,
+                                help=f"campo/coluna com o identificador do documento (padrão: {DOCUMENT_ID_FIELD})")
+    restore_parser.add_argument("--document-id", help=".txt: ID do documento (de /stream ou o ID do job)")
+    find_parser = commands.add_parser("find", help="documentos que mencionam um valor")
+    find_parser.add_argument("entity_type")
+    find_parser.add_argument("value")
+    args = parser.parse_args(argv)
+
+    if args.command == "key":
+        print(Fernet.generate_key().decode("ascii"))
+        return
+    if not args.db:
+        parser.error("defina VAULT_DB no config.py ou use --db")
+
+    vault = Vault(args.db)
+    if args.command == "deanonymize" and args.input.endswith(".txt"):
+        if not args.document_id:
+            parser.error("para .txt, informe --document-id")
+        count = deanonymize_text(vault, args.input, args.output, args.document_id)
+        print(f"{count} parágrafos processados", file=sys.stderr)
+    elif args.command == "deanonymize":
+        try:
+            count = deanonymize_file(vault, args.input, args.output, args.field, args.id_field)
+        except ValueError as e:
+            parser.error(str(e))
+        print(f"{count} registros processados", file=sys.stderr)
+    else:
+        for document_id, placeholder in vault.find(args.entity_type, args.value):
+            print(f"{document_id}\t{placeholder}")
+
+
+if __name__ == "__main__":
+    main()